@@ -24,7 +24,8 @@ function AdvertisementsTable() {
   const [companies, setCompanies] = useState([]);
 
   const fetchAds = async () => {
-    const res = await fetch('/api/advertisements', { credentials: 'include' });
+    // the table filters every ad client-side: ask for the whole list
+    const res = await fetch('/api/advertisements?fields=full&limit=all', { credentials: 'include' });
     if (!res.ok) return;
     const data = await res.json();
     setAds(data.advertisements || []);
@@ -1,73 +1,24 @@
 import { useEffect, useState } from 'react';
-import { toast } from 'react-toastify';
-import 'react-toastify/dist/ReactToastify.css';
 import './AdminPageComponents.css';
 
 function ApplicationLogsTable() {
-  const [applications, setApplications] = useState([]);
-  const fetchApplications = async () => {
-    const res = await fetch('/api/applications', { credentials: 'include' });
-    if (!res.ok) return;
-    const data = await res.json().catch(() => null);
-    setApplications(data?.applications || []);
-  };
-  const [ads, setAds] = useState([]);
-  const fetchAds = async () => {
-    const res = await fetch('/api/advertisements', { credentials: 'include' });
-    if (!res.ok) return;
-    const data = await res.json().catch(() => null);
-    setAds(data?.advertisements || []);
-  };
   const fetchLogs = async () => {
-    const res = await fetch('/api/application_logs', { credentials: 'include' });
+    const res = await fetch('/api/application_logs?fields=full&expand=advertisement,actor', {
+      credentials: 'include',
+    });
     if (!res.ok) return;
     const data = await res.json().catch(() => null);
     setLogs(data?.application_logs || []);
   };
   const [logs, setLogs] = useState([]);
-  const [users, setUsers] = useState([]);
-  const fetchUsers = async () => {
-    const res = await fetch('/api/users', { credentials: 'include' });
-    if (!res.ok) return;
-    const data = await res.json().catch(() => null);
-    setUsers(data?.users || []);
-  };
   useEffect(() => {
     fetchLogs();
-    fetchUsers();
-    fetchAds();
-    fetchApplications();
   }, []);
   const [expandedLog, setExpandedLog] = useState(null);
 
-  const handleDelete = async id => {
-    if (!window.confirm('Êtes-vous sûr de vouloir supprimer ce log ?')) return;
-    try {
-      const res = await fetch(`/api/application_logs/${id}`, {
-        method: 'DELETE',
-        credentials: 'include',
-      });
-      if (!res.ok) {
-        toast.error('Erreur lors de la suppression du log.');
-        return;
-      }
-      await fetchLogs();
-      toast.success('Log supprimé avec succès.');
-    } catch {
-      toast.error('Erreur lors de la suppression du log.');
-    }
-  };
-
-  const LogRow = ({ log, handleDelete }) => {
-    let adTitle = '';
-    if (log.application_id) {
-      const app = applications.find(a => a.id === log.application_id);
-      if (app && app.advertisement_id) {
-        const ad = ads.find(ad => ad.id === app.advertisement_id);
-        adTitle = ad ? ad.title : '';
-      }
-    }
-    const actor = users.find(u => u.id === log.actor_id);
+  const LogRow = ({ log }) => {
+    const adTitle = log.advertisement ? log.advertisement.title : '';
+    const actor = log.actor;
     const cover = 'cover_letter' in log ? log.cover_letter : null;
     return (
       <div className="list-row">
@@ -118,9 +69,6 @@ function ApplicationLogsTable() {
           )}
           {log.sent_at && <div className="muted">Envoyé le: {log.sent_at}</div>}
         </div>
-        <div className="row-actions">
-          <button onClick={() => handleDelete(log.id)}>Supprimer</button>
-        </div>
       </div>
     );
   };
@@ -162,7 +110,7 @@ function ApplicationLogsTable() {
         {filteredLogs.length === 0 ? (
           <p>Aucun log.</p>
         ) : (
-          paginatedFilteredLogs.map(l => <LogRow key={l.id} log={l} handleDelete={handleDelete} />)
+          paginatedFilteredLogs.map(l => <LogRow key={l.id} log={l} />)
         )}
       </div>
       {totalPagesFiltered > 1 && (
@@ -7,35 +7,19 @@ import './AdminPageComponents.css';
 function ApplicationsTable() {
   const { user } = useAuth();
   const [applications, setApplications] = useState([]);
-  const [users, setUsers] = useState([]);
-  const [ads, setAds] = useState([]);
   const [query, setQuery] = useState('');
 
   const fetchApplications = async () => {
-    const res = await fetch('/api/applications', { credentials: 'include' });
+    const res = await fetch('/api/applications?expand=person,advertisement', {
+      credentials: 'include',
+    });
     if (!res.ok) return;
     const data = await res.json();
     setApplications(data.applications || []);
   };
 
-  const fetchUsers = async () => {
-    const res = await fetch('/api/users', { credentials: 'include' });
-    if (!res.ok) return;
-    const data = await res.json();
-    setUsers(data.users || []);
-  };
-
-  const fetchAds = async () => {
-    const res = await fetch('/api/advertisements', { credentials: 'include' });
-    if (!res.ok) return;
-    const data = await res.json();
-    setAds(data.advertisements || []);
-  };
-
   useEffect(() => {
     fetchApplications();
-    fetchUsers();
-    fetchAds();
   }, []);
 
   const handleDelete = async id => {
@@ -92,8 +76,8 @@ function ApplicationsTable() {
   const filteredApps = applications.filter(a => {
     const q = query.trim().toLowerCase();
     if (!q) return true;
-    const ad = ads.find(ad => ad.id === a.advertisement_id);
-    const user = users.find(u => u.id === a.person_id);
+    const ad = a.advertisement;
+    const user = a.person;
     return (
       (ad?.title || '').toLowerCase().includes(q) ||
       (user?.first_name || '').toLowerCase().includes(q) ||
@@ -123,8 +107,8 @@ function ApplicationsTable() {
           <p>Aucune candidature.</p>
         ) : (
           paginatedApps.map(a => {
-            const ad = ads.find(ad => ad.id === a.advertisement_id);
-            const user = users.find(u => u.id === a.person_id);
+            const ad = a.advertisement;
+            const user = a.person;
             return (
               <div key={a.id} className="list-row">
                 <div className="row-main">
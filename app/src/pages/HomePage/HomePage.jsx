@@ -4,23 +4,44 @@ import JobCard from '../../components/JobCard/JobCard';
 import Review from '../../components/Review/Review';
 import './HomePage.css';
 
+const ADS_PER_PAGE = 20;
+
+const matchingAds = (ads, poste, ville) =>
+  ads.filter(ad => {
+    const matchPoste = poste ? ad.title.toLowerCase().includes(poste.toLowerCase()) : true;
+    const matchVille = ville
+      ? ad.location && ad.location.toLowerCase().includes(ville.toLowerCase())
+      : true;
+    return matchPoste && matchVille;
+  });
+
 function HomePage() {
   const [advertisements, setAdvertisements] = useState([]);
   const [companies, setCompanies] = useState([]);
   const [searchValues, setSearchValues] = useState({ poste: '', ville: '' });
   const [filteredAds, setFilteredAds] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [stats, setStats] = useState({ offres: 0, entreprises: 0 });
 
-  useEffect(() => {
-    fetch('/api/advertisements')
+  // one page of ads at a time, the next one on demand (next_cursor)
+  const loadAds = cursor => {
+    const params = new URLSearchParams({ limit: ADS_PER_PAGE });
+    if (cursor) params.set('cursor', cursor);
+    fetch(`/api/advertisements?${params}`)
       .then(res => {
         if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
         return res.json();
       })
       .then(data => {
-        setAdvertisements(data.advertisements || []);
-        setFilteredAds(data.advertisements || []);
+        const loaded = [...(cursor ? advertisements : []), ...(data.advertisements || [])];
+        setAdvertisements(loaded);
+        setFilteredAds(matchingAds(loaded, searchValues.poste, searchValues.ville));
+        setNextCursor(data.next_cursor || null);
       });
+  };
+
+  useEffect(() => {
+    loadAds(null);
     fetch('/api/companies')
       .then(res => {
         if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
@@ -46,15 +67,7 @@ function HomePage() {
   }, []);
 
   const filterAds = (poste, ville) => {
-    setFilteredAds(
-      advertisements.filter(ad => {
-        const matchPoste = poste ? ad.title.toLowerCase().includes(poste.toLowerCase()) : true;
-        const matchVille = ville
-          ? ad.location && ad.location.toLowerCase().includes(ville.toLowerCase())
-          : true;
-        return matchPoste && matchVille;
-      })
-    );
+    setFilteredAds(matchingAds(advertisements, poste, ville));
   };
 
   const onInputChange = e => {
@@ -94,6 +107,11 @@ function HomePage() {
           })}
         </div>
       )}
+      {nextCursor && (
+        <button type="button" className="load-more-button" onClick={() => loadAds(nextCursor)}>
+          Voir plus d'annonces
+        </button>
+      )}
       <Review />
     </main>
   );
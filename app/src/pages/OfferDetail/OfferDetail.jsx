@@ -35,20 +35,13 @@ function OfferDetail() {
   useEffect(() => {
     const fetchAdvertisement = async () => {
       try {
-        const response = await fetch(`http://localhost:5000/advertisement/${advertisement_id}`);
+        const response = await fetch(
+          `http://localhost:5000/advertisement/${advertisement_id}?expand=company`
+        );
         if (!response.ok) throw new Error('Offre non trouvée');
         const data = await response.json();
         setAdvertisement(data.advertisement);
-
-        if (data.advertisement.company_id) {
-          const companyResponse = await fetch(
-            `http://localhost:5000/company/${data.advertisement.company_id}`
-          );
-          if (companyResponse.ok) {
-            const companyData = await companyResponse.json();
-            setCompany(companyData.company);
-          }
-        }
+        setCompany(data.advertisement.company);
       } catch (err) {
         setError(err.message);
       } finally {
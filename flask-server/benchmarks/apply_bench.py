@@ -0,0 +1,126 @@
+"""Load test for POST /applications on one popular advertisement (stdlib only).
+
+    python benchmarks/apply_bench.py --base http://localhost:5000 \
+        --advertisement-id 1 --candidates 500 --concurrency 50
+
+Creates --candidates throw-away accounts (with a CV) through POST /users and
+logs each one in. Then every candidate applies to the same advertisement at
+once, and finally applies again, which exercises the duplicate (409) path.
+Prints status counts and latency percentiles for both rounds. The accounts
+and applications stay in the database. Start the server with
+LOGIN_RATE_LIMIT=0: all the logins come from one IP.
+"""
+import argparse
+import http.client
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urlsplit
+
+from http_bench import _percentile
+
+PASSWORD = "apply-bench"
+
+
+def _request(conn, method, path, body=None, cookie=None):
+    headers = {"Content-Type": "application/json"}
+    if cookie:
+        headers["Cookie"] = cookie
+    conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+    resp = conn.getresponse()
+    resp.read()
+    return resp
+
+
+def create_candidates(base, count):
+    parts = urlsplit(base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    run_id = uuid.uuid4().hex[:8]
+    cookies = []
+    for i in range(count):
+        email = f"apply-bench-{run_id}-{i}@example.com"
+        resp = _request(conn, "POST", "/users", {
+            "first_name": "Bench", "last_name": f"Candidate {i}", "email": email,
+            "password_hash": PASSWORD, "role": "candidate", "cv": "bench-cv.pdf",
+        })
+        if resp.status != 201:
+            raise SystemExit(f"creating {email} failed: HTTP {resp.status}")
+        resp = _request(conn, "POST", "/login", {"email": email, "password": PASSWORD})
+        if resp.status == 429:
+            raise SystemExit("login throttled (HTTP 429): start the server with LOGIN_RATE_LIMIT=0")
+        if resp.status != 200:
+            raise SystemExit(f"login as {email} failed: HTTP {resp.status}")
+        cookies.append(resp.getheader("Set-Cookie", "").split(";")[0])
+    conn.close()
+    return cookies
+
+
+def apply_all(base, cookies, advertisement_id, concurrency):
+    parts = urlsplit(base)
+    todo = queue.Queue()
+    for cookie in cookies:
+        todo.put(cookie)
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    start = threading.Barrier(concurrency)
+
+    def client():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        local, codes = [], Counter()
+        start.wait()
+        while True:
+            try:
+                cookie = todo.get_nowait()
+            except queue.Empty:
+                break
+            started = time.monotonic()
+            try:
+                codes[_request(conn, "POST", "/applications",
+                               {"advertisement_id": advertisement_id}, cookie).status] += 1
+            except (OSError, http.client.HTTPException):
+                codes["error"] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+                continue
+            local.append(time.monotonic() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            statuses.update(codes)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    return {
+        "statuses": dict(statuses),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base", default="http://localhost:5000")
+    parser.add_argument("--advertisement-id", type=int, required=True)
+    parser.add_argument("--candidates", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    cookies = create_candidates(args.base, args.candidates)
+    for label in ("first apply", "duplicate apply"):
+        result = apply_all(args.base, cookies, args.advertisement_id, args.concurrency)
+        print(f"{label}: statuses={result['statuses']} rps={result['rps']:.1f} "
+              "p50={p50_ms:.1f}ms p95={p95_ms:.1f}ms p99={p99_ms:.1f}ms".format(**result))
+
+
+if __name__ == "__main__":
+    main()
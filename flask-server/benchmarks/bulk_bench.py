@@ -0,0 +1,57 @@
+"""Throughput check for POST /advertisements/bulk (stdlib only).
+
+    python benchmarks/bulk_bench.py --base http://localhost:5000 \
+        --email admin@example.com --password secret --company-id 1 --rows 20000
+
+Logs in as an admin, uploads --rows generated advertisements as NDJSON in
+one request and prints the import rate. The rows stay in the table.
+"""
+import argparse
+import http.client
+import json
+import time
+from urllib.parse import urlsplit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base", default="http://localhost:5000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--company-id", type=int, required=True)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    parts = urlsplit(args.base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=600)
+    conn.request("POST", "/login", json.dumps({"email": args.email, "password": args.password}),
+                 {"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    resp.read()
+    if resp.status != 200:
+        raise SystemExit(f"login failed: HTTP {resp.status}")
+    cookie = resp.getheader("Set-Cookie", "").split(";")[0]
+
+    body = "".join(json.dumps({
+        "title": f"Offre import {i}",
+        "short_description": "Poste généré par bulk_bench",
+        "description": "Description de test. " * 40,
+        "publish_date": "2025-01-01",
+        "company_id": args.company_id,
+        "employment_type": "CDI",
+        "work_mode": "Hybride",
+    }) + "\n" for i in range(args.rows))
+
+    started = time.perf_counter()
+    conn.request("POST", "/advertisements/bulk", body.encode(),
+                 {"Content-Type": "application/x-ndjson", "Cookie": cookie})
+    resp = conn.getresponse()
+    result = json.loads(resp.read())
+    elapsed = time.perf_counter() - started
+    created = len(result.get("created", []))
+    print(f"HTTP {resp.status}: {created} created, {len(result.get('errors', []))} rejected "
+          f"in {elapsed:.2f}s -> {created / elapsed:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
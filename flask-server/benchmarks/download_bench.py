@@ -0,0 +1,92 @@
+"""Concurrent download check for /uploads (stdlib only).
+
+    python benchmarks/download_bench.py --base http://localhost:5000 \
+        --path /uploads/cv.pdf --concurrency 64 --duration 15
+
+Each client thread keeps one keep-alive connection and downloads --path
+back to back, reading the whole body (or --range, e.g. bytes=0-65535, like
+a PDF viewer fetching the first pages). --revalidate sends the ETag of the
+first response back as If-None-Match, like a browser with a cached copy.
+Prints requests/s, MB/s and latency percentiles.
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+from http_bench import _percentile
+
+
+def _client(base, path, headers, deadline, results, lock):
+    parts = urlsplit(base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    latencies, received, failed = [], 0, 0
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+            if resp.status not in (200, 206, 304):
+                failed += 1
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+            continue
+        latencies.append(time.monotonic() - started)
+        received += len(body)
+    conn.close()
+    with lock:
+        results["latencies"].extend(latencies)
+        results["bytes"] += received
+        results["errors"] += failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base", default="http://localhost:5000")
+    parser.add_argument("--path", default="/uploads/cv.pdf")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--range", help="Range header value, e.g. bytes=0-65535")
+    parser.add_argument("--revalidate", action="store_true")
+    args = parser.parse_args()
+
+    headers = {}
+    if args.range:
+        headers["Range"] = args.range
+    if args.revalidate:
+        parts = urlsplit(args.base)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        conn.request("GET", args.path)
+        resp = conn.getresponse()
+        resp.read()
+        conn.close()
+        if resp.getheader("ETag"):
+            headers["If-None-Match"] = resp.getheader("ETag")
+
+    results, lock = {"latencies": [], "bytes": 0, "errors": 0}, threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=_client, args=(args.base, args.path, headers, deadline, results, lock))
+        for _ in range(args.concurrency)
+    ]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    latencies = sorted(results["latencies"])
+    print(f"{len(latencies)} requests, {results['errors']} errors in {elapsed:.1f}s: "
+          f"{len(latencies) / elapsed:.1f} req/s, {results['bytes'] / elapsed / 1e6:.1f} MB/s")
+    print("p50={:.1f}ms p95={:.1f}ms p99={:.1f}ms".format(
+        _percentile(latencies, 0.50) * 1000, _percentile(latencies, 0.95) * 1000,
+        _percentile(latencies, 0.99) * 1000))
+
+
+if __name__ == "__main__":
+    main()
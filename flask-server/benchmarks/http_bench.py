@@ -0,0 +1,90 @@
+"""Closed-loop HTTP load generator for the API (stdlib only).
+
+    python benchmarks/http_bench.py --base http://localhost:5000 \
+        --path /advertisements --path /companies --path /stats \
+        --concurrency 32 --duration 20
+
+Each client thread keeps one keep-alive connection open and sends requests
+back to back over the given paths, like browsers loading the home page.
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def _client(base, paths, deadline, latencies, errors, lock):
+    parts = urlsplit(base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    local, failed, i = [], 0, 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.monotonic()
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 400:
+                failed += 1
+            elif resp.getheader("Connection", "").lower() == "close":
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            continue
+        local.append(time.monotonic() - started)
+    conn.close()
+    with lock:
+        latencies.extend(local)
+        errors.append(failed)
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def run(base, paths, concurrency, duration):
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=_client, args=(base, paths, deadline, latencies, errors, lock))
+        for _ in range(concurrency)
+    ]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base", default="http://localhost:5000")
+    parser.add_argument("--path", action="append", dest="paths")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+
+    result = run(args.base, args.paths or ["/advertisements", "/companies", "/stats"],
+                 args.concurrency, args.duration)
+    print("requests={requests} errors={errors} rps={rps:.1f} "
+          "p50={p50_ms:.1f}ms p95={p95_ms:.1f}ms p99={p99_ms:.1f}ms".format(**result))
+
+
+if __name__ == "__main__":
+    main()
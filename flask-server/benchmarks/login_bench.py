@@ -0,0 +1,120 @@
+"""Password verification throughput, in logins/s per core.
+
+    python benchmarks/login_bench.py --method scrypt:32768:8:1 \
+        --method pbkdf2:sha256:600000 --threads 1 --threads 4 --duration 5
+
+For each --method and --threads, passwords.verify() runs back to back from
+as many client threads through the hashing pool (PASSWORD_HASH_WORKERS =
+--threads), which is the CPU work of one POST /login. Prints logins/s, per
+core busy (min(--threads, cores)) and the latency percentiles. No server or database is needed.
+
+With --base, logs in over HTTP instead (--email/--password of an existing
+account, --concurrency clients); start the server with LOGIN_RATE_LIMIT=0,
+otherwise the per-IP bucket answers 429 after LOGIN_IP_BURST attempts.
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import passwords  # noqa: E402
+from http_bench import _percentile  # noqa: E402
+
+
+def _run_clients(target, concurrency, duration):
+    latencies, lock = [], threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        local = []
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            target()
+            local.append(time.monotonic() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sorted(latencies), time.monotonic() - started
+
+
+def _report(label, latencies, elapsed, per_core=None):
+    rate = len(latencies) / elapsed
+    per_core = f", {rate / per_core:.1f} per core" if per_core else ""
+    print(f"{label}: {rate:.1f} logins/s{per_core}, "
+          "p50={:.1f}ms p99={:.1f}ms".format(
+              _percentile(latencies, 0.50) * 1000, _percentile(latencies, 0.99) * 1000))
+
+
+def bench_hashing(methods, thread_counts, duration):
+    for method in methods:
+        for threads in thread_counts:
+            passwords.configure({
+                'PASSWORD_HASH_METHOD': method,
+                'PASSWORD_HASH_WORKERS': threads,
+                'PASSWORD_HASH_QUEUE': threads,
+                'PASSWORD_HASH_TIMEOUT': 60.0,
+            })
+            stored = passwords.hash_password("login-bench")
+            latencies, elapsed = _run_clients(lambda: passwords.verify(stored, "login-bench"), threads, duration)
+            _report(f"{method} x{threads}", latencies, elapsed, min(threads, os.cpu_count() or 1))
+
+
+def bench_http(base, email, password, concurrency, duration):
+    parts = urlsplit(base)
+    body = json.dumps({"email": email, "password": password})
+    local = threading.local()
+    failures = []
+
+    def login():
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        try:
+            local.conn.request("POST", "/login", body, {"Content-Type": "application/json"})
+            resp = local.conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                failures.append(resp.status)
+        except (OSError, http.client.HTTPException):
+            failures.append("error")
+            local.conn.close()
+            del local.conn
+
+    latencies, elapsed = _run_clients(login, concurrency, duration)
+    _report(f"POST /login x{concurrency}", latencies, elapsed)
+    if failures:
+        print(f"{len(failures)} failed (first: {failures[0]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--method", action="append", help="werkzeug method, repeatable")
+    parser.add_argument("--threads", type=int, action="append", help="hashing threads, repeatable")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--base", help="log in over HTTP against this server")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.base:
+        if not args.email or not args.password:
+            parser.error("--base needs --email and --password")
+        bench_http(args.base, args.email, args.password, args.concurrency, args.duration)
+    else:
+        bench_hashing(args.method or ["scrypt:32768:8:1"], args.threads or [1], args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Cold-start budget check for create_app().
+
+    python benchmarks/startup_bench.py --runs 10 --budget-ms 500
+
+Starts fresh interpreters that import server and call create_app() without
+warm-up (no database needed), and fails when the median import + build time
+exceeds the budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = (
+    "import time; t = time.perf_counter(); "
+    "from server import create_app; "
+    "app = create_app({'WARMUP': False}); "
+    "print(time.perf_counter() - t, app.config['STARTUP_SECONDS'])"
+)
+
+
+def measure(runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", PROBE], cwd=SERVER_DIR,
+                             capture_output=True, text=True, check=True).stdout
+        process = time.perf_counter() - started
+        total, factory = (float(v) for v in out.split())
+        samples.append((process, total, factory))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    samples = measure(args.runs)
+    process, total, factory = (statistics.median(s[i] for s in samples) * 1000 for i in range(3))
+    print(f"median over {args.runs} runs: process={process:.0f}ms "
+          f"import+create_app={total:.0f}ms create_app={factory:.0f}ms budget={args.budget_ms:.0f}ms")
+    if total > args.budget_ms:
+        print("startup budget exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
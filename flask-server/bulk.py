@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+
+# upper bound for one upload; larger imports are split by the client
+MAX_BULK_ROWS = 50000
+# rows per transaction: a failing chunk only loses its own rows
+BULK_CHUNK_SIZE = 1000
+# same statement length limit (in characters) PyMySQL's executemany() uses
+MAX_STATEMENT_LENGTH = 1024000
+
+
+class BulkError(ValueError):
+    """Raised when a bulk upload cannot be parsed."""
+
+
+def _upload_format(content_type, filename=""):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    filename = (filename or "").lower()
+    if content_type in ("text/csv", "application/csv") or filename.endswith(".csv"):
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/jsonl") or filename.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if content_type == "application/json" or filename.endswith(".json"):
+        return "json"
+    raise BulkError("Send a JSON array, NDJSON or CSV (as the body or as a `file` upload)")
+
+
+def parse_rows(req):
+    """Read the rows of a bulk request as a list of dicts.
+
+    The body is a JSON array, NDJSON (one object per line) or CSV with a
+    header line, either sent directly with the matching Content-Type or as
+    the `file` field of a multipart form.
+    """
+    upload = req.files.get("file")
+    if upload is not None:
+        fmt = _upload_format(upload.mimetype, upload.filename)
+        raw = upload.read()
+    else:
+        fmt = _upload_format(req.mimetype)
+        raw = req.get_data()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise BulkError("Upload must be UTF-8 encoded")
+
+    if fmt == "csv":
+        rows = list(csv.DictReader(io.StringIO(text)))
+    else:
+        try:
+            if fmt == "json":
+                rows = json.loads(text or "null")
+            else:
+                rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+        except ValueError as e:
+            raise BulkError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise BulkError("Expected an array of objects")
+
+    if not rows:
+        raise BulkError("No rows to import")
+    if len(rows) > MAX_BULK_ROWS:
+        raise BulkError(f"At most {MAX_BULK_ROWS} rows per request")
+    return rows
+
+
+def chunks(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def insert_rows(cursor, table, columns, values, key=None):
+    """INSERT `values` (tuples in `columns` order); return their new ids.
+
+    With `key`, a column under a UNIQUE index, rows are sent as multi-row
+    INSERT statements of up to MAX_STATEMENT_LENGTH, like executemany()
+    does, and their ids are read back by key: the ids given to one
+    statement are not consecutive with auto_increment_increment > 1 or
+    under innodb_autoinc_lock_mode = 2. Without `key` each row is an INSERT
+    of its own and its id the statement's lastrowid.
+    """
+    if key is None:
+        placeholders = ", ".join(["%s"] * len(columns))
+        ids = []
+        for row in values:
+            cursor.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", row)
+            ids.append(cursor.lastrowid)
+        return ids
+
+    prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    position = columns.index(key)
+    ids = []
+    batch, keys, size = [], [], len(prefix)
+
+    def flush():
+        cursor.execute(prefix + ",".join(batch))
+        cursor.execute(f"SELECT id, {key} FROM {table} WHERE {key} IN ({', '.join(['%s'] * len(keys))})", keys)
+        found = {row[key]: row["id"] for row in cursor.fetchall()}
+        ids.extend(found[k] for k in keys)
+
+    for row in values:
+        literal = cursor.mogrify(placeholders, row)
+        if batch and size + len(literal) + 1 > MAX_STATEMENT_LENGTH:
+            flush()
+            batch, keys, size = [], [], len(prefix)
+        batch.append(literal)
+        keys.append(row[position])
+        size += len(literal) + 1
+    if batch:
+        flush()
+    return ids
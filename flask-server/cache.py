@@ -0,0 +1,298 @@
+from flask import Blueprint, jsonify, request, current_app
+from functools import wraps
+from collections import OrderedDict
+import threading
+import time
+from config import load_config
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+bp = Blueprint('cache', __name__)
+
+# filled by configure(), see config.py for the settings
+CACHE_CONFIG = {}
+
+
+class CacheBackend:
+    """Interface for response cache storage. Values are bytes."""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def incr(self, key):
+        """Atomically increment an integer counter and return the new value."""
+        raise NotImplementedError
+
+    def get_counter(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class LocalCache(CacheBackend):
+    """In-process LRU cache with per-entry TTL and a bound on entry count.
+
+    Counters are kept in an LRU of the same size. An evicted counter comes
+    back at the highest value evicted so far, never below its last value,
+    so entries stored under an older generation stay unreachable.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (expires_at, value)
+        self._data = OrderedDict()
+        self._counters = OrderedDict()
+        self._counter_floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, self._counter_floor) + 1
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_entries:
+                _, value = self._counters.popitem(last=False)
+                self._counter_floor = max(self._counter_floor, value)
+            return self._counters[key]
+
+    def get_counter(self, key):
+        with self._lock:
+            value = self._counters.get(key)
+            if value is None:
+                return self._counter_floor
+            self._counters.move_to_end(key)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by all workers, stored in a Redis-compatible server."""
+
+    def __init__(self, url, key_prefix=''):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+        self._prefix = key_prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._client.get(self._prefix + key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key, value, ex=int(ttl) if ttl else None)
+
+    def incr(self, key):
+        return self._client.incr(self._prefix + key)
+
+    def get_counter(self, key):
+        return int(self._client.get(self._prefix + key) or 0)
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+    def stats(self):
+        with self._lock:
+            # evictions are tracked by the server itself (INFO stats)
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_invalidations = 0
+
+
+def configure(config):
+    """Apply CACHE_* settings, dropping the current backend."""
+    global _backend
+    CACHE_CONFIG.update({
+        'backend': config['CACHE_BACKEND'],
+        'max_entries': config['CACHE_MAX_ENTRIES'],
+        'ttl': config['CACHE_TTL'],
+        'redis_url': config['CACHE_REDIS_URL'],
+        'key_prefix': config['CACHE_KEY_PREFIX'],
+    })
+    _backend = None
+
+
+def get_backend():
+    """Return the configured cache backend, or None when caching is off."""
+    global _backend
+    if not CACHE_CONFIG:
+        configure(load_config())
+    if CACHE_CONFIG['backend'] == 'none':
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if CACHE_CONFIG['backend'] == 'redis':
+                    _backend = RedisCache(CACHE_CONFIG['redis_url'], CACHE_CONFIG['key_prefix'])
+                else:
+                    _backend = LocalCache(CACHE_CONFIG['max_entries'])
+    return _backend
+
+
+def set_backend(backend):
+    """Swap the cache backend (e.g. a shared Redis-compatible stand-in)."""
+    global _backend
+    _backend = backend
+
+
+def _cache_key(backend, namespace, kwargs):
+    # keys embed a generation counter bumped on every write, so a response
+    # computed from pre-write data can never be stored under a live key
+    query = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    if kwargs:
+        item = ':'.join(str(v) for _, v in sorted(kwargs.items()))
+        generation = backend.get_counter(f'gen:{namespace}:{item}')
+        return f'{namespace}:item:{item}:{generation}:{query}'
+    # list responses vary by query string and are all orphaned at once
+    generation = backend.get_counter(f'gen:{namespace}')
+    return f'{namespace}:list:{generation}:{query}'
+
+
+# response headers stored alongside the body, needed for conditional GETs
+CACHED_HEADERS = ('Last-Modified',)
+
+
+def _pack(resp):
+    head = ''.join(f'{h}: {resp.headers[h]}\n' for h in CACHED_HEADERS if h in resp.headers)
+    return head.encode('latin-1') + b'\n' + resp.get_data()
+
+
+def _unpack(entry):
+    headers = {}
+    while not entry.startswith(b'\n'):
+        line, _, entry = entry.partition(b'\n')
+        name, _, value = line.decode('latin-1').partition(': ')
+        headers[name] = value
+    return headers, entry[1:]
+
+
+def cached(namespace, ttl=None):
+    """Read-through cache for a GET JSON view.
+
+    Only 200 responses are stored, as the serialized body. Views taking URL
+    arguments are cached per item; the others per query string.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            backend = get_backend()
+            if backend is None:
+                return view(*args, **kwargs)
+            try:
+                key = _cache_key(backend, namespace, kwargs)
+                entry = backend.get(key)
+            except Exception as e:
+                current_app.logger.warning("cache unavailable: %s", e)
+                return view(*args, **kwargs)
+
+            if entry is not None:
+                headers, body = _unpack(entry)
+                resp = current_app.response_class(body, status=200, mimetype='application/json',
+                                                  headers=headers)
+                resp.headers['X-Cache'] = 'HIT'
+                return resp
+
+            resp = current_app.make_response(view(*args, **kwargs))
+            if resp.status_code == 200:
+                try:
+                    backend.set(key, _pack(resp), ttl or CACHE_CONFIG['ttl'])
+                except Exception as e:
+                    current_app.logger.warning("cache unavailable: %s", e)
+                resp.headers['X-Cache'] = 'MISS'
+            return resp
+        return wrapper
+    return decorator
+
+
+def invalidate(namespace, *item_ids):
+    """Drop cached responses of `namespace` after a write.
+
+    Every list variant is invalidated; item entries only for `item_ids`.
+    """
+    global _invalidations
+    backend = get_backend()
+    if backend is None:
+        return
+    try:
+        backend.incr(f'gen:{namespace}')
+        for item_id in item_ids:
+            backend.incr(f'gen:{namespace}:{item_id}')
+    except Exception as e:
+        current_app.logger.warning("cache invalidation failed: %s", e)
+    _invalidations += 1
+
+
+@bp.route('/health/cache', methods=['GET'])
+def check_cache_health():
+    """Hit/miss/eviction counters of the response cache"""
+    backend = get_backend()
+    if backend is None:
+        return jsonify({"backend": "none"}), 200
+    return jsonify({
+        "backend": CACHE_CONFIG['backend'],
+        "invalidations": _invalidations,
+        "stats": backend.stats(),
+    }), 200
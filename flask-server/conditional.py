@@ -0,0 +1,24 @@
+from flask import Blueprint, request, session
+
+bp = Blueprint('conditional', __name__)
+
+
+@bp.after_app_request
+def add_validators(resp):
+    """Give successful JSON GET responses a strong ETag and answer 304s.
+
+    The ETag is a hash of the serialized body, so it is identical across
+    workers and restarts. Handlers may set `last_modified` themselves; the
+    response is then also conditional on If-Modified-Since. When the body
+    comes from the response cache no query runs for a 304 at all.
+    """
+    if request.method not in ('GET', 'HEAD') or resp.status_code != 200:
+        return resp
+    if resp.mimetype != 'application/json' or resp.is_streamed:
+        return resp
+
+    resp.add_etag()
+    if 'Cache-Control' not in resp.headers:
+        # let browsers and the CDN keep a copy but revalidate every time
+        resp.headers['Cache-Control'] = 'private, no-cache' if session.get('user_id') else 'no-cache'
+    return resp.make_conditional(request)
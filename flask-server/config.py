@@ -0,0 +1,153 @@
+import os
+
+# blueprints registered by create_app(), imported only when it runs
+DEFAULT_BLUEPRINTS = (
+    'db',
+    'cache',
+    'conditional',
+    'models.user',
+    'models.company',
+    'models.application',
+    'models.application_log',
+    'models.advertisement',
+    'models.auth',
+    'models.uploads',
+    'models.candidate',
+    'models.stats',
+    'metrics',
+    'query_recorder',
+)
+
+# setting -> (environment variable, default, type)
+SETTINGS = {
+    'SECRET_KEY': ('FLASK_SECRET_KEY', 'dev-secret-key', str),
+    'FRONTEND_ORIGIN': ('FRONTEND_ORIGIN', 'http://localhost:5173', str),
+
+    'DB_HOST': ('DB_HOST', 'db', str),
+    'DB_USER': ('DB_USER', 'root', str),
+    'DB_PASSWORD': ('DB_PASSWORD', 'mypassword', str),
+    'DB_NAME': ('DB_NAME', 'react_flask_db', str),
+    'DB_POOL_MIN_SIZE': ('DB_POOL_MIN_SIZE', 1, int),
+    'DB_POOL_MAX_SIZE': ('DB_POOL_MAX_SIZE', 10, int),
+    # MySQL's max_connections; gunicorn refuses to start when its workers'
+    # pools could open that many (the CV worker and scripts need some too)
+    'DB_MAX_CONNECTIONS': ('DB_MAX_CONNECTIONS', 151, int),
+    # seconds a request waits for a free connection before giving up
+    'DB_POOL_TIMEOUT': ('DB_POOL_TIMEOUT', 5.0, float),
+    # idle connections above min_size are closed after this many seconds
+    'DB_POOL_MAX_IDLE': ('DB_POOL_MAX_IDLE', 300.0, float),
+    # connections idle for longer than this are pinged before being handed out
+    'DB_POOL_PING_INTERVAL': ('DB_POOL_PING_INTERVAL', 30.0, float),
+
+    # "memory", "redis" (any Redis-compatible server) or "none"
+    'CACHE_BACKEND': ('CACHE_BACKEND', 'memory', str),
+    'CACHE_MAX_ENTRIES': ('CACHE_MAX_ENTRIES', 1024, int),
+    'CACHE_TTL': ('CACHE_TTL', 60.0, float),
+    'CACHE_REDIS_URL': ('CACHE_REDIS_URL', 'redis://localhost:6379/0', str),
+    'CACHE_KEY_PREFIX': ('CACHE_KEY_PREFIX', 'jobconnect:', str),
+
+    # "cookie" (Flask's signed cookie), "memory" (single process only) or
+    # "redis": server-side sessions, the cookie holds an opaque id (sessions.py)
+    'SESSION_BACKEND': ('SESSION_BACKEND', 'cookie', str),
+    # server-side sessions expire after this many seconds without activity
+    'SESSION_TTL': ('SESSION_TTL', 7 * 24 * 3600, int),
+    'SESSION_PROFILE_TTL': ('SESSION_PROFILE_TTL', 300, int),
+    'SESSION_MAX_ENTRIES': ('SESSION_MAX_ENTRIES', 100000, int),
+    'SESSION_REDIS_URL': ('SESSION_REDIS_URL', 'redis://localhost:6379/1', str),
+
+    # werkzeug method, "scrypt:N:r:p" or "pbkdf2:sha256:iterations" (passwords.py);
+    # each scrypt hash in progress takes 128 * N * r bytes (32 MiB by default)
+    'PASSWORD_HASH_METHOD': ('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1', str),
+    # hashing threads per process, and how many more hashes may wait for one
+    'PASSWORD_HASH_WORKERS': ('PASSWORD_HASH_WORKERS', 2, int),
+    'PASSWORD_HASH_QUEUE': ('PASSWORD_HASH_QUEUE', 16, int),
+    # seconds a login waits for a hashing slot before answering 503
+    'PASSWORD_HASH_TIMEOUT': ('PASSWORD_HASH_TIMEOUT', 2.0, float),
+    # login attempts per client IP and per account (ratelimit.py)
+    'LOGIN_RATE_LIMIT': ('LOGIN_RATE_LIMIT', True, bool),
+    'LOGIN_IP_BURST': ('LOGIN_IP_BURST', 30, int),
+    'LOGIN_IP_PER_MINUTE': ('LOGIN_IP_PER_MINUTE', 30.0, float),
+    'LOGIN_ACCOUNT_BURST': ('LOGIN_ACCOUNT_BURST', 10, int),
+    'LOGIN_ACCOUNT_PER_MINUTE': ('LOGIN_ACCOUNT_PER_MINUTE', 2.0, float),
+    'LOGIN_RATE_MAX_KEYS': ('LOGIN_RATE_MAX_KEYS', 100000, int),
+    # reverse proxies in front of the app whose X-Forwarded-For is trusted
+    'TRUSTED_PROXIES': ('TRUSTED_PROXIES', 0, int),
+
+    # "mysql" uses the FULLTEXT index, "memory" the in-process index
+    'SEARCH_BACKEND': ('SEARCH_BACKEND', 'mysql', str),
+
+    # application_log rows older than this are moved to gzip files (log_archive.py)
+    'LOG_ARCHIVE_DIR': ('LOG_ARCHIVE_DIR', 'archive', str),
+    'LOG_ARCHIVE_AFTER_DAYS': ('LOG_ARCHIVE_AFTER_DAYS', 365, int),
+    'LOG_ARCHIVE_BATCH_SIZE': ('LOG_ARCHIVE_BATCH_SIZE', 1000, int),
+
+    # uploaded CVs, stored once per content hash (cv_store.py)
+    'CV_STORE_DIR': ('CV_STORE_DIR', 'uploads/cv', str),
+    'CV_MAX_BYTES': ('CV_MAX_BYTES', 5 * 1024 * 1024, int),
+    # unreferenced files younger than this are kept by `cv_store.py gc`
+    'CV_GC_GRACE_HOURS': ('CV_GC_GRACE_HOURS', 24.0, float),
+    # text extraction worker (cv_text.py) feeding GET /candidates/search
+    'CV_TEXT_WORKERS': ('CV_TEXT_WORKERS', 2, int),
+    'CV_TEXT_BATCH_SIZE': ('CV_TEXT_BATCH_SIZE', 20, int),
+    'CV_TEXT_POLL_SECONDS': ('CV_TEXT_POLL_SECONDS', 5.0, float),
+    'CV_TEXT_MAX_CHARS': ('CV_TEXT_MAX_CHARS', 100000, int),
+    # "" serves /uploads from the workers (sendfile under gunicorn),
+    # "x-accel-redirect" (nginx) or "x-sendfile" (Apache, lighttpd) let the
+    # reverse proxy send the file; X-Accel-Redirect points under UPLOADS_ACCEL_PREFIX
+    'UPLOADS_OFFLOAD': ('UPLOADS_OFFLOAD', '', str),
+    'UPLOADS_ACCEL_PREFIX': ('UPLOADS_ACCEL_PREFIX', '/internal-uploads/', str),
+
+    # per-endpoint request/SQL/JSON timings at GET /metrics (metrics.py)
+    'METRICS_ENABLED': ('METRICS_ENABLED', False, bool),
+    'METRICS_SERVER_TIMING': ('METRICS_SERVER_TIMING', True, bool),
+    'METRICS_SLOW_QUERY_MS': ('METRICS_SLOW_QUERY_MS', 100.0, float),
+    # share of the slow queries written to the log
+    'METRICS_SLOW_QUERY_SAMPLE': ('METRICS_SLOW_QUERY_SAMPLE', 0.1, float),
+    # shared by gunicorn workers; "" keeps the figures of each process apart
+    'METRICS_DIR': ('METRICS_DIR', '', str),
+
+    # development/test query recorder (query_recorder.py): "off", "warn" or
+    # "strict" (a view over its @query_budget fails the request)
+    'QUERY_RECORDER': ('QUERY_RECORDER', 'off', str),
+    # same-shape statements per request reported as a likely N+1
+    'QUERY_RECORDER_REPEAT': ('QUERY_RECORDER_REPEAT', 3, int),
+    # statements slower than this are EXPLAINed
+    'QUERY_RECORDER_EXPLAIN_MS': ('QUERY_RECORDER_EXPLAIN_MS', 20.0, float),
+
+    # open the DB pool, build the search index and fill the response cache
+    # inside create_app() instead of on the first requests (every gunicorn
+    # worker does it); the paths are small first pages, not whole tables
+    'WARMUP': ('APP_WARMUP', False, bool),
+    'WARMUP_PATHS': ('APP_WARMUP_PATHS', ('/stats', '/advertisements?limit=20'), tuple),
+    'BLUEPRINTS': ('APP_BLUEPRINTS', DEFAULT_BLUEPRINTS, tuple),
+}
+
+
+def _parse(value, kind):
+    if kind is bool:
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    if kind is tuple:
+        return tuple(v.strip() for v in value.split(',') if v.strip())
+    return kind(value)
+
+
+_dotenv_loaded = False
+
+
+def load_config(overrides=None):
+    """Return every setting, read from the environment (and .env) once.
+
+    `overrides` (a dict) wins over the environment, e.g. in tests.
+    """
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
+
+    config = {}
+    for name, (env, default, kind) in SETTINGS.items():
+        raw = os.environ.get(env)
+        config[name] = default if raw is None else _parse(raw, kind)
+    config.update(overrides or {})
+    return config
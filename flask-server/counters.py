@@ -0,0 +1,106 @@
+# Counters behind GET /stats, kept in the stat_counter table by the write
+# handlers within their own transaction. MySQL does not fire triggers for
+# ON DELETE CASCADE, so handlers account for cascaded rows themselves.
+# `python counters.py rebuild` recomputes everything from the base tables.
+from collections import Counter
+
+ADVERTISEMENTS = "advertisements"
+COMPANIES = "companies"
+APPLICATIONS_BY_STATUS = "applications_by_status"
+ADVERTISEMENTS_BY_COMPANY = "advertisements_by_company"
+ADVERTISEMENTS_BY_EMPLOYMENT_TYPE = "advertisements_by_employment_type"
+
+
+def adjust(cursor, deltas):
+    """Apply {counter name: delta} in one statement on the caller's transaction."""
+    rows = [(name, delta) for name, delta in deltas.items() if delta]
+    if not rows:
+        return
+    placeholders = ", ".join(["(%s, %s)"] * len(rows))
+    cursor.execute(
+        f"INSERT INTO stat_counter (name, value) VALUES {placeholders}"
+        " ON DUPLICATE KEY UPDATE value = value + VALUES(value)",
+        [v for row in rows for v in row],
+    )
+
+
+def advertisement_deltas(ads, sign=1):
+    """Counter deltas for creating (sign=1) or deleting (sign=-1) advertisements.
+
+    `ads` are dicts with at least company_id and employment_type.
+    """
+    deltas = Counter()
+    for ad in ads:
+        deltas[ADVERTISEMENTS] += sign
+        deltas[f"{ADVERTISEMENTS_BY_COMPANY}:{ad['company_id']}"] += sign
+        if ad.get("employment_type"):
+            deltas[f"{ADVERTISEMENTS_BY_EMPLOYMENT_TYPE}:{ad['employment_type']}"] += sign
+    return deltas
+
+
+def status_deltas(statuses, sign=1):
+    """Counter deltas for applications entering (1) or leaving (-1) statuses."""
+    deltas = Counter()
+    for status in statuses:
+        deltas[f"{APPLICATIONS_BY_STATUS}:{status}"] += sign
+    return deltas
+
+
+def cascaded_application_deltas(cursor, where, params):
+    """Deltas for the applications a DELETE is about to cascade to."""
+    cursor.execute(f"SELECT status, COUNT(*) AS n FROM application WHERE {where} GROUP BY status", params)
+    deltas = Counter()
+    for row in cursor.fetchall():
+        deltas[f"{APPLICATIONS_BY_STATUS}:{row['status']}"] -= row["n"]
+    return deltas
+
+
+def read(cursor):
+    """Return the counters shaped for the /stats response."""
+    cursor.execute("SELECT name, value FROM stat_counter WHERE value <> 0")
+    stats = {
+        ADVERTISEMENTS: 0,
+        COMPANIES: 0,
+        APPLICATIONS_BY_STATUS: {},
+        ADVERTISEMENTS_BY_COMPANY: {},
+        ADVERTISEMENTS_BY_EMPLOYMENT_TYPE: {},
+    }
+    for row in cursor.fetchall():
+        group, _, key = row["name"].partition(":")
+        if key:
+            stats.setdefault(group, {})[key] = int(row["value"])
+        else:
+            stats[group] = int(row["value"])
+    return stats
+
+
+def rebuild(conn):
+    """Recompute every counter from the base tables in one transaction."""
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM stat_counter")
+        cursor.execute(f"""
+            INSERT INTO stat_counter (name, value)
+            SELECT '{ADVERTISEMENTS}', COUNT(*) FROM advertisement
+            UNION ALL SELECT '{COMPANIES}', COUNT(*) FROM company
+            UNION ALL SELECT CONCAT('{APPLICATIONS_BY_STATUS}:', status), COUNT(*)
+                FROM application GROUP BY status
+            UNION ALL SELECT CONCAT('{ADVERTISEMENTS_BY_COMPANY}:', company_id), COUNT(*)
+                FROM advertisement GROUP BY company_id
+            UNION ALL SELECT CONCAT('{ADVERTISEMENTS_BY_EMPLOYMENT_TYPE}:', employment_type), COUNT(*)
+                FROM advertisement WHERE employment_type IS NOT NULL GROUP BY employment_type
+        """)
+    conn.commit()
+
+
+if __name__ == "__main__":
+    import sys
+    from db import get_db_connection
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python counters.py rebuild")
+    conn = get_db_connection()
+    try:
+        rebuild(conn)
+    finally:
+        conn.close()
+    print("stat_counter rebuilt")
@@ -0,0 +1,340 @@
+# Content-addressed storage of uploaded CVs.
+#   python cv_store.py rebuild
+#   python cv_store.py gc [grace_hours]
+# Uploads are read from the request body in chunks, never buffered whole:
+# the size limit is checked while reading and the sha256 computed on the fly,
+# then the file is renamed to uploads/cv/ab/cd/<sha256><ext>. A CV sent with
+# 50 applications is stored once. stored_file.refcount counts the
+# user_account.cv and application_log.cv values pointing at each file; the
+# write handlers adjust it within their own transaction, like counters.py.
+# Log rows moved to the archive keep their reference. `gc` removes files
+# nobody references once they are older than CV_GC_GRACE_HOURS (POST /upload
+# stores the file before the application that uses it is sent); `rebuild`
+# recomputes every refcount from the tables and the log archive.
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+
+from werkzeug.exceptions import ClientDisconnected, RequestEntityTooLarge
+from werkzeug.sansio.multipart import NEED_DATA, Data, Epilogue, File, MultipartDecoder
+
+import log_archive
+from db import get_db_connection
+
+CV_MIME_TYPES = {
+    "application/pdf": ".pdf",
+    "application/msword": ".doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+}
+# public paths of stored files; /uploads/<path> is served by models.uploads
+STORE_URL_PREFIX = "/uploads/cv/"
+# bytes read from the request body at a time
+CHUNK_SIZE = 64 * 1024
+# room for the multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+STORE_CONFIG = {}
+
+_STORED_PATH_RE = re.compile(re.escape(STORE_URL_PREFIX) + r"[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z]+$")
+
+
+class UploadError(ValueError):
+    """Raised when an upload is missing, of the wrong type or too large."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def configure(config):
+    directory = config['CV_STORE_DIR']
+    if not os.path.isabs(directory):
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), directory)
+    STORE_CONFIG.update({
+        'dir': directory,
+        'max_bytes': config['CV_MAX_BYTES'],
+        'gc_grace_hours': config['CV_GC_GRACE_HOURS'],
+    })
+
+
+def _settings():
+    if not STORE_CONFIG:
+        from config import load_config
+        configure(load_config())
+    return STORE_CONFIG
+
+
+def _public_path(digest, ext):
+    return f"{STORE_URL_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def stored_digest(path):
+    """sha256 of the content behind a public path of the store, else None."""
+    match = _STORED_PATH_RE.match(path)
+    return match.group(1) if match else None
+
+
+def store_dir():
+    return _settings()['dir']
+
+
+def file_path(path):
+    """Location on disk of a stored file given its public path."""
+    return os.path.join(store_dir(), *path[len(STORE_URL_PREFIX):].split("/"))
+
+
+def _too_large(limit):
+    return UploadError(f"file exceeds {limit // (1024 * 1024)}MB", 413)
+
+
+def _multipart_events(stream, boundary):
+    # the decoder buffers at most one chunk plus the headers of a part
+    decoder = MultipartDecoder(boundary.encode("latin-1"), max_form_memory_size=CHUNK_SIZE + MULTIPART_OVERHEAD)
+    finished = False
+    while True:
+        try:
+            event = decoder.next_event()
+        except ValueError:
+            raise UploadError("malformed multipart body")
+        if event is NEED_DATA:
+            if finished:
+                raise UploadError("truncated multipart body")
+            data = stream.read(CHUNK_SIZE)
+            finished = not data
+            decoder.receive_data(data or None)
+            continue
+        if isinstance(event, Epilogue):
+            return
+        yield event
+
+
+def _open_upload(req, field, allowed_types):
+    """Return (mimetype, iterator over the bytes of the uploaded file).
+
+    The file is the `field` part of a multipart form, or the whole body when
+    it is sent with one of `allowed_types` as Content-Type. The type is
+    checked before any content is read.
+    """
+    if req.mimetype == "multipart/form-data":
+        boundary = req.mimetype_params.get("boundary")
+        if not boundary:
+            raise UploadError("missing multipart boundary")
+        events = _multipart_events(req.stream, boundary)
+        for event in events:
+            if isinstance(event, File) and event.name == field:
+                break
+        else:
+            raise UploadError(f"{field} is required")
+        if not event.filename:
+            raise UploadError("empty filename")
+        mimetype = (event.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if mimetype not in allowed_types:
+            raise UploadError(f"unsupported file type: {mimetype or 'unknown'}")
+
+        def chunks():
+            for event in events:
+                if isinstance(event, Data):
+                    yield event.data
+                    if not event.more_data:
+                        return
+        return mimetype, chunks()
+
+    if req.mimetype not in allowed_types:
+        raise UploadError(f"{field} is required")
+    stream = req.stream
+    return req.mimetype, iter(lambda: stream.read(CHUNK_SIZE), b"")
+
+
+def _spool(chunks, limit):
+    """Write `chunks` to a temporary file; return (tmp path, sha256, size)."""
+    tmp_dir = os.path.join(_settings()['dir'], "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+    digest, size = hashlib.sha256(), 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > limit:
+                    raise _too_large(limit)
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    if not size:
+        os.unlink(tmp)
+        raise UploadError("empty file")
+    return tmp, digest.hexdigest(), size
+
+
+def _store(conn, tmp, digest, size, mimetype):
+    """Register the content and move it into place; return its public path.
+
+    The row is written (and its last_uploaded_at bumped, which keeps `gc`
+    away) before the rename and committed after it: `gc` deletes the file
+    while holding the row lock, so an upload of the same content waits for
+    it and then puts the file back, and cv_text.py never sees a new row
+    whose file is not there yet.
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO stored_file (sha256, path, size, mime_type, last_uploaded_at)
+                VALUES (%s, %s, %s, %s, NOW())
+                ON DUPLICATE KEY UPDATE last_uploaded_at = NOW()
+                """,
+                (digest, _public_path(digest, CV_MIME_TYPES[mimetype]), size, mimetype),
+            )
+            # the first upload of this content chose the extension
+            cursor.execute("SELECT path FROM stored_file WHERE sha256 = %s", (digest,))
+            path = cursor.fetchone()["path"]
+        dest = file_path(path)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        # same bytes as any file already there: replacing it is harmless
+        os.replace(tmp, dest)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return path
+
+
+def receive(req, field="file", allowed_types=CV_MIME_TYPES):
+    """Stream the uploaded CV of `req` into the store; return its public path.
+
+    Bodies announcing more than CV_MAX_BYTES (plus multipart overhead) are
+    refused before reading anything; the limit is enforced again while
+    reading, for chunked bodies without a Content-Length. The new file has
+    no reference until a user or an application points at it.
+    """
+    limit = _settings()['max_bytes']
+    # per-request MAX_CONTENT_LENGTH: Werkzeug cuts the body stream there
+    req.max_content_length = limit + MULTIPART_OVERHEAD
+    if req.content_length is not None and req.content_length > req.max_content_length:
+        raise _too_large(limit)
+    try:
+        mimetype, chunks = _open_upload(req, field, allowed_types)
+        tmp, digest, size = _spool(chunks, limit)
+    except RequestEntityTooLarge:
+        raise _too_large(limit)
+    except ClientDisconnected:
+        raise UploadError("upload interrupted")
+
+    # the connection is taken only once the body has been read
+    conn = get_db_connection()
+    try:
+        return _store(conn, tmp, digest, size, mimetype)
+    finally:
+        conn.close()
+
+
+def adjust_refs(cursor, deltas):
+    """Apply {public path: delta} to stored_file.refcount on the caller's transaction.
+
+    Paths outside the store (older uploads, external links) are ignored.
+    """
+    rows = [(path, delta) for path, delta in deltas.items()
+            if delta and path and path.startswith(STORE_URL_PREFIX)]
+    if not rows:
+        return
+    cases = " ".join(["WHEN %s THEN %s"] * len(rows))
+    in_paths = ", ".join(["%s"] * len(rows))
+    cursor.execute(
+        f"UPDATE stored_file SET refcount = refcount + CASE path {cases} END WHERE path IN ({in_paths})",
+        [v for row in rows for v in row] + [path for path, _ in rows],
+    )
+
+
+def adjust_user_cv_ref(cursor, user_id, delta):
+    """Adjust the refcount of the file user_account.cv of `user_id` points at."""
+    cursor.execute(
+        """
+        UPDATE stored_file f JOIN user_account u ON u.cv = f.path
+        SET f.refcount = f.refcount + %s
+        WHERE u.id = %s
+        """,
+        (delta, user_id),
+    )
+
+
+def rebuild(conn):
+    """Recompute every refcount from the tables and the log archive."""
+    refs, seen = Counter(), set()
+    for row in log_archive.iter_rows():
+        # a batch archived twice after a crash counts once
+        if row["id"] not in seen:
+            seen.add(row["id"])
+            if row.get("cv"):
+                refs[row["cv"]] += 1
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT cv, COUNT(*) AS n FROM (
+                SELECT cv FROM user_account WHERE cv LIKE %s
+                UNION ALL SELECT cv FROM application_log WHERE cv LIKE %s
+            ) refs GROUP BY cv
+            """,
+            (STORE_URL_PREFIX + "%", STORE_URL_PREFIX + "%"),
+        )
+        for row in cursor.fetchall():
+            refs[row["cv"]] += row["n"]
+        cursor.execute("UPDATE stored_file SET refcount = 0")
+        adjust_refs(cursor, refs)
+    conn.commit()
+
+
+def gc(conn, grace_hours=None, now=None):
+    """Delete unreferenced files uploaded before the grace period; return their paths."""
+    hours = _settings()['gc_grace_hours'] if grace_hours is None else grace_hours
+    cutoff = (now or datetime.now()) - timedelta(hours=hours)
+    removed = []
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT sha256, path FROM stored_file WHERE refcount <= 0 AND last_uploaded_at < %s FOR UPDATE",
+            (cutoff,),
+        )
+        rows = cursor.fetchall()
+        for row in rows:
+            # unlink before the commit: a concurrent upload of the same
+            # content is blocked on the row lock until then
+            try:
+                os.unlink(file_path(row["path"]))
+            except FileNotFoundError:
+                pass
+            removed.append(row["path"])
+        if rows:
+            in_digests = ", ".join(["%s"] * len(rows))
+            digests = [row["sha256"] for row in rows]
+            cursor.execute(f"DELETE FROM stored_file_text WHERE sha256 IN ({in_digests})", digests)
+            cursor.execute(f"DELETE FROM stored_file WHERE sha256 IN ({in_digests})", digests)
+    conn.commit()
+    return removed
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1:2]
+    if command == ["rebuild"] and len(sys.argv) == 2:
+        conn = get_db_connection()
+        try:
+            rebuild(conn)
+        finally:
+            conn.close()
+        print("stored_file refcounts rebuilt")
+    elif command == ["gc"] and len(sys.argv) <= 3:
+        conn = get_db_connection()
+        try:
+            removed = gc(conn, float(sys.argv[2]) if len(sys.argv) == 3 else None)
+        finally:
+            conn.close()
+        print(f"{len(removed)} unreferenced file(s) removed")
+    else:
+        sys.exit("usage: python cv_store.py rebuild | gc [grace_hours]")
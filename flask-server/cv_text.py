@@ -0,0 +1,142 @@
+# Text extraction of stored CVs, searched by GET /candidates/search.
+#   python cv_text.py run     # keeps polling for new uploads (worker service)
+#   python cv_text.py once    # processes what is pending and exits (cron)
+# Uploads never wait for this: stored_file rows start with
+# text_status = 'pending' and this worker picks them up in batches of
+# CV_TEXT_BATCH_SIZE, extracting in a pool of CV_TEXT_WORKERS processes.
+# The text is stored per sha256 in stored_file_text, so a CV uploaded
+# again (same content) is never processed twice. PDFs go through pypdf,
+# .docx files are read as zip + XML; old binary .doc files are marked
+# 'unsupported'. A single worker runs at a time (flock in the CV store).
+import fcntl
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+import pypdf
+
+import cv_store
+from db import get_db_connection
+
+logger = logging.getLogger("cv_text")
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# a CV is a few pages; longer PDFs are only read this far
+MAX_PDF_PAGES = 20
+
+
+def _pdf_text(path):
+    reader = pypdf.PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages[:MAX_PDF_PAGES])
+
+
+def _docx_text(path):
+    with zipfile.ZipFile(path) as archive:
+        with archive.open("word/document.xml") as f:
+            paragraphs, words = [], []
+            for _, elem in ElementTree.iterparse(f):
+                if elem.tag == _WORD_NS + "t" and elem.text:
+                    words.append(elem.text)
+                elif elem.tag == _WORD_NS + "tab":
+                    words.append("\t")
+                elif elem.tag == _WORD_NS + "p":
+                    paragraphs.append("".join(words))
+                    words = []
+                    elem.clear()
+    return "\n".join(paragraphs)
+
+
+EXTRACTORS = {
+    "application/pdf": _pdf_text,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": _docx_text,
+}
+
+
+def extract(path, mimetype, max_chars):
+    """Text of one file, whitespace-normalised and cut at `max_chars` (runs in the pool)."""
+    text = EXTRACTORS[mimetype](path)
+    return " ".join(text.split())[:max_chars]
+
+
+def process_pending(conn, pool, batch_size, max_chars):
+    """Extract the text of one batch of pending files; return how many were handled."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT sha256, path, mime_type FROM stored_file WHERE text_status = 'pending'"
+            " ORDER BY last_uploaded_at LIMIT %s",
+            (batch_size,),
+        )
+        rows = cursor.fetchall()
+    conn.commit()
+    if not rows:
+        return 0
+
+    jobs = {
+        row["sha256"]: pool.submit(extract, cv_store.file_path(row["path"]), row["mime_type"], max_chars)
+        for row in rows if row["mime_type"] in EXTRACTORS
+    }
+    texts, statuses = [], []
+    for row in rows:
+        job = jobs.get(row["sha256"])
+        if job is None:
+            statuses.append(("unsupported", row["sha256"]))
+            continue
+        try:
+            texts.append((row["sha256"], job.result()))
+            statuses.append(("done", row["sha256"]))
+        except Exception as e:
+            # corrupt, encrypted or already removed by `cv_store.py gc`
+            logger.warning("text extraction of %s failed: %s", row["path"], e)
+            statuses.append(("failed", row["sha256"]))
+
+    with conn.cursor() as cursor:
+        if texts:
+            cursor.executemany(
+                "INSERT INTO stored_file_text (sha256, content) VALUES (%s, %s)"
+                " ON DUPLICATE KEY UPDATE content = VALUES(content), extracted_at = NOW()",
+                texts,
+            )
+        cursor.executemany("UPDATE stored_file SET text_status = %s WHERE sha256 = %s", statuses)
+    conn.commit()
+    return len(rows)
+
+
+def run(workers, batch_size, max_chars, poll_seconds=None):
+    """Process pending files; keep polling every `poll_seconds` unless None.
+
+    A connection is taken for each batch, none is held while idle. Returns
+    the number of files handled (only reached without polling).
+    """
+    handled = 0
+    os.makedirs(cv_store.store_dir(), exist_ok=True)
+    with open(os.path.join(cv_store.store_dir(), ".text.lock"), "w") as lock, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        while True:
+            conn = get_db_connection()
+            try:
+                count = process_pending(conn, pool, batch_size, max_chars)
+            finally:
+                conn.close()
+            handled += count
+            if count:
+                continue
+            if poll_seconds is None:
+                return handled
+            time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    import sys
+    from config import load_config
+
+    if sys.argv[1:] not in (["run"], ["once"]):
+        sys.exit("usage: python cv_text.py run | once")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    settings = load_config()
+    handled = run(settings['CV_TEXT_WORKERS'], settings['CV_TEXT_BATCH_SIZE'], settings['CV_TEXT_MAX_CHARS'],
+                  settings['CV_TEXT_POLL_SECONDS'] if sys.argv[1] == "run" else None)
+    print(f"{handled} file(s) processed")
@@ -1,23 +1,65 @@
 from flask import Blueprint, jsonify, current_app
 import pymysql
 import os
-from dotenv import load_dotenv
-load_dotenv()
+import threading
+import time
+from collections import deque
+from config import load_config
 
 
 bp = Blueprint('db', __name__)
 
+# filled by configure(), see config.py for the settings
 DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'db'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'mypassword'),
-    'database': os.getenv('DB_NAME', 'react_flask_db'),
     'charset': 'utf8mb4',
     'cursorclass': pymysql.cursors.DictCursor,
 }
+POOL_CONFIG = {}
 
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
 
-def get_db_connection():
+# instrumentation hooks, e.g. metrics.py; nothing is timed while both are empty
+# connect listeners: fn(seconds) for each get_db_connection()
+CONNECT_LISTENERS = []
+# query listeners: fn(query, args, seconds, rows) after each execute()/executemany();
+# rows is the size of the result set, None when unknown (unbuffered cursor)
+QUERY_LISTENERS = []
+
+
+def configure(config):
+    """Apply DB_* settings; an existing pool is replaced if they changed."""
+    global _pool
+    db_config = {
+        'host': config['DB_HOST'],
+        'user': config['DB_USER'],
+        'password': config['DB_PASSWORD'],
+        'database': config['DB_NAME'],
+    }
+    pool_config = {
+        'min_size': config['DB_POOL_MIN_SIZE'],
+        'max_size': config['DB_POOL_MAX_SIZE'],
+        'timeout': config['DB_POOL_TIMEOUT'],
+        'max_idle': config['DB_POOL_MAX_IDLE'],
+        'ping_interval': config['DB_POOL_PING_INTERVAL'],
+    }
+    with _pool_lock:
+        changed = any(DB_CONFIG.get(k) != v for k, v in db_config.items()) or pool_config != POOL_CONFIG
+        DB_CONFIG.update(db_config)
+        POOL_CONFIG.clear()
+        POOL_CONFIG.update(pool_config)
+        if changed and _pool is not None:
+            old, _pool = _pool, None
+            if _pool_pid == os.getpid():
+                old.close_all()
+
+
+class PoolTimeout(pymysql.err.OperationalError):
+    """Raised when no pooled connection became available in time."""
+
+
+def _connect():
     """Create a new DB connection using PyMySQL"""
     return pymysql.connect(host=DB_CONFIG['host'],
                            user=DB_CONFIG['user'],
@@ -28,8 +70,276 @@ def get_db_connection():
                            cursorclass=DB_CONFIG['cursorclass'])
 
 
+class PooledConnection:
+    """Proxy around a PyMySQL connection whose close() returns it to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise pymysql.err.InterfaceError(0, 'connection already returned to the pool')
+        return getattr(raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def cursor(self, *args):
+        cursor = self.raw_cursor(*args)
+        return TimedCursor(cursor) if QUERY_LISTENERS else cursor
+
+    def raw_cursor(self, *args):
+        """A cursor QUERY_LISTENERS do not hear about."""
+        return self.__getattr__('cursor')(*args)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw)
+
+    def discard(self):
+        """Close the connection instead of returning it, e.g. when an
+        unbuffered result is still pending on it."""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._discard(raw)
+
+
+class TimedCursor:
+    """Cursor proxy telling QUERY_LISTENERS how long each statement took."""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._raw.close()
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._raw.execute(query, args)
+        finally:
+            self._notify(query, args, time.perf_counter() - started)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._raw.executemany(query, args)
+        finally:
+            self._notify(query, args, time.perf_counter() - started)
+
+    def _notify(self, query, args, seconds):
+        rows = None
+        if not isinstance(self._raw, pymysql.cursors.SSCursor):
+            rows = self._raw.rowcount if self._raw.description else 0
+        for listener in QUERY_LISTENERS:
+            listener(query, args, seconds, rows)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of PyMySQL connections."""
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0,
+                 max_idle=300.0, ping_interval=30.0):
+        self._connect = connect
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.ping_interval = ping_interval
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        # (connection, last_used) pairs, most recently used on the right
+        self._idle = deque()
+        self._size = 0
+        self._waiters = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._closed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self):
+        """Check a live connection out of the pool, blocking up to `timeout`."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._available:
+            while True:
+                self._evict_idle_locked()
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # reserve the slot, connect outside of the lock
+                    self._size += 1
+                    raw, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(2013, 'timed out waiting for a database connection')
+                self._waiters += 1
+                try:
+                    self._available.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            waited = time.monotonic() - started
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            if raw is None:
+                raw = self._new_connection()
+            elif time.monotonic() - last_used > self.ping_interval:
+                raw.ping(reconnect=True)
+        except Exception:
+            self._discard(raw)
+            raise
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        """Return a connection to the pool, dropping it if it is unusable."""
+        try:
+            # end whatever transaction the handler left open so the next
+            # borrower does not read from a stale snapshot
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._available:
+            self._idle.append((raw, time.monotonic()))
+            self._available.notify()
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+            return {
+                'size': self._size,
+                'in_use': self._size - idle,
+                'idle': idle,
+                'waiters': self._waiters,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'connections_created': self._created,
+                'connections_closed': self._closed,
+                'wait_time_total_ms': round(self._wait_total * 1000, 3),
+                'wait_time_avg_ms': round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                'wait_time_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+    def fill(self):
+        """Open connections until the pool holds at least min_size of them."""
+        while True:
+            with self._lock:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                raw = self._new_connection()
+            except Exception:
+                self._discard(None)
+                raise
+            self.release(raw)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._closed += len(idle)
+        for raw, _ in idle:
+            _close_quietly(raw)
+
+    def _new_connection(self):
+        raw = self._connect()
+        with self._lock:
+            self._created += 1
+        return raw
+
+    def _discard(self, raw):
+        if raw is not None:
+            _close_quietly(raw)
+        with self._available:
+            self._size -= 1
+            if raw is not None:
+                self._closed += 1
+            self._available.notify()
+
+    def _evict_idle_locked(self):
+        # oldest connections sit on the left of the deque
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size:
+            raw, last_used = self._idle[0]
+            if now - last_used <= self.max_idle:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._closed += 1
+            _close_quietly(raw)
+
+
+def _close_quietly(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool, _pool_pid
+    if not POOL_CONFIG:
+        # used outside of create_app(), e.g. from a CLI script
+        configure(load_config())
+    # a pool inherited through fork() shares its sockets with the parent,
+    # every worker process gets a fresh one
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(_connect, **POOL_CONFIG)
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def init_pool():
+    """Create this process's pool and open its min_size connections."""
+    get_pool().fill()
+
+
+def get_db_connection():
+    """Borrow a DB connection from the pool; close() hands it back."""
+    if not CONNECT_LISTENERS:
+        return get_pool().acquire()
+    started = time.perf_counter()
+    try:
+        return get_pool().acquire()
+    finally:
+        seconds = time.perf_counter() - started
+        for listener in CONNECT_LISTENERS:
+            listener(seconds)
+
+
 @bp.route('/health/db', methods=['GET'])
-def check_db_health(): 
+def check_db_health():
     """Here just to test the health of our connexion to the db"""
     conn = None
     try:
@@ -37,9 +347,9 @@ def check_db_health():
         with conn.cursor() as cursor:
             cursor.execute("SELECT 1;")
             cursor.fetchone()
-        return jsonify({"status": "healthy:", "database": "connected"}), 200
+        return jsonify({"status": "healthy:", "database": "connected", "pool": get_pool().stats()}), 200
     except Exception as e:
-        return jsonify({"status": "unhealthy", "error": str(e)}), 500
-    finally: 
+        return jsonify({"status": "unhealthy", "error": str(e), "pool": get_pool().stats()}), 500
+    finally:
         if conn:
-            conn.close()
\ No newline at end of file
+            conn.close()
@@ -0,0 +1,128 @@
+import csv
+import io
+
+import pymysql
+from flask import Response, current_app
+
+from db import get_db_connection
+from projection import nest_relations
+
+EXPORT_FORMATS = ("json", "ndjson", "csv")
+# rows fetched from the server-side cursor and written per chunk
+EXPORT_BATCH_SIZE = 500
+
+_MIMETYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+class ExportError(ValueError):
+    """Raised when the `format` query parameter is not an export format."""
+
+
+def export_format(args):
+    """Return the requested streaming format, or None for a regular response."""
+    fmt = (args.get("format") or "").strip().lower()
+    if not fmt:
+        return None
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown format: {fmt} (expected {', '.join(EXPORT_FORMATS)})")
+    return fmt
+
+
+def stream_rows(sql, params, key, fmt, relations=None, expanded=(), then=None):
+    """Stream the rows of `sql` without holding the result set in memory.
+
+    The query runs on an unbuffered (server-side) cursor on a connection of
+    its own, taken when the body starts and held until the last row is sent:
+    a response whose body is never read (HEAD, an after_request hook that
+    fails) borrows nothing. "json" keeps the shape of the regular response
+    ({key: [...]}), "ndjson" writes one object per line and "csv" one row
+    per line with "<relation>__<column>" headers for expanded rows. `then`,
+    if given, is called with a buffered cursor on the same connection once
+    the query's rows are sent, and returns more batches of rows with the
+    same columns (e.g. archived ones). Errors raised by the query itself
+    surface before any byte is sent (the server answers 500); a failure
+    mid-stream truncates the body.
+    """
+    dumps = current_app.json.dumps
+    logger = current_app.logger
+
+    def fetched(conn, cursor):
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+        if then is not None:
+            # the unbuffered result is read to the end, the connection is free
+            with conn.cursor() as more:
+                yield from then(more)
+
+    def batches(conn, cursor):
+        for rows in fetched(conn, cursor):
+            if relations and fmt != "csv":
+                nest_relations(rows, expanded, relations)
+            yield rows
+
+    def as_json(conn, cursor):
+        yield f'{{"{key}": ['
+        first = True
+        for rows in batches(conn, cursor):
+            chunk = ",".join(dumps(row) for row in rows)
+            yield chunk if first else "," + chunk
+            first = False
+        yield "]}\n"
+
+    def as_ndjson(conn, cursor):
+        for rows in batches(conn, cursor):
+            yield "".join(dumps(row) + "\n" for row in rows)
+
+    def as_csv(conn, cursor):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow([d[0] for d in cursor.description])
+        for rows in batches(conn, cursor):
+            writer.writerows(row.values() for row in rows)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            # header of an empty result
+            yield buf.getvalue()
+
+    body = {"json": as_json, "ndjson": as_ndjson, "csv": as_csv}[fmt]
+
+    def generate():
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+            cursor.execute(sql, params)
+        except Exception:
+            conn.discard()
+            logger.exception("export of %s failed", key)
+            raise
+        finished = False
+        try:
+            yield from body(conn, cursor)
+            finished = True
+        except Exception:
+            logger.exception("export of %s aborted", key)
+        finally:
+            if finished:
+                cursor.close()
+                conn.close()
+            else:
+                # client went away or the query failed: rows may still be
+                # pending on the socket, drop the connection instead of
+                # reading them all back
+                conn.discard()
+
+    response = Response(generate(), mimetype=_MIMETYPES[fmt])
+    if fmt == "csv":
+        response.headers["Content-Disposition"] = f'attachment; filename="{key}.csv"'
+    # let a buffering reverse proxy pass the first rows through right away
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,6 @@
+# Helpers shared by the request body handling of models/*.py.
+
+
+def blank_to_none(value):
+    """`value`, or None when it is missing or only whitespace (NULL columns)."""
+    return value if (value is not None and str(value).strip() != "") else None
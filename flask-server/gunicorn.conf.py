@@ -0,0 +1,87 @@
+# Production server settings, see README_DOCKER.md.
+#   gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+import sys
+
+# "gthread": a thread per in-flight request, WEB_THREADS per worker.
+# "gevent": a greenlet per connection, so one worker holds thousands of slow
+# or idle clients; PyMySQL is pure Python and yields on its socket reads
+# once the standard library is patched.
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    # patch before the app (and its locks and sockets) is imported, also
+    # when WEB_PRELOAD imports it in the master process
+    from gevent import monkey
+    monkey.patch_all()
+
+# the settings module sits next to this file (gunicorn reads it before --chdir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import load_config  # noqa: E402
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:5000')
+# processes; each one has its own DB pool, so workers * DB_POOL_MAX_SIZE
+# must stay below MySQL's max_connections (DB_MAX_CONNECTIONS). The default,
+# 2 * CPUs + 1, is capped to what fits; an explicit WEB_WORKERS (or -w) that
+# does not fit makes on_starting refuse to start.
+_settings = load_config()
+_fitting_workers = max(1, (_settings['DB_MAX_CONNECTIONS'] - 1) // _settings['DB_POOL_MAX_SIZE'])
+workers = int(os.getenv('WEB_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, _fitting_workers)))
+if workers > 1 and 'CACHE_BACKEND' not in os.environ:
+    # one memory cache per worker would keep serving what another worker
+    # invalidated: share the cache when a Redis server is configured,
+    # otherwise go without (read here, before any worker loads the app)
+    os.environ['CACHE_BACKEND'] = 'redis' if 'CACHE_REDIS_URL' in os.environ else 'none'
+# threads per process (gthread): handlers mostly wait on MySQL
+threads = int(os.getenv('WEB_THREADS', '8'))
+# concurrent connections per process (gevent); requests beyond
+# DB_POOL_MAX_SIZE queue on the pool for up to DB_POOL_TIMEOUT seconds
+worker_connections = int(os.getenv('WEB_WORKER_CONNECTIONS', '1000'))
+keepalive = int(os.getenv('WEB_KEEPALIVE', '5'))
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+# on SIGTERM, in-flight requests get this long to finish
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+# recycle workers now and then to bound memory growth
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', '1000'))
+preload_app = os.getenv('WEB_PRELOAD', '0') == '1'
+accesslog = os.getenv('WEB_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def on_starting(server):
+    settings = load_config()
+    workers = server.cfg.workers
+    if settings['SESSION_BACKEND'] == 'memory' and workers > 1:
+        # each worker would only know the sessions it created itself
+        raise SystemExit("SESSION_BACKEND=memory needs WEB_WORKERS=1, use redis (or cookie) with more workers")
+    if settings['SEARCH_BACKEND'] == 'memory' and workers > 1:
+        # each worker's index would only see the writes it served itself
+        raise SystemExit("SEARCH_BACKEND=memory needs WEB_WORKERS=1, use mysql with more workers")
+    if settings['CACHE_BACKEND'] == 'memory' and workers > 1:
+        # invalidations only reach the cache of the worker that made the write
+        raise SystemExit("CACHE_BACKEND=memory needs WEB_WORKERS=1, use redis (or none) with more workers")
+    if workers * settings['DB_POOL_MAX_SIZE'] >= settings['DB_MAX_CONNECTIONS']:
+        # under load MySQL would refuse connections with "Too many connections"
+        raise SystemExit(
+            f"WEB_WORKERS={workers} x DB_POOL_MAX_SIZE={settings['DB_POOL_MAX_SIZE']} connections "
+            f"do not fit in DB_MAX_CONNECTIONS={settings['DB_MAX_CONNECTIONS']}: lower one of the first "
+            "two, or raise max_connections in MySQL and DB_MAX_CONNECTIONS with it")
+    if settings['METRICS_ENABLED'] and settings['METRICS_DIR']:
+        # totals of the workers of a previous run
+        import metrics
+        metrics.clear_dir(settings['METRICS_DIR'])
+
+
+def post_fork(server, worker):
+    import db
+    try:
+        db.init_pool()
+    except Exception as e:
+        # the pool still connects lazily on the first request
+        worker.log.warning("DB pool not warmed: %s", e)
+
+
+def worker_exit(server, worker):
+    import db
+    db.get_pool().close_all()
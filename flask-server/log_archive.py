@@ -0,0 +1,253 @@
+# Archival of old application_log rows.
+#   python log_archive.py run [days]
+# Rows older than LOG_ARCHIVE_AFTER_DAYS are appended to one gzip NDJSON file
+# per month under LOG_ARCHIVE_DIR, then deleted by primary key in batches of
+# LOG_ARCHIVE_BATCH_SIZE, each in its own short transaction. Cover letters
+# are written once per content hash under letters/ and archived rows only
+# keep the hash. application_log_archive records which months hold rows of
+# which application, so the history endpoint reads back only those files.
+# A crash between writing a batch and deleting it archives the batch again
+# on the next run; readers drop the duplicate ids.
+import fcntl
+import functools
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+import log_partitions
+
+ARCHIVE_CONFIG = {}
+
+_MONTH_FILE_RE = re.compile(r"^application_log-(\d{4})-(\d{2})\.ndjson\.gz$")
+
+
+def configure(config):
+    directory = config['LOG_ARCHIVE_DIR']
+    if not os.path.isabs(directory):
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), directory)
+    ARCHIVE_CONFIG.update({
+        'dir': directory,
+        'after_days': config['LOG_ARCHIVE_AFTER_DAYS'],
+        'batch_size': config['LOG_ARCHIVE_BATCH_SIZE'],
+    })
+
+
+def _settings():
+    if not ARCHIVE_CONFIG:
+        from config import load_config
+        configure(load_config())
+    return ARCHIVE_CONFIG
+
+
+def month_path(month):
+    return os.path.join(_settings()['dir'], f"application_log-{month.year}-{month.month:02d}.ndjson.gz")
+
+
+def _letter_path(digest):
+    return os.path.join(_settings()['dir'], "letters", digest[:2], digest + ".txt.gz")
+
+
+def store_letter(text):
+    """Write a cover letter once per content hash; return the hash."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    path = _letter_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    return digest
+
+
+def load_letter(digest):
+    with gzip.open(_letter_path(digest), "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def _append(month, rows):
+    # each call adds one gzip member; gzip readers see the concatenation
+    path = month_path(month)
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            for row in rows:
+                f.write((json.dumps(row, default=str, ensure_ascii=False) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive(conn, older_than_days=None, now=None):
+    """Move rows older than the cutoff to disk; return a summary dict."""
+    settings = _settings()
+    days = settings['after_days'] if older_than_days is None else older_than_days
+    cutoff = datetime.combine((now or datetime.now()).date() - timedelta(days=days), datetime.min.time())
+    os.makedirs(settings['dir'], exist_ok=True)
+
+    archived, letters = 0, set()
+    with open(os.path.join(settings['dir'], ".lock"), "w") as lock:
+        # one archiver at a time, appends to the month files are not atomic
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        while True:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT * FROM application_log WHERE sent_at < %s ORDER BY sent_at, id LIMIT %s",
+                    (cutoff, settings['batch_size']),
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                by_month = {}
+                for row in rows:
+                    if row.get("cover_letter"):
+                        row["cover_letter_sha256"] = store_letter(row["cover_letter"])
+                        letters.add(row["cover_letter_sha256"])
+                    row["cover_letter"] = None
+                    by_month.setdefault(row["sent_at"].date().replace(day=1), []).append(row)
+                for month, month_rows in by_month.items():
+                    _append(month, month_rows)
+
+                cursor.executemany(
+                    "INSERT IGNORE INTO application_log_archive (application_id, month) VALUES (%s, %s)",
+                    sorted({(row["application_id"], month) for month, month_rows in by_month.items()
+                            for row in month_rows}),
+                )
+                cursor.execute(
+                    "DELETE FROM application_log WHERE (id, sent_at) IN ("
+                    + ", ".join(["(%s, %s)"] * len(rows)) + ")",
+                    [v for row in rows for v in (row["id"], row["sent_at"])],
+                )
+            conn.commit()
+            archived += len(rows)
+
+    merged = log_partitions.merge_empty_partitions(conn, cutoff.date())
+    return {"cutoff": cutoff.isoformat(), "archived": archived,
+            "cover_letters": len(letters), "merged_partitions": merged}
+
+
+def _month_files():
+    """Months that have an archive file, newest first."""
+    try:
+        names = os.listdir(_settings()['dir'])
+    except FileNotFoundError:
+        return []
+    months = []
+    for name in names:
+        match = _MONTH_FILE_RE.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months, reverse=True)
+
+
+def _read_month(month):
+    try:
+        with gzip.open(month_path(month), "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                row["sent_at"] = datetime.fromisoformat(row["sent_at"])
+                yield row
+    except FileNotFoundError:
+        return
+    except EOFError:
+        # an archiver is still appending its last member; those rows are
+        # still in the table until it commits
+        return
+
+
+def iter_rows():
+    """Every archived row, newest month first (duplicates included)."""
+    for month in _month_files():
+        yield from _read_month(month)
+
+
+def archived_months(cursor, application_id):
+    cursor.execute(
+        "SELECT month FROM application_log_archive WHERE application_id = %s ORDER BY month DESC",
+        (application_id,),
+    )
+    return [row["month"] for row in cursor.fetchall()]
+
+
+def _window_rows(months, application_id=None, since=None, until=None, before=None):
+    # rows of `months` (newest first) inside the window, each month newest
+    # first, without the ids seen already
+    seen = set()
+    for month in months:
+        start = datetime(month.year, month.month, 1)
+        if (before and start > before[0]) or (until and start >= until):
+            continue
+        if since and datetime.combine(log_partitions.next_month(month), start.time()) <= since:
+            # this month and every older one end before the window
+            return
+        rows = []
+        for row in _read_month(month):
+            if application_id is not None and row["application_id"] != application_id:
+                continue
+            if since and row["sent_at"] < since:
+                continue
+            if until and row["sent_at"] >= until:
+                continue
+            if before and (row["sent_at"], row["id"]) >= before:
+                continue
+            if row["id"] in seen:
+                continue
+            seen.add(row["id"])
+            rows.append(row)
+        rows.sort(key=lambda r: (r["sent_at"], r["id"]), reverse=True)
+        yield from rows
+
+
+def _load_letters(rows, with_letters):
+    # a candidate usually sends the same letter many times
+    load = functools.lru_cache(maxsize=256)(load_letter)
+    for row in rows:
+        digest = row.pop("cover_letter_sha256", None)
+        if digest and with_letters:
+            row["cover_letter"] = load(digest)
+        yield row
+
+
+def read_page(limit, months=None, application_id=None, since=None, until=None, before=None,
+              with_letters=True):
+    """Return up to `limit` archived rows, newest first.
+
+    `months` restricts the files read (default: all), `since`/`until` bound
+    sent_at like the log endpoints and `before` is the (sent_at, id) keyset
+    of the previous page. Cover letters are loaded back when `with_letters`.
+    """
+    if months is None:
+        months = _month_files()
+    found = itertools.islice(_window_rows(months, application_id, since, until, before), limit)
+    return list(_load_letters(list(found), with_letters))
+
+
+def iter_window(since=None, until=None, with_letters=True):
+    """Every archived row with `since` <= sent_at < `until`, newest first,
+    one month file in memory at a time."""
+    return _load_letters(_window_rows(_month_files(), since=since, until=until), with_letters)
+
+
+def find_row(log_id, with_letters=True):
+    """The archived row with this id, or None; reads the month files until
+    it is found."""
+    for row in iter_rows():
+        if row["id"] == log_id:
+            return next(_load_letters([row], with_letters))
+    return None
+
+if __name__ == "__main__":
+    import sys
+    from db import get_db_connection
+
+    if sys.argv[1:2] != ["run"] or len(sys.argv) > 3:
+        sys.exit("usage: python log_archive.py run [older_than_days]")
+    conn = get_db_connection()
+    try:
+        summary = archive(conn, int(sys.argv[2]) if len(sys.argv) == 3 else None)
+    finally:
+        conn.close()
+    print(json.dumps(summary))
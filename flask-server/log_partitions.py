@@ -0,0 +1,111 @@
+# Monthly RANGE COLUMNS(sent_at) partitions of application_log (see
+# schema.sql). Rows past the last monthly partition land in p_future;
+# `python log_partitions.py ensure` splits upcoming months out of it and
+# should run at least monthly (cron, deploy hook). Months emptied by
+# log_archive.py are merged back into p_old.
+import re
+from datetime import date
+
+OLD_PARTITION = "p_old"
+FUTURE_PARTITION = "p_future"
+MONTHS_AHEAD = 3
+
+_NAME_RE = re.compile(r"^p(\d{4})_(\d{2})$")
+
+
+def partition_name(month):
+    return f"p{month.year}_{month.month:02d}"
+
+
+def next_month(month):
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def monthly_partitions(cursor):
+    """Return the first day of every month that has its own partition, sorted."""
+    cursor.execute(
+        "SELECT PARTITION_NAME AS name FROM information_schema.PARTITIONS"
+        " WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'application_log'"
+    )
+    months = []
+    for row in cursor.fetchall():
+        match = _NAME_RE.match(row["name"] or "")
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def merge_empty_partitions(conn, before):
+    """Fold the empty monthly partitions that end on or before `before`
+    into p_old, oldest first, stopping at the first one that holds rows.
+
+    REORGANIZE copies whatever rows a partition holds, so a row inserted
+    after the emptiness check is kept, unlike with DROP PARTITION. Returns
+    the names of the merged partitions.
+    """
+    with conn.cursor() as cursor:
+        months = monthly_partitions(cursor)
+        merged = []
+        # keep the newest monthly partition, ensure_partitions() starts from it
+        for month in months[:-1]:
+            if next_month(month) > before:
+                break
+            cursor.execute(f"SELECT 1 FROM application_log PARTITION ({partition_name(month)}) LIMIT 1")
+            if cursor.fetchone() is not None:
+                break
+            merged.append(month)
+        if merged:
+            names = ", ".join([OLD_PARTITION] + [partition_name(m) for m in merged])
+            bound = next_month(merged[-1]).isoformat()
+            cursor.execute(
+                f"ALTER TABLE application_log REORGANIZE PARTITION {names}"
+                f" INTO (PARTITION {OLD_PARTITION} VALUES LESS THAN ('{bound}'))"
+            )
+    return [partition_name(m) for m in merged]
+
+
+def ensure_partitions(conn, months_ahead=MONTHS_AHEAD, today=None):
+    """Create the partitions up to `months_ahead` months after the current one.
+
+    New months are split out of p_future with REORGANIZE PARTITION, which
+    only rewrites rows already in p_future (normally none). Returns the
+    names of the created partitions.
+    """
+    today = today or date.today()
+    target = date(today.year, today.month, 1)
+    for _ in range(months_ahead):
+        target = next_month(target)
+
+    with conn.cursor() as cursor:
+        existing = monthly_partitions(cursor)
+        if not existing:
+            raise RuntimeError("application_log is not partitioned by month")
+        month = next_month(existing[-1])
+        new = []
+        while month <= target:
+            new.append(month)
+            month = next_month(month)
+        if not new:
+            return []
+        definitions = ", ".join(
+            f"PARTITION {partition_name(m)} VALUES LESS THAN ('{next_month(m).isoformat()}')" for m in new
+        )
+        cursor.execute(
+            f"ALTER TABLE application_log REORGANIZE PARTITION {FUTURE_PARTITION} INTO"
+            f" ({definitions}, PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE))"
+        )
+    return [partition_name(m) for m in new]
+
+
+if __name__ == "__main__":
+    import sys
+    from db import get_db_connection
+
+    if sys.argv[1:] != ["ensure"]:
+        sys.exit("usage: python log_partitions.py ensure")
+    conn = get_db_connection()
+    try:
+        created = ensure_partitions(conn)
+    finally:
+        conn.close()
+    print("created partitions: " + (", ".join(created) or "none"))
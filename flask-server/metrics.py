@@ -0,0 +1,284 @@
+# Per-endpoint request, SQL and JSON timings, for GET /metrics (Prometheus
+# text format). Off unless METRICS_ENABLED; nothing is timed then.
+# For each request: time spent getting DB connections (pool wait + connect),
+# number of queries, time and rows of each query, time serializing JSON and
+# the total, aggregated into histograms per route and method. With
+# METRICS_SERVER_TIMING the same figures go to the Server-Timing header
+# (browser devtools show them). Queries slower than METRICS_SLOW_QUERY_MS
+# are logged to the "slow_query" logger, a METRICS_SLOW_QUERY_SAMPLE share
+# of them, without their parameters.
+# Histograms are kept per process. Under gunicorn set METRICS_DIR: every
+# worker then writes its totals there (at most once a second) and /metrics
+# adds up all the files, those of recycled workers included.
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, g, has_request_context, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+import db
+from config import load_config
+
+bp = Blueprint('metrics', __name__)
+
+logger = logging.getLogger("slow_query")
+
+METRICS_CONFIG = {}
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': ("Time to handle the request", DURATION_BUCKETS),
+    'db_connect_duration_seconds': ("Time in get_db_connection() per request", DURATION_BUCKETS),
+    'db_queries_per_request': ("SQL statements run per request", COUNT_BUCKETS),
+    'db_query_duration_seconds': ("Time of each SQL statement", DURATION_BUCKETS),
+    'db_query_rows': ("Rows returned by each SQL statement", ROW_BUCKETS),
+    'json_serialize_duration_seconds': ("Time serializing JSON per request", DURATION_BUCKETS),
+}
+COUNTERS = {
+    'http_requests_total': "Requests handled",
+    'db_slow_queries_total': "SQL statements over METRICS_SLOW_QUERY_MS",
+}
+
+# (name, labels) -> [bucket counts..., sum, count] or counter value
+_histograms = {}
+_counters = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def configure(config):
+    """Apply METRICS_* settings and (un)hook the DB instrumentation."""
+    METRICS_CONFIG.update({
+        'enabled': config['METRICS_ENABLED'],
+        'server_timing': config['METRICS_SERVER_TIMING'],
+        'slow_query_seconds': config['METRICS_SLOW_QUERY_MS'] / 1000,
+        'slow_query_sample': config['METRICS_SLOW_QUERY_SAMPLE'],
+        'dir': config['METRICS_DIR'],
+    })
+    for listeners, listener in ((db.CONNECT_LISTENERS, _on_connect), (db.QUERY_LISTENERS, _on_query)):
+        if listener in listeners:
+            listeners.remove(listener)
+        if METRICS_CONFIG['enabled']:
+            listeners.append(listener)
+
+
+def _settings():
+    if not METRICS_CONFIG:
+        configure(load_config())
+    return METRICS_CONFIG
+
+
+def _current():
+    # per-request totals, None outside of an instrumented request
+    # (CLI scripts, the body of a streamed response)
+    return g.get('metrics') if has_request_context() else None
+
+
+def _on_connect(seconds):
+    current = _current()
+    if current is not None:
+        current['connect'] += seconds
+
+
+def _on_query(query, args, seconds, rows):
+    current = _current()
+    if current is None:
+        return
+    current['queries'] += 1
+    current['db'] += seconds
+    labels = current['labels']
+    _observe('db_query_duration_seconds', labels, seconds)
+    if rows is not None:
+        _observe('db_query_rows', labels, rows)
+    settings = _settings()
+    if seconds >= settings['slow_query_seconds']:
+        _count('db_slow_queries_total', labels)
+        if random.random() < settings['slow_query_sample']:
+            statement = " ".join(query.split())
+            logger.warning("%.1f ms %s %s rows=%s: %.500s",
+                           seconds * 1000, labels[1], labels[0], rows, statement)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, adding serialization time to the request totals."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            current = _current()
+            if current is not None:
+                current['json'] += time.perf_counter() - started
+
+
+@bp.record_once
+def _install_json_provider(state):
+    if _settings()['enabled']:
+        state.app.json = TimedJSONProvider(state.app)
+
+
+def _observe(name, labels, value):
+    buckets = HISTOGRAMS[name][1]
+    with _lock:
+        entry = _histograms.get((name, labels))
+        if entry is None:
+            entry = _histograms[(name, labels)] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                entry[i] += 1
+                break
+        entry[-2] += value
+        entry[-1] += 1
+
+
+def _count(name, labels):
+    with _lock:
+        _counters[(name, labels)] = _counters.get((name, labels), 0) + 1
+
+
+@bp.before_app_request
+def _start_request():
+    if not _settings()['enabled']:
+        return
+    rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.metrics = {
+        'labels': (rule, request.method),
+        'started': time.perf_counter(),
+        'connect': 0.0, 'db': 0.0, 'json': 0.0, 'queries': 0,
+    }
+
+
+@bp.after_app_request
+def _finish_request(resp):
+    current = _current()
+    if current is None:
+        return resp
+    total = time.perf_counter() - current['started']
+    labels = current['labels']
+    _observe('http_request_duration_seconds', labels, total)
+    _observe('db_connect_duration_seconds', labels, current['connect'])
+    _observe('db_queries_per_request', labels, current['queries'])
+    _observe('json_serialize_duration_seconds', labels, current['json'])
+    _count('http_requests_total', labels + (str(resp.status_code),))
+    if _settings()['server_timing']:
+        resp.headers.add('Server-Timing', ", ".join((
+            f"conn;dur={current['connect'] * 1000:.2f}",
+            f'db;dur={current["db"] * 1000:.2f};desc="{current["queries"]} queries"',
+            f"json;dur={current['json'] * 1000:.2f}",
+            f"app;dur={total * 1000:.2f}",
+        )))
+    _flush()
+    return resp
+
+
+def _snapshot():
+    with _lock:
+        return {
+            'histograms': [[name, list(labels), list(entry)] for (name, labels), entry in _histograms.items()],
+            'counters': [[name, list(labels), value] for (name, labels), value in _counters.items()],
+        }
+
+
+def _flush(force=False):
+    """Write this process's totals to METRICS_DIR, at most once a second."""
+    global _last_flush
+    directory = _settings()['dir']
+    if not directory or not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        now = time.monotonic()
+        if not force and now - _last_flush < 1.0:
+            return
+        _last_flush = now
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(_snapshot(), f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        current_app.logger.warning("metrics not written to %s: %s", directory, e)
+    finally:
+        _flush_lock.release()
+
+
+def clear_dir(directory):
+    """Remove the files of a previous run (gunicorn start)."""
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith((".json", ".tmp")):
+                os.remove(os.path.join(directory, name))
+
+
+def _collect():
+    """Totals of this process, or of every process writing to METRICS_DIR."""
+    directory = _settings()['dir']
+    if not directory:
+        return [_snapshot()]
+    _flush(force=True)
+    snapshots = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else ():
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return snapshots
+
+
+def _label_text(names, values):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    histograms, counters = {}, {}
+    for snapshot in _collect():
+        for name, labels, entry in snapshot['histograms']:
+            total = histograms.setdefault((name, tuple(labels)), [0] * len(entry))
+            for i, value in enumerate(entry):
+                total[i] += value
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(labels))] = counters.get((name, tuple(labels)), 0) + value
+
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (metric, labels), entry in sorted(histograms.items()):
+            if metric != name:
+                continue
+            base = _label_text(("endpoint", "method"), labels)
+            cumulative = 0
+            for bound, count in zip(buckets, entry):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{base},le="+Inf"}} {entry[-1]}')
+            lines.append(f"{name}_sum{{{base}}} {float(entry[-2])!r}")
+            lines.append(f"{name}_count{{{base}}} {entry[-1]}")
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                names = ("endpoint", "method", "status")[:len(labels)]
+                lines.append(f"{name}{{{_label_text(names, labels)}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint (404 unless METRICS_ENABLED)."""
+    if not _settings()['enabled']:
+        return jsonify({"error": "not_found", "message": "metrics are disabled"}), 404
+    return Response(render(), mimetype="text/plain; version=0.0.4")
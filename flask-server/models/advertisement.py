@@ -1,17 +1,131 @@
+from datetime import date
+import pymysql
 from flask import Blueprint, jsonify, request, session
 from db import get_db_connection
+from query_recorder import query_budget
+from pagination import PaginationError, parse_limit, encode_cursor, decode_cursor
+from projection import ProjectionError, select_columns, expand_relations, nest_relations
+from models.company import COMPANY_COLUMNS
+import search_index
+from cache import cached, invalidate
+import counters
+from search_index import SEARCH_MIN_TERM_LENGTH, search_terms, snippet
+from bulk import BulkError, parse_rows, chunks, insert_rows
+from fields import blank_to_none
 
 bp = Blueprint("advertisement", __name__)
 
+AD_COLUMNS = (
+    "id", "title", "short_description", "description", "publish_date",
+    "company_id", "location", "employment_type", "work_mode", "salary_min",
+    "salary_max", "required_experience", "created_by", "created_at",
+    "updated_at",
+)
+# job cards only need the short description, leave the TEXT column out
+AD_SUMMARY_COLUMNS = tuple(c for c in AD_COLUMNS if c != "description")
+AD_REQUIRED_FIELDS = ("title", "short_description", "description", "publish_date", "company_id")
+# columns set by POST/PUT /advertisements and /advertisements/bulk
+AD_INSERT_COLUMNS = AD_REQUIRED_FIELDS + (
+    "employment_type", "work_mode", "salary_min", "salary_max", "required_experience",
+)
+EMPLOYMENT_TYPES = ("CDI", "CDD", "Alternance", "Stage")
+WORK_MODES = ("Site", "Hybride", "Remote")
+
+# expand= name -> (alias, JOIN clause, columns); advertisement is aliased "a"
+AD_RELATIONS = {
+    "company": ("c", "LEFT JOIN company c ON c.id = a.company_id", COMPANY_COLUMNS),
+}
+
+# query parameter -> (SQL condition, value parser)
+AD_FILTERS = {
+    "company_id": ("a.company_id = %s", int),
+    "employment_type": ("a.employment_type = %s", str),
+    "work_mode": ("a.work_mode = %s", str),
+    "location": ("a.location = %s", str),
+    # salary range filters match ads whose advertised range overlaps the request
+    "salary_min": ("a.salary_max >= %s", int),
+    "salary_max": ("a.salary_min <= %s", int),
+    "published_after": ("a.publish_date >= %s", str),
+    "published_before": ("a.publish_date <= %s", str),
+}
+
+
+def _filter_values(args):
+    """Parse the filters present in the query string into {name: value}."""
+    values = {}
+    for name, (_, parse) in AD_FILTERS.items():
+        value = args.get(name)
+        if value is None or value.strip() == "":
+            continue
+        try:
+            values[name] = parse(value)
+        except ValueError:
+            raise PaginationError(f"invalid value for {name}")
+    return values
+
+
+def _advertisement_filters(args):
+    """Build the WHERE clauses for the filters present in the query string."""
+    values = _filter_values(args)
+    return [AD_FILTERS[name][0] for name in values], list(values.values())
+
+
 @bp.route("/advertisements", methods=["GET"])
+@cached("advertisements")
+@query_budget(1)
 def get_advertisements():
+    """List advertisements, newest first.
+
+    Filters: company_id, employment_type, work_mode, location, salary_min,
+    salary_max, published_after, published_before. `fields` selects the
+    returned columns (see projection.select_columns) and `expand=company`
+    embeds each ad's company through a join. Pages hold `limit` ads
+    (DEFAULT_LIMIT by default), keyset-paginated on (publish_date, id):
+    follow `next_cursor` until it is null. `limit=all` opts into the whole
+    list in one response, without `next_cursor`.
+    """
     conn = None
     try:
+        try:
+            clauses, params = _advertisement_filters(request.args)
+            paginate = request.args.get("limit") != "all"
+            limit = parse_limit(request.args.get("limit")) if paginate else None
+            cursor_token = request.args.get("cursor") if paginate else None
+            if cursor_token:
+                last_date, last_id = decode_cursor(cursor_token, 2, types=(date, int))
+                clauses.append("(a.publish_date < %s OR (a.publish_date = %s AND a.id < %s))")
+                params.extend([last_date, last_date, last_id])
+            columns = select_columns(request.args.get("fields"), AD_COLUMNS, AD_SUMMARY_COLUMNS,
+                                     required=("id", "publish_date"), prefix="a.")
+            expand_columns, joins, expanded = expand_relations(request.args.get("expand"), AD_RELATIONS)
+        except (PaginationError, ProjectionError) as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        if expand_columns:
+            columns += ", " + expand_columns
+        sql = f"SELECT {columns} FROM advertisement a {joins}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY a.publish_date DESC, a.id DESC"
+        if paginate:
+            # fetch one extra row to know whether another page exists
+            sql += " LIMIT %s"
+            params.append(limit + 1)
+
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM advertisement;")
-            advertisements = cursor.fetchall()
-        return jsonify({"advertisements": advertisements}), 200
+            cursor.execute(sql, params)
+            advertisements = nest_relations(cursor.fetchall(), expanded, AD_RELATIONS)
+
+        if not paginate:
+            return jsonify({"advertisements": advertisements}), 200
+
+        next_cursor = None
+        if len(advertisements) > limit:
+            advertisements = advertisements[:limit]
+            last = advertisements[-1]
+            next_cursor = encode_cursor(last["publish_date"], last["id"])
+        return jsonify({"advertisements": advertisements, "next_cursor": next_cursor}), 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
     finally: 
@@ -20,20 +134,156 @@ def get_advertisements():
 
 
 
+@bp.route("/advertisements/search", methods=["GET"])
+def search_advertisements():
+    """Relevance-ranked full-text search over title and descriptions.
+
+    Uses the ft_ads_text FULLTEXT index, or the in-process BM25 index
+    when SEARCH_BACKEND=memory (which also returns facet counts); every
+    term must match, as a word prefix. Accepts the same filters as
+    GET /advertisements, plus `limit` and `cursor` for paging through the
+    ranked results.
+    """
+    if search_index.enabled():
+        return _search_in_memory()
+
+    conn = None
+    try:
+        terms = search_terms(request.args.get("q"))
+        if not terms:
+            return jsonify({
+                "error": "validation_error",
+                "message": f"q must contain at least one word of {SEARCH_MIN_TERM_LENGTH}+ characters"
+            }), 400
+        try:
+            clauses, params = _advertisement_filters(request.args)
+            limit = parse_limit(request.args.get("limit"))
+            cursor_token = request.args.get("cursor")
+            # ranked results are paged by offset, deep pages are rare
+            offset = decode_cursor(cursor_token, 1)[0] if cursor_token else 0
+            if not isinstance(offset, int) or offset < 0:
+                raise PaginationError("invalid cursor")
+        except PaginationError as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        against = " ".join(f"+{t}*" for t in terms)
+        match = "MATCH(title, short_description, description) AGAINST (%s IN BOOLEAN MODE)"
+        columns = ", ".join(AD_SUMMARY_COLUMNS)
+        sql = (
+            f"SELECT {columns}, description, {match} AS score FROM advertisement a"
+            f" WHERE {' AND '.join([match] + clauses)}"
+            " ORDER BY score DESC, id DESC LIMIT %s OFFSET %s"
+        )
+
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(sql, [against, against] + params + [limit + 1, offset])
+            rows = cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(offset + limit)
+
+        results = []
+        for row in rows:
+            description = row.pop("description")
+            row["score"] = float(row["score"])
+            row["snippet"] = snippet(description, terms) or snippet(row["short_description"], terms)
+            row["title_highlighted"] = snippet(row["title"], terms)
+            results.append(row)
+        return jsonify({"advertisements": results, "next_cursor": next_cursor}), 200
+    except Exception as e:
+        return jsonify({"error": "database_error", "message": str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
+def _search_in_memory():
+    conn = None
+    try:
+        q = request.args.get("q") or ""
+        terms = search_index.tokenize(q)
+        if not terms:
+            return jsonify({"error": "validation_error", "message": "q must contain at least one word"}), 400
+        try:
+            filters = _filter_values(request.args)
+            limit = parse_limit(request.args.get("limit"))
+            cursor_token = request.args.get("cursor")
+            offset = decode_cursor(cursor_token, 1)[0] if cursor_token else 0
+            if not isinstance(offset, int) or offset < 0:
+                raise PaginationError("invalid cursor")
+        except PaginationError as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        ranked, facets = search_index.get_index().search(q, filters)
+        page = ranked[offset:offset + limit]
+        next_cursor = encode_cursor(offset + limit) if len(ranked) > offset + limit else None
+
+        rows = {}
+        if page:
+            columns = ", ".join(AD_SUMMARY_COLUMNS)
+            placeholders = ", ".join(["%s"] * len(page))
+            conn = get_db_connection()
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {columns}, description FROM advertisement WHERE id IN ({placeholders})",
+                    [doc_id for doc_id, _ in page],
+                )
+                rows = {row["id"]: row for row in cursor.fetchall()}
+
+        results = []
+        for doc_id, score in page:
+            row = rows.get(doc_id)
+            if row is None:
+                continue
+            description = row.pop("description")
+            row["score"] = round(score, 4)
+            row["snippet"] = snippet(description, terms) or snippet(row["short_description"], terms)
+            row["title_highlighted"] = snippet(row["title"], terms)
+            results.append(row)
+        return jsonify({
+            "advertisements": results,
+            "next_cursor": next_cursor,
+            "total": len(ranked),
+            "facets": facets,
+        }), 200
+    except Exception as e:
+        return jsonify({"error": "database_error", "message": str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
 @bp.route("/advertisement/<int:advertisement_id>")
 @bp.route("/advertisements/<int:advertisement_id>")
+@cached("advertisements")
+@query_budget(1)
 def get_one_advertisement(advertisement_id):
+    """One advertisement; `expand=company` embeds its company."""
     conn = None
     try:
+        try:
+            expand_columns, joins, expanded = expand_relations(request.args.get("expand"), AD_RELATIONS)
+        except ProjectionError as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        columns = "a.*" + (", " + expand_columns if expand_columns else "")
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM advertisement WHERE id = %s", (advertisement_id,))
+            cursor.execute(f"SELECT {columns} FROM advertisement a {joins} WHERE a.id = %s", (advertisement_id,))
             advertisement = cursor.fetchone()
         
         if not advertisement:
             return jsonify({"error": "not_found", "message": "advertisement not found"}), 404
             
-        return jsonify({"advertisement": advertisement}), 200
+        nest_relations([advertisement], expanded, AD_RELATIONS)
+        resp = jsonify({"advertisement": advertisement})
+        resp.last_modified = advertisement["updated_at"]
+        if advertisement.get("company"):
+            resp.last_modified = max(advertisement["updated_at"], advertisement["company"]["updated_at"])
+        return resp, 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
     finally: 
@@ -47,55 +297,31 @@ def add_advertisement():
     try:
         data = request.get_json(silent=True) or {}
 
-        required_fields = [
-            "title",
-            "short_description",
-            "description",
-            "publish_date",
-            "company_id",
-        ]
-        missing = [f for f in required_fields if not data.get(f)]
-        if missing:
-            return jsonify({
-                "error": "validation_error",
-                "message": f"Missing required field(s): {', '.join(missing)}"
-            }), 400
-
+        values, error = _advertisement_values(data)
+        if error:
+            return jsonify({"error": "validation_error", "message": error}), 400
 
-      
         if not session.get('user_id') or not session.get('is_admin'):
             return jsonify({"error": "forbidden", "message": "admin_required"}), 403
 
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            def _n(v):
-                return v if (v is not None and str(v).strip() != "") else None
-
             cursor.execute(
-                """
-                INSERT INTO advertisement 
-                    (title, short_description, description, publish_date, company_id,
-                     employment_type, work_mode, salary_min, salary_max, required_experience)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                f"""
+                INSERT INTO advertisement ({', '.join(AD_INSERT_COLUMNS)})
+                VALUES ({', '.join(['%s'] * len(AD_INSERT_COLUMNS))})
                 """,
-                (
-                    data["title"],
-                    data["short_description"],
-                    data["description"],
-                    data["publish_date"],
-                    data["company_id"],
-                    _n(data.get("employment_type")),
-                    _n(data.get("work_mode")),
-                    _n(data.get("salary_min")),
-                    _n(data.get("salary_max")),
-                    _n(data.get("required_experience")),
-                ),
+                values,
             )
+            new_id = cursor.lastrowid
+            counters.adjust(cursor, counters.advertisement_deltas([dict(zip(AD_INSERT_COLUMNS, values))]))
             conn.commit()
 
-            new_id = cursor.lastrowid
             cursor.execute("SELECT * FROM advertisement WHERE id = %s", (new_id,))
             created = cursor.fetchone()
+        search_index.index_advertisement(created)
+        invalidate("advertisements")
+        invalidate("stats")
 
         resp = jsonify({"advertisement": created})
         resp.status_code = 201
@@ -109,74 +335,151 @@ def add_advertisement():
             conn.close()
 
 
+def _advertisement_values(data):
+    """Validate a POST/PUT body or bulk row; return (values in AD_INSERT_COLUMNS order, error)."""
+    missing = [f for f in AD_REQUIRED_FIELDS if not data.get(f)]
+    if missing:
+        return None, f"Missing required field(s): {', '.join(missing)}"
+    for field, limit in (("title", 255), ("short_description", 255), ("required_experience", 155)):
+        if len(str(data.get(field) or "")) > limit:
+            return None, f"{field} exceeds {limit} characters"
+    try:
+        publish_date = date.fromisoformat(str(data["publish_date"]))
+    except ValueError:
+        return None, "publish_date must be YYYY-MM-DD"
+    try:
+        company_id = int(data["company_id"])
+        salary_min, salary_max = (int(v) if blank_to_none(v) is not None else None
+                                  for v in (data.get("salary_min"), data.get("salary_max")))
+    except (TypeError, ValueError):
+        return None, "company_id, salary_min and salary_max must be integers"
+    if salary_min is not None and salary_max is not None and salary_min > salary_max:
+        return None, "salary_min is greater than salary_max"
+    employment_type, work_mode = blank_to_none(data.get("employment_type")), blank_to_none(data.get("work_mode"))
+    if employment_type is not None and employment_type not in EMPLOYMENT_TYPES:
+        return None, f"employment_type must be one of {', '.join(EMPLOYMENT_TYPES)}"
+    if work_mode is not None and work_mode not in WORK_MODES:
+        return None, f"work_mode must be one of {', '.join(WORK_MODES)}"
+    return (
+        data["title"],
+        data["short_description"],
+        data["description"],
+        publish_date,
+        company_id,
+        employment_type,
+        work_mode,
+        salary_min,
+        salary_max,
+        blank_to_none(data.get("required_experience")),
+    ), None
+
+
+@bp.route("/advertisements/bulk", methods=["POST"])
+def bulk_add_advertisements():
+    """Create many advertisements from a JSON array, NDJSON or CSV upload.
+
+    Rows are validated like POST /advertisements and inserted in
+    transactions of BULK_CHUNK_SIZE rows. The response lists the created ids
+    and the rejected rows, both by row index (0-based, CSV header excluded).
+    """
+    if not session.get('user_id') or not session.get('is_admin'):
+        return jsonify({"error": "forbidden", "message": "admin_required"}), 403
+    try:
+        rows = parse_rows(request)
+    except BulkError as e:
+        return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+    conn = None
+    try:
+        prepared, errors = [], []
+        for i, data in enumerate(rows):
+            values, error = _advertisement_values(data)
+            if error:
+                errors.append({"row": i, "message": error})
+            else:
+                prepared.append((i, values))
+
+        created = []
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            company_ids = sorted({values[4] for _, values in prepared})
+            if company_ids:
+                cursor.execute(
+                    f"SELECT id FROM company WHERE id IN ({', '.join(['%s'] * len(company_ids))})",
+                    company_ids,
+                )
+                known = {row["id"] for row in cursor.fetchall()}
+                errors.extend({"row": i, "message": "company not found"}
+                              for i, values in prepared if values[4] not in known)
+                prepared = [(i, values) for i, values in prepared if values[4] in known]
+
+            for chunk in chunks(prepared):
+                try:
+                    ids = insert_rows(cursor, "advertisement", AD_INSERT_COLUMNS, [v for _, v in chunk])
+                    counters.adjust(cursor, counters.advertisement_deltas(
+                        {"company_id": values[4], "employment_type": values[5]} for _, values in chunk
+                    ))
+                    conn.commit()
+                except pymysql.MySQLError as e:
+                    conn.rollback()
+                    errors.extend({"row": i, "message": str(e)} for i, _ in chunk)
+                    continue
+                for (i, values), new_id in zip(chunk, ids):
+                    created.append({"row": i, "id": new_id})
+                    search_index.index_advertisement({"id": new_id, **dict(zip(AD_INSERT_COLUMNS, values))})
+
+        if created:
+            invalidate("advertisements")
+            invalidate("stats")
+        errors.sort(key=lambda e: e["row"])
+        if not created:
+            return jsonify({"error": "validation_error", "message": "No row could be imported",
+                            "errors": errors}), 400
+        return jsonify({"created": created, "errors": errors}), 201
+    except Exception as e:
+        return jsonify({"error": "database_error", "message": str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
 @bp.route("/advertisements/<int:advertisement_id>", methods=["PUT"])
 def update_advertisement(advertisement_id):
     conn = None
     try:
         data = request.get_json(silent=True) or {}
-        
-        required_fields = [
-            "title",
-            "short_description",
-            "description",
-            "publish_date",
-            "company_id",
-        ]
-        missing = [f for f in required_fields if not data.get(f)]
-        if missing:
-            return jsonify({
-                "error": "validation_error",
-                "message": f"Missing required field(s): {', '.join(missing)}"
-            }), 400
-        
-   
+
+        values, error = _advertisement_values(data)
+        if error:
+            return jsonify({"error": "validation_error", "message": error}), 400
+
         if not session.get('user_id') or not session.get('is_admin'):
             return jsonify({"error": "forbidden", "message": "admin_required"}), 403
 
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            
-            def _n(v):
-                return v if (v is not None and str(v).strip() != "") else None
+            cursor.execute(
+                "SELECT company_id, employment_type FROM advertisement WHERE id = %s FOR UPDATE",
+                (advertisement_id,)
+            )
+            previous = cursor.fetchone()
+            if not previous:
+                return jsonify({"error": "not_found", "message": "advertisement not found"}), 404
 
             cursor.execute(
-                """
-                UPDATE advertisement
-                SET title=%s,
-                    short_description=%s,
-                    description=%s,
-                    publish_date=%s,
-                    company_id=%s,
-                    employment_type=%s,
-                    work_mode=%s,
-                    salary_min=%s,
-                    salary_max=%s,
-                    required_experience=%s
-                WHERE id=%s
-                """,
-                (
-                    data["title"],
-                    data["short_description"],
-                    data["description"],
-                    data["publish_date"],
-                    data["company_id"],
-                    _n(data.get("employment_type")),
-                    _n(data.get("work_mode")),
-                    _n(data.get("salary_min")),
-                    _n(data.get("salary_max")),
-                    _n(data.get("required_experience")),
-                    advertisement_id,
-                ),
+                f"UPDATE advertisement SET {', '.join(f'{c}=%s' for c in AD_INSERT_COLUMNS)} WHERE id=%s",
+                values + (advertisement_id,),
             )
-            affected = cursor.rowcount
+            deltas = counters.advertisement_deltas([previous], -1)
+            deltas.update(counters.advertisement_deltas([dict(zip(AD_INSERT_COLUMNS, values))]))
+            counters.adjust(cursor, deltas)
             conn.commit()
 
-            if affected == 0:
-                return jsonify({"error": "not_found", "message": "advertisement not found"}), 404
-
-       
             cursor.execute("SELECT * FROM advertisement WHERE id = %s", (advertisement_id,))
             updated = cursor.fetchone()
+        search_index.index_advertisement(updated)
+        invalidate("advertisements", advertisement_id)
+        invalidate("stats")
 
         return jsonify({"advertisement": updated}), 200
     except Exception as e:
@@ -196,15 +499,27 @@ def delete_advertisement(advertisement_id):
 
         conn = get_db_connection()
         with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT company_id, employment_type FROM advertisement WHERE id = %s FOR UPDATE",
+                (advertisement_id,)
+            )
+            previous = cursor.fetchone()
+            if not previous:
+                return jsonify({"error": "not_found", "message": "advertisement not found"}), 404
+
+            # applications go with the advertisement (ON DELETE CASCADE)
+            deltas = counters.cascaded_application_deltas(cursor, "advertisement_id = %s", (advertisement_id,))
+            deltas.update(counters.advertisement_deltas([previous], -1))
             cursor.execute(
                 "DELETE FROM advertisement WHERE id = %s",
                 (advertisement_id,)
             )
-            affected = cursor.rowcount
+            counters.adjust(cursor, deltas)
         conn.commit()
 
-        if affected == 0:
-            return jsonify({"error": "not_found", "message": "advertisement not found"}), 404
+        search_index.remove_advertisement(advertisement_id)
+        invalidate("advertisements", advertisement_id)
+        invalidate("stats")
         return "", 204
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
@@ -1,17 +1,68 @@
 from flask import Blueprint, jsonify, request, session
 from db import get_db_connection
+from query_recorder import query_budget
 from datetime import datetime
+import pymysql
+from pymysql.constants import ER
+from projection import ProjectionError, select_columns, expand_relations, nest_relations
+from models.advertisement import AD_SUMMARY_COLUMNS
+from models.user import USER_COLUMNS, USER_REF_COLUMNS
+from cache import invalidate
+from export import ExportError, export_format, stream_rows
+import counters
+import cv_store
+from collections import Counter
+from fields import blank_to_none
 
 bp = Blueprint("application", __name__)
 
+APPLICATION_COLUMNS = (
+    "id", "person_id", "advertisement_id", "handled_by", "apply_date",
+    "status", "created_at",
+)
+APPLICATION_SUMMARY_COLUMNS = APPLICATION_COLUMNS
+APPLICATION_STATUSES = ("Envoyée", "Review", "Acceptée", "Refusée")
+SUBMITTED_STATUS = APPLICATION_STATUSES[0]
+# largest id list accepted by PATCH /applications/bulk
+MAX_BULK_STATUS_IDS = 1000
+
+# expand= name -> (alias, JOIN clause, columns); application is aliased "ap"
+APPLICATION_RELATIONS = {
+    "person": ("p", "LEFT JOIN user_account p ON p.id = ap.person_id", USER_COLUMNS),
+    "advertisement": ("ad", "LEFT JOIN advertisement ad ON ad.id = ap.advertisement_id", AD_SUMMARY_COLUMNS),
+    "handler": ("h", "LEFT JOIN user_account h ON h.id = ap.handled_by", USER_REF_COLUMNS),
+}
+
+
+def _application_select(args):
+    """Column list and joins for the `fields` and `expand` query parameters."""
+    columns = select_columns(args.get("fields"), APPLICATION_COLUMNS, APPLICATION_SUMMARY_COLUMNS, prefix="ap.")
+    expand_columns, joins, expanded = expand_relations(args.get("expand"), APPLICATION_RELATIONS)
+    if expand_columns:
+        columns += ", " + expand_columns
+    return columns, joins, expanded
+
 @bp.route("/applications", methods=["GET"])
+@query_budget(1)
 def get_applications():
+    """All applications; `expand=person,advertisement,handler` embeds the
+    related rows through joins instead of separate list downloads.
+    `format=json|ndjson|csv` streams them for exports."""
     conn = None
     try:
+        try:
+            columns, joins, expanded = _application_select(request.args)
+            fmt = export_format(request.args)
+        except (ProjectionError, ExportError) as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        if fmt:
+            return stream_rows(f"SELECT {columns} FROM application ap {joins} ORDER BY ap.id", (),
+                               "applications", fmt, APPLICATION_RELATIONS, expanded)
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM application;")
-            applications = cursor.fetchall()
+            cursor.execute(f"SELECT {columns} FROM application ap {joins};")
+            applications = nest_relations(cursor.fetchall(), expanded, APPLICATION_RELATIONS)
         return jsonify({"applications": applications}), 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
@@ -22,17 +73,25 @@ def get_applications():
 
 @bp.route("/application/<int:application_id>")
 @bp.route("/applications/<int:application_id>")
+@query_budget(1)
 def get_one_application(application_id):
     conn = None
     try:
+        try:
+            expand_columns, joins, expanded = expand_relations(request.args.get("expand"), APPLICATION_RELATIONS)
+        except ProjectionError as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        columns = "ap.*" + (", " + expand_columns if expand_columns else "")
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM application WHERE id = %s", (application_id,))
+            cursor.execute(f"SELECT {columns} FROM application ap {joins} WHERE ap.id = %s", (application_id,))
             application = cursor.fetchone()
         
         if not application:
             return jsonify({"error": "not_found", "message": "application not found"}), 404
             
+        nest_relations([application], expanded, APPLICATION_RELATIONS)
         return jsonify({"application": application}), 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
@@ -42,7 +101,14 @@ def get_one_application(application_id):
 
 
 @bp.route("/applications", methods=["POST"])
+@query_budget(4)
 def add_application():
+    """Apply to an advertisement as the session user.
+
+    One transaction of four statements and no SELECT on the success path:
+    uq_app_person_ad rejects a second application to the same ad (409) and
+    the response is built from the inserted values.
+    """
     conn = None
     try:
 
@@ -61,79 +127,83 @@ def add_application():
 
         person_id = session.get('user_id')
         advertisement_id = data["advertisement_id"]
-        cover_letter = data.get("cover_letter", "")
-        cv_path = data.get("cv_path") 
+        cover_letter = (data.get("cover_letter") or "")[:3000] or None
+        cv_path = data.get("cv_path") or None
+        apply_date = datetime.now().replace(microsecond=0)
 
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT first_name, last_name, cv FROM user_account WHERE id = %s",
-                (person_id,)
-            )
-            user = cursor.fetchone()
-            
-            if not user:
-                return jsonify({"error": "not_found", "message": "User not found"}), 404
-
-            # get cv user give or take it from the profil
-            final_cv = cv_path if cv_path else user.get('cv', '')
-            
-            # verified if a cv is available
-            if not final_cv:
+            try:
+                # inserts nothing when the account is gone or has no CV to send
+                # (the one given or the one from the profile)
+                cursor.execute(
+                    """
+                    INSERT INTO application (person_id, advertisement_id, status, apply_date, created_at)
+                    SELECT id, %s, %s, %s, %s FROM user_account
+                    WHERE id = %s AND COALESCE(%s, NULLIF(cv, '')) IS NOT NULL
+                    """,
+                    (advertisement_id, SUBMITTED_STATUS, apply_date, apply_date, person_id, cv_path)
+                )
+            except pymysql.err.IntegrityError as e:
+                conn.rollback()
+                if e.args[0] == ER.DUP_ENTRY:
+                    return jsonify({
+                        "error": "conflict",
+                        "message": "You have already applied to this position"
+                    }), 409
+                if e.args[0] == ER.NO_REFERENCED_ROW_2:
+                    return jsonify({"error": "not_found", "message": "advertisement not found"}), 404
+                raise
+
+            if not cursor.rowcount:
+                cursor.execute("SELECT id FROM user_account WHERE id = %s", (person_id,))
+                if not cursor.fetchone():
+                    return jsonify({"error": "not_found", "message": "User not found"}), 404
                 return jsonify({
                     "error": "validation_error",
                     "message": "A CV is required to apply"
                 }), 400
 
-            cursor.execute(
-                "SELECT id FROM application WHERE person_id = %s AND advertisement_id = %s",
-                (person_id, advertisement_id)
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                return jsonify({
-                    "error": "conflict",
-                    "message": "You have already applied to this position"
-                }), 409
-
-            apply_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute(
-                """
-                INSERT INTO application (person_id, advertisement_id, status, apply_date)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (person_id, advertisement_id, "Envoyée", apply_date)
-            )
-            
             application_id = cursor.lastrowid
-
             cursor.execute(
                 """
                 INSERT INTO application_log (
                     application_id, actor_id, status,
                     candidate_last_name, candidate_first_name, cv, cover_letter,
                     note, sent_at
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                )
+                SELECT %s, id, %s, last_name, first_name, COALESCE(%s, cv), %s, %s, %s
+                FROM user_account WHERE id = %s
                 """,
                 (
                     application_id,
-                    person_id,
-                    "Envoyée",
-                    user.get('last_name', ''),
-                    user.get('first_name', ''),
-                    final_cv, 
-                    cover_letter[:3000] if cover_letter else None,
+                    SUBMITTED_STATUS,
+                    cv_path,
+                    cover_letter,
                     "Candidature initiale envoyée par le candidat",
-                    apply_date
+                    apply_date,
+                    person_id,
                 )
             )
-            
-            conn.commit()
-
-            cursor.execute("SELECT * FROM application WHERE id = %s", (application_id,))
-            created = cursor.fetchone()
-
+            if cv_path:
+                cv_store.adjust_refs(cursor, {cv_path: 1})
+            else:
+                cv_store.adjust_user_cv_ref(cursor, person_id, 1)
+            # last statement: every submission updates this counter row, so
+            # its lock is held only until the commit
+            counters.adjust(cursor, counters.status_deltas([SUBMITTED_STATUS]))
+        conn.commit()
+        invalidate("stats")
+
+        created = {
+            "id": application_id,
+            "person_id": person_id,
+            "advertisement_id": advertisement_id,
+            "handled_by": None,
+            "apply_date": apply_date,
+            "status": SUBMITTED_STATUS,
+            "created_at": apply_date,
+        }
         resp = jsonify({"application": created})
         resp.status_code = 201
         resp.headers["Location"] = f"/applications/{application_id}"
@@ -147,6 +217,7 @@ def add_application():
 
 
 @bp.route("/applications/<int:application_id>", methods=["PUT"])
+@query_budget(6)
 def update_application(application_id):
     conn = None
     try:
@@ -162,8 +233,18 @@ def update_application(application_id):
 
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            def _n(v):
-                return v if (v is not None and str(v).strip() != "") else None
+            cursor.execute(
+                """
+                SELECT ap.status,
+                       (SELECT l.cv FROM application_log l WHERE l.application_id = ap.id
+                        ORDER BY l.sent_at DESC, l.id DESC LIMIT 1) AS cv
+                FROM application ap WHERE ap.id = %s FOR UPDATE
+                """,
+                (application_id,)
+            )
+            previous = cursor.fetchone()
+            if not previous:
+                return jsonify({"error": "not_found", "message": "application not found"}), 404
 
             cursor.execute(
                 """
@@ -178,39 +259,37 @@ def update_application(application_id):
                 (
                     data["person_id"],
                     data["advertisement_id"],
-                    _n(data.get("handled_by")),
+                    blank_to_none(data.get("handled_by")),
                     data["status"],
-                    _n(data.get("apply_date")),
+                    blank_to_none(data.get("apply_date")),
                     application_id,
                 ),
             )
-            affected = cursor.rowcount
+            # the log is append-only: record the change as a new entry that
+            # carries the CV of the latest one
+            cursor.execute(
+                """
+                INSERT INTO application_log (
+                    application_id, actor_id, status,
+                    candidate_last_name, candidate_first_name, cv, note, sent_at
+                )
+                SELECT ap.id, %s, ap.status, p.last_name, p.first_name, %s, %s, NOW()
+                FROM application ap JOIN user_account p ON p.id = ap.person_id
+                WHERE ap.id = %s
+                """,
+                (blank_to_none(data.get("handled_by")), previous["cv"], blank_to_none(data.get("note")), application_id)
+            )
+            if cursor.rowcount:
+                cv_store.adjust_refs(cursor, {previous["cv"]: 1})
+            deltas = counters.status_deltas([previous["status"]], -1)
+            deltas.update(counters.status_deltas([data["status"]]))
+            counters.adjust(cursor, deltas)
             conn.commit()
 
-            if affected == 0:
-                return jsonify({"error": "not_found", "message": "application not found"}), 404
-
             cursor.execute("SELECT * FROM application WHERE id = %s", (application_id,))
             updated = cursor.fetchone()
 
-            try:
-                cursor.execute("""
-                    SELECT id FROM application_log WHERE application_id = %s ORDER BY sent_at DESC LIMIT 1
-                """, (updated['id'],))
-                last_log = cursor.fetchone()
-                if last_log:
-                    actor_id = _n(data.get('handled_by'))
-                    cursor.execute(
-                        """
-                        UPDATE application_log SET actor_id=%s, status=%s, sent_at=NOW()
-                        WHERE id=%s
-                        """,
-                        (actor_id, data.get('status'), last_log['id'])
-                    )
-                    conn.commit()
-            except Exception:
-                pass
-
+        invalidate("stats")
         return jsonify({"application": updated}), 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
@@ -219,18 +298,115 @@ def update_application(application_id):
             conn.close()
 
 
+@bp.route("/applications/bulk", methods=["PATCH"])
+def bulk_update_application_status():
+    """Move `ids` to `status` in one transaction and log each transition.
+
+    Body: {"ids": [...], "status": ..., "handled_by": optional user id,
+    "note": optional}, for admins and responsibles only. The actor is the
+    session user. Either every application is updated or none (404 lists
+    the unknown ids). The query count does not depend on the number of ids;
+    `fields`/`expand` shape the returned rows like GET /applications.
+    """
+    conn = None
+    try:
+        actor_id = session.get('user_id')
+        if not actor_id:
+            return jsonify({"error": "unauthorized", "message": "User must be logged in"}), 401
+        if not session.get('is_admin') and session.get('user_role') != 'responsible':
+            return jsonify({"error": "forbidden", "message": "insufficient privileges"}), 403
+
+        data = request.get_json(silent=True) or {}
+        ids = data.get("ids")
+        status = data.get("status")
+        if (not isinstance(ids, list) or not ids
+                or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+            return jsonify({"error": "validation_error", "message": "ids must be a non-empty list of integers"}), 400
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > MAX_BULK_STATUS_IDS:
+            return jsonify({"error": "validation_error",
+                            "message": f"At most {MAX_BULK_STATUS_IDS} ids per request"}), 400
+        if status not in APPLICATION_STATUSES:
+            return jsonify({"error": "validation_error",
+                            "message": f"status must be one of {', '.join(APPLICATION_STATUSES)}"}), 400
+        try:
+            columns, joins, expanded = _application_select(request.args)
+        except ProjectionError as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        in_ids = ", ".join(["%s"] * len(ids))
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            # current status and what the new log rows copy, locking the rows
+            cursor.execute(
+                f"""
+                SELECT ap.id, ap.status, p.first_name, p.last_name,
+                       (SELECT l.cv FROM application_log l WHERE l.application_id = ap.id
+                        ORDER BY l.sent_at DESC, l.id DESC LIMIT 1) AS cv
+                FROM application ap JOIN user_account p ON p.id = ap.person_id
+                WHERE ap.id IN ({in_ids}) FOR UPDATE
+                """,
+                ids,
+            )
+            previous = {row["id"]: row for row in cursor.fetchall()}
+            unknown = [i for i in ids if i not in previous]
+            if unknown:
+                conn.rollback()
+                return jsonify({"error": "not_found",
+                                "message": f"application(s) not found: {', '.join(map(str, unknown))}"}), 404
+
+            cursor.execute(
+                f"UPDATE application SET status = %s, handled_by = COALESCE(%s, handled_by) WHERE id IN ({in_ids})",
+                [status, blank_to_none(data.get("handled_by"))] + ids,
+            )
+            # PyMySQL sends this as one multi-row INSERT
+            cursor.executemany(
+                """
+                INSERT INTO application_log (
+                    application_id, actor_id, status,
+                    candidate_last_name, candidate_first_name, cv, note, sent_at
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+                """,
+                [
+                    (i, actor_id, status, previous[i]["last_name"], previous[i]["first_name"],
+                     previous[i]["cv"], blank_to_none(data.get("note")))
+                    for i in ids
+                ],
+            )
+            cv_store.adjust_refs(cursor, Counter(row["cv"] for row in previous.values()))
+            deltas = counters.status_deltas([row["status"] for row in previous.values()], -1)
+            deltas.update(counters.status_deltas([status] * len(ids)))
+            counters.adjust(cursor, deltas)
+
+            cursor.execute(f"SELECT {columns} FROM application ap {joins} WHERE ap.id IN ({in_ids})", ids)
+            applications = nest_relations(cursor.fetchall(), expanded, APPLICATION_RELATIONS)
+        conn.commit()
+
+        invalidate("stats")
+        return jsonify({"applications": applications}), 200
+    except Exception as e:
+        return jsonify({"error": "database_error", "message": str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
 @bp.route("/applications/<int:application_id>", methods=["DELETE"])
 def delete_application(application_id):
     conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cursor:
+            cursor.execute("SELECT status FROM application WHERE id = %s FOR UPDATE", (application_id,))
+            previous = cursor.fetchone()
+            if not previous:
+                return jsonify({"error": "not_found", "message": "application not found"}), 404
+
             cursor.execute("DELETE FROM application WHERE id = %s", (application_id,))
-            affected = cursor.rowcount
+            counters.adjust(cursor, counters.status_deltas([previous["status"]], -1))
         conn.commit()
 
-        if affected == 0:
-            return jsonify({"error": "not_found", "message": "application not found"}), 404
+        invalidate("stats")
         return "", 204
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
@@ -240,13 +416,19 @@ def delete_application(application_id):
 
 
 @bp.route("/applications/user/<int:user_id>", methods=["GET"])
+@query_budget(1)
 def get_applications_by_user(user_id):
     conn = None
     try:
+        try:
+            columns, joins, expanded = _application_select(request.args)
+        except ProjectionError as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM application WHERE person_id = %s;", (user_id,))
-            applications = cursor.fetchall()
+            cursor.execute(f"SELECT {columns} FROM application ap {joins} WHERE ap.person_id = %s;", (user_id,))
+            applications = nest_relations(cursor.fetchall(), expanded, APPLICATION_RELATIONS)
         return jsonify({"applications": applications}), 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
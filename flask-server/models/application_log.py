@@ -1,16 +1,193 @@
+from datetime import datetime
+from itertools import islice
 from flask import Blueprint, jsonify, request
 from db import get_db_connection
+from pagination import PaginationError, parse_limit, encode_cursor, decode_cursor
+from projection import ProjectionError, select_columns, expand_relations, nest_relations
+from models.advertisement import AD_SUMMARY_COLUMNS
+from models.application import APPLICATION_COLUMNS
+from models.user import USER_REF_COLUMNS
+from export import ExportError, export_format, stream_rows
+import log_archive
+import cv_store
+from fields import blank_to_none
 
 bp = Blueprint("application_log", __name__)
 
+APPLICATION_LOG_COLUMNS = (
+    "id", "application_id", "actor_id", "status", "candidate_last_name",
+    "candidate_first_name", "cv", "cover_letter", "note", "sent_at",
+)
+# cover letters (up to 3000 chars) and notes are only shown on demand
+APPLICATION_LOG_SUMMARY_COLUMNS = tuple(
+    c for c in APPLICATION_LOG_COLUMNS if c not in ("cover_letter", "note")
+)
+
+# expand= name -> (alias, JOIN clause, columns); application_log is aliased "l"
+APPLICATION_LOG_RELATIONS = {
+    "application": ("la", "LEFT JOIN application la ON la.id = l.application_id", APPLICATION_COLUMNS),
+    "advertisement": (
+        "lad",
+        "LEFT JOIN application lap ON lap.id = l.application_id"
+        " LEFT JOIN advertisement lad ON lad.id = lap.advertisement_id",
+        AD_SUMMARY_COLUMNS,
+    ),
+    "actor": ("u", "LEFT JOIN user_account u ON u.id = l.actor_id", USER_REF_COLUMNS),
+}
+# archived rows read back per query by the unpaginated list and the exports
+ARCHIVE_BATCH_SIZE = 500
+
+def _parse_time(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f"{name} must be an ISO 8601 date or datetime")
+
+
+def _log_window(args):
+    """Parse `since` (inclusive), `until` (exclusive) and the keyset `cursor`."""
+    window = {"since": None, "until": None, "before": None}
+    if args.get("since"):
+        window["since"] = _parse_time(args["since"], "since")
+    if args.get("until"):
+        window["until"] = _parse_time(args["until"], "until")
+    if args.get("cursor"):
+        last_sent_at, last_id = decode_cursor(args["cursor"], 2, types=(str, int))
+        window["before"] = (_parse_time(last_sent_at, "cursor"), last_id)
+    return window
+
+
+def _window_clauses(window, clauses, params):
+    # every bound is on sent_at, so they also prune partitions
+    if window["since"]:
+        clauses.append("l.sent_at >= %s")
+        params.append(window["since"])
+    if window["until"]:
+        clauses.append("l.sent_at < %s")
+        params.append(window["until"])
+    if window["before"]:
+        last_sent_at, last_id = window["before"]
+        clauses.append("(l.sent_at < %s OR (l.sent_at = %s AND l.id < %s))")
+        params.extend([last_sent_at, last_sent_at, last_id])
+
+
+def _select_archived(cursor, columns, joins, rows):
+    """Apply a query's projection and joins to archived rows, passed in as a
+    derived table with the same alias as application_log."""
+    def value(c):
+        return "CAST(%s AS DATETIME)" if c == "sent_at" else "%s"
+
+    first = ", ".join(f"{value(c)} AS {c}" for c in APPLICATION_LOG_COLUMNS)
+    rest = ", ".join(value(c) for c in APPLICATION_LOG_COLUMNS)
+    derived = " UNION ALL ".join(["SELECT " + first] + ["SELECT " + rest] * (len(rows) - 1))
+    cursor.execute(f"SELECT {columns} FROM ({derived}) l {joins}",
+                   [row.get(c) for row in rows for c in APPLICATION_LOG_COLUMNS])
+    return cursor.fetchall()
+
+
+def _archived_rows(cursor, columns, joins, expanded, rows):
+    return nest_relations(_select_archived(cursor, columns, joins, rows), expanded, APPLICATION_LOG_RELATIONS)
+
+
+def _archived_batches(cursor, columns, joins, window):
+    """Archived rows of the `since`/`until` window that are not in the table,
+    projected like the table's rows (relations not nested), by batches of
+    ARCHIVE_BATCH_SIZE."""
+    rows = log_archive.iter_window(window["since"], window["until"],
+                                   with_letters="l.cover_letter" in columns)
+    while True:
+        batch = list(islice(rows, ARCHIVE_BATCH_SIZE))
+        if not batch:
+            return
+        # after an interrupted archiver run a row can be in both places
+        cursor.execute(f"SELECT id FROM application_log WHERE id IN ({', '.join(['%s'] * len(batch))})",
+                       [row["id"] for row in batch])
+        known = {row["id"] for row in cursor.fetchall()}
+        batch = [row for row in batch if row["id"] not in known]
+        if batch:
+            yield _select_archived(cursor, columns, joins, batch)
+
+
+def _log_page(cursor, columns, joins, clauses, params, limit, expanded, window, application_id=None):
+    """Run a newest-first keyset page query; return (rows, next_cursor).
+
+    When the table has fewer rows left than the page needs, the page goes on
+    with rows moved to the archive by log_archive.py.
+    """
+    sql = f"SELECT {columns} FROM application_log l {joins}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    # one extra row tells whether another page exists
+    sql += " ORDER BY l.sent_at DESC, l.id DESC LIMIT %s"
+    cursor.execute(sql, params + [limit + 1])
+    rows = nest_relations(cursor.fetchall(), expanded, APPLICATION_LOG_RELATIONS)
+
+    if len(rows) <= limit:
+        months = None if application_id is None else log_archive.archived_months(cursor, application_id)
+        archived = []
+        if months is None or months:
+            archived = log_archive.read_page(limit + 1, months, application_id, window["since"],
+                                             window["until"], window["before"],
+                                             with_letters="l.cover_letter" in columns)
+        # after an interrupted archiver run a row can be in both places
+        known = {row["id"] for row in rows}
+        key = lambda row: (row["sent_at"], row["id"])
+        page = sorted(rows + [row for row in archived if row["id"] not in known],
+                      key=key, reverse=True)[:limit + 1]
+        # only the archived rows that made it into the page are projected
+        archived = [row for row in page if row["id"] not in known]
+        if archived:
+            rows = sorted(rows + _archived_rows(cursor, columns, joins, expanded, archived),
+                          key=key, reverse=True)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["sent_at"], rows[-1]["id"])
+    return rows, next_cursor
+
+
 @bp.route("/application_logs", methods=["GET"])
 def get_application_logs():
+    """All logs, archived ones included; `expand=application,advertisement,actor`
+    embeds related rows. `since`/`until` restrict sent_at to a window; passing
+    `limit` and/or `cursor` switches to keyset pagination on (sent_at, id),
+    newest first. `format=json|ndjson|csv` streams them for exports, the
+    table's rows by id then the archived ones."""
     conn = None
     try:
+        try:
+            columns = select_columns(request.args.get("fields"), APPLICATION_LOG_COLUMNS,
+                                     APPLICATION_LOG_SUMMARY_COLUMNS, required=("id", "sent_at"),
+                                     prefix="l.")
+            expand_columns, joins, expanded = expand_relations(request.args.get("expand"),
+                                                               APPLICATION_LOG_RELATIONS)
+            fmt = export_format(request.args)
+            paginate = "limit" in request.args or "cursor" in request.args
+            limit = parse_limit(request.args.get("limit"))
+            window = _log_window(request.args)
+        except (PaginationError, ProjectionError, ExportError) as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        if expand_columns:
+            columns += ", " + expand_columns
+        clauses, params = [], []
+        _window_clauses(window, clauses, params)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        if fmt:
+            return stream_rows(f"SELECT {columns} FROM application_log l {joins}{where} ORDER BY l.id", params,
+                               "application_logs", fmt, APPLICATION_LOG_RELATIONS, expanded,
+                               then=lambda cursor: _archived_batches(cursor, columns, joins, window))
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM application_log;")
-            application_logs = cursor.fetchall()
+            if paginate:
+                application_logs, next_cursor = _log_page(cursor, columns, joins, clauses, params,
+                                                          limit, expanded, window)
+                return jsonify({"application_logs": application_logs, "next_cursor": next_cursor}), 200
+            cursor.execute(f"SELECT {columns} FROM application_log l {joins}{where};", params)
+            application_logs = nest_relations(cursor.fetchall(), expanded, APPLICATION_LOG_RELATIONS)
+            for rows in _archived_batches(cursor, columns, joins, window):
+                application_logs.extend(nest_relations(rows, expanded, APPLICATION_LOG_RELATIONS))
         return jsonify({"application_logs": application_logs}), 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
@@ -19,18 +196,70 @@ def get_application_logs():
             conn.close()
 
 
+@bp.route("/applications/<int:application_id>/history", methods=["GET"])
+def get_application_history(application_id):
+    """Log entries of one application, newest first, served from
+    idx_logs_app_sent. Always paginated (`limit`, `cursor`, `next_cursor`);
+    `since`/`until`, `fields` and `expand` work as on /application_logs."""
+    conn = None
+    try:
+        try:
+            columns = select_columns(request.args.get("fields"), APPLICATION_LOG_COLUMNS,
+                                     APPLICATION_LOG_SUMMARY_COLUMNS, required=("id", "sent_at"),
+                                     prefix="l.")
+            expand_columns, joins, expanded = expand_relations(request.args.get("expand"),
+                                                               APPLICATION_LOG_RELATIONS)
+            limit = parse_limit(request.args.get("limit"))
+            window = _log_window(request.args)
+        except (PaginationError, ProjectionError) as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        if expand_columns:
+            columns += ", " + expand_columns
+        clauses, params = ["l.application_id = %s"], [application_id]
+        _window_clauses(window, clauses, params)
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            history, next_cursor = _log_page(cursor, columns, joins, clauses, params, limit, expanded,
+                                             window, application_id)
+        return jsonify({"application_id": application_id, "history": history, "next_cursor": next_cursor}), 200
+    except Exception as e:
+        return jsonify({"error": "database_error", "message": str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
 @bp.route("/application_log/<int:application_log_id>")
 def get_one_application_log(application_log_id):
+    """One log entry, looked up in the archive when it left the table."""
     conn = None
     try:
+        try:
+            expand_columns, joins, expanded = expand_relations(request.args.get("expand"),
+                                                               APPLICATION_LOG_RELATIONS)
+        except ProjectionError as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        columns = "l.*" + (", " + expand_columns if expand_columns else "")
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM application_log WHERE id = %s", (application_log_id,))
+            cursor.execute(f"SELECT {columns} FROM application_log l {joins} WHERE l.id = %s", (application_log_id,))
             application_log = cursor.fetchone()
-        
+            if not application_log:
+                # ids only grow: one above every id left in the table was never archived
+                cursor.execute("SELECT MAX(id) AS max_id FROM application_log")
+                max_id = cursor.fetchone()["max_id"]
+                archived = None
+                if max_id is None or application_log_id < max_id:
+                    archived = log_archive.find_row(application_log_id)
+                if archived:
+                    application_log = _select_archived(cursor, columns, joins, [archived])[0]
+
         if not application_log:
             return jsonify({"error": "not_found", "message": "application_log not found"}), 404
             
+        nest_relations([application_log], expanded, APPLICATION_LOG_RELATIONS)
         return jsonify({"application_log": application_log}), 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
@@ -55,35 +284,44 @@ def add_application_log():
 
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            def _n(v):
-                return v if (v is not None and str(v).strip() != "") else None
-
-            cover_letter = _n(data.get("cover_letter"))
+            cover_letter = blank_to_none(data.get("cover_letter"))
             if cover_letter and len(cover_letter) > 3000:
                 return jsonify({"error": "validation_error", "message": "cover_letter exceeds 3000 characters"}), 400
+            actor_id = blank_to_none(data.get("actor_id"))
+            # the partitioned table has no foreign keys: insert only when the
+            # application (and the actor, if any) exist
             cursor.execute(
                 """
                 INSERT INTO application_log (
                     application_id, actor_id, status,
                     candidate_last_name, candidate_first_name, cv, cover_letter,
                     note, sent_at
-                ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+                )
+                SELECT ap.id, %s, %s, %s, %s, %s, %s, %s, COALESCE(%s, NOW())
+                FROM application ap
+                WHERE ap.id = %s
+                  AND (%s IS NULL OR EXISTS (SELECT 1 FROM user_account u WHERE u.id = %s))
                 """,
                 (
-                    data["application_id"],
-                    _n(data.get("actor_id")),
-                    _n(data.get("status")),
+                    actor_id,
+                    blank_to_none(data.get("status")),
                     data.get("candidate_last_name"),
                     data.get("candidate_first_name"),
-                    _n(data.get("cv")),
+                    blank_to_none(data.get("cv")),
                     cover_letter,
-                    _n(data.get("note")),
-                    _n(data.get("sent_at")),
+                    blank_to_none(data.get("note")),
+                    blank_to_none(data.get("sent_at")),
+                    data["application_id"],
+                    actor_id,
+                    actor_id,
                 ),
             )
+            if not cursor.rowcount:
+                return jsonify({"error": "not_found", "message": "application or actor not found"}), 404
+            new_id = cursor.lastrowid
+            cv_store.adjust_refs(cursor, {blank_to_none(data.get("cv")): 1})
             conn.commit()
 
-            new_id = cursor.lastrowid
             cursor.execute("SELECT * FROM application_log WHERE id = %s", (new_id,))
             created = cursor.fetchone()
 
@@ -93,23 +331,3 @@ def add_application_log():
     finally:
         if conn:
             conn.close()
-
-
-@bp.route("/application_logs/<int:application_log_id>", methods=["DELETE"])
-def delete_application_log(application_log_id):
-    conn = None
-    try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("DELETE FROM application_log WHERE id = %s", (application_log_id,))
-            affected = cursor.rowcount
-        conn.commit()
-
-        if affected == 0:
-            return jsonify({"error": "not_found", "message": "application_log not found"}), 404
-        return "", 204
-    except Exception as e:
-        return jsonify({"error": "database_error", "message": str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
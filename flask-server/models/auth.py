@@ -1,23 +1,23 @@
 from flask import Blueprint, jsonify, request, session, make_response, current_app
+import math
 from db import get_db_connection
+from query_recorder import query_budget
+import passwords
+import ratelimit
+import sessions
 
 bp = Blueprint("auth", __name__)
 
 
 def current_user():
-    """Return the current user payload from the session or None."""
+    """Return the current user payload (the cached profile) or None."""
     if session.get('user_id'):
-        return {
-            'id': session.get('user_id'),
-            'first_name': session.get('user_first_name'),
-            'last_name': session.get('user_last_name'),
-            'email': session.get('user_email'),
-            'is_admin': bool(session.get('is_admin', False)),
-        }
+        return sessions.get_profile(session['user_id'])
     return None
 
 
 @bp.route('/login', methods=['POST'])
+@query_budget(2)
 def login():
     """Simple login endpoint.
     Accepts either form-urlencoded (email/identifiant, password) or JSON.
@@ -34,6 +34,12 @@ def login():
         return jsonify({"error": "validation_error", "message": "email and password are required"}), 400
 
 
+    wait = ratelimit.login_attempt(request.remote_addr, email)
+    if wait:
+        return jsonify({"error": "too_many_requests", "message": "too many login attempts, retry later"}), \
+            429, {"Retry-After": str(math.ceil(wait))}
+
+    # the connection goes back to the pool before hashing
     conn = None
     try:
         conn = get_db_connection()
@@ -43,36 +49,54 @@ def login():
                 (email,)
             )
             user = cursor.fetchone()
-
-        if not user or user.get('password_hash') != password:
-            return jsonify({"error": "unauthorized", "message": "invalid credentials"}), 401
-
-        
-        session['user_id'] = user['id']
-        session['user_email'] = user['email']
-        session['is_admin'] = bool(user.get('is_admin', False))
-        session['user_first_name'] = user.get('first_name')
-        session['user_last_name'] = user.get('last_name')
-
-        return jsonify({
-            "message": "connected",
-            "user": {
-                "id": user['id'],
-                "first_name": user.get('first_name'),
-                "last_name": user.get('last_name'),
-                "email": user['email'],
-                "is_admin": bool(user.get('is_admin', False)),
-                "cv": user.get('cv'),
-                "phone": user.get('phone'),
-                "role": user.get('role')
-            }
-        }), 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
     finally:
         if conn:
             conn.close()
 
+    try:
+        valid = passwords.verify(user['password_hash'] if user else None, password)
+    except passwords.PasswordBusy as e:
+        return jsonify({"error": "unavailable", "message": str(e)}), 503, {"Retry-After": "1"}
+    if not valid:
+        return jsonify({"error": "unauthorized", "message": "invalid credentials"}), 401
+    ratelimit.login_succeeded(email)
+    if passwords.needs_rehash(user['password_hash']):
+        _rehash(user, password)
+
+    # only what access checks need; the profile is cached apart
+    session.clear()
+    sessions.rotate(session)
+    session['user_id'] = user['id']
+    session['is_admin'] = bool(user.get('is_admin', False))
+    session['user_role'] = user.get('role')
+
+    return jsonify({"message": "connected", "user": sessions.cache_profile(user)}), 200
+
+
+def _rehash(user, password):
+    """Store a hash with the current parameters (plain text or old cost).
+
+    Best effort: the login succeeds anyway and the next one tries again.
+    """
+    conn = None
+    try:
+        new_hash = passwords.hash_password(password)
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            # unless the password was changed in the meantime
+            cursor.execute(
+                "UPDATE user_account SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                (new_hash, user['id'], user['password_hash'])
+            )
+        conn.commit()
+    except Exception as e:
+        current_app.logger.warning("password rehash of user %s failed: %s", user['id'], e)
+    finally:
+        if conn:
+            conn.close()
+
 
 @bp.route('/logout', methods=['POST', 'GET'])
 def logout():
@@ -90,43 +114,24 @@ def logout():
 
 
 @bp.route('/session', methods=['GET'])
+@query_budget(1)
 def session_info():
-    """Return the current session user with fresh data from database."""
+    """Return the current session user, from the profile cache or the database."""
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({'user': None}), 200
-    
-  
-    conn = None
+
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT id, first_name, last_name, email, is_admin, cv, phone, role FROM user_account WHERE id = %s",
-                (user_id,)
-            )
-            user = cursor.fetchone()
-        
-        if not user:
-           
-            session.clear()
-            return jsonify({'user': None}), 200
-        
-        return jsonify({
-            'user': {
-                'id': user['id'],
-                'first_name': user.get('first_name'),
-                'last_name': user.get('last_name'),
-                'email': user['email'],
-                'is_admin': bool(user.get('is_admin', False)),
-                'cv': user.get('cv'),
-                'phone': user.get('phone'),
-                'role': user.get('role')
-            }
-        }), 200
+        user = sessions.get_profile(user_id)
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
 
+    if not user:
+        session.clear()
+        return jsonify({'user': None}), 200
+    # keep access checks in line with the row (is_admin or role changed)
+    if session.get('is_admin') != user['is_admin']:
+        session['is_admin'] = user['is_admin']
+    if session.get('user_role') != user['role']:
+        session['user_role'] = user['role']
+    return jsonify({'user': user}), 200
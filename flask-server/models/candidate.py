@@ -0,0 +1,113 @@
+from flask import Blueprint, jsonify, request, session
+from db import get_db_connection
+from pagination import PaginationError, parse_limit, encode_cursor, decode_cursor
+from search_index import SEARCH_MIN_TERM_LENGTH, search_terms, snippet
+from models.user import USER_COLUMNS
+
+bp = Blueprint("candidate", __name__)
+
+# best matching CVs considered per query; candidates are ranked among them
+MAX_MATCHED_CVS = 500
+
+
+@bp.route("/candidates/search", methods=["GET"])
+def search_candidates():
+    """Full-text search over the CVs of candidates, for recruiters.
+
+    Matches the text extracted by cv_text.py (ft_cv_text index; every term
+    must match, as a word prefix) and returns the people whose profile CV
+    or an application CV matched, best CV first, with a highlighted
+    snippet. CVs not processed yet are not found. Pages with `limit` and
+    `cursor`.
+    """
+    if not session.get('user_id'):
+        return jsonify({"error": "unauthorized", "message": "not logged in"}), 401
+    if not session.get('is_admin') and session.get('user_role') != 'responsible':
+        return jsonify({"error": "forbidden", "message": "insufficient privileges"}), 403
+
+    conn = None
+    try:
+        terms = search_terms(request.args.get("q"))
+        if not terms:
+            return jsonify({
+                "error": "validation_error",
+                "message": f"q must contain at least one word of {SEARCH_MIN_TERM_LENGTH}+ characters"
+            }), 400
+        try:
+            limit = parse_limit(request.args.get("limit"))
+            cursor_token = request.args.get("cursor")
+            offset = decode_cursor(cursor_token, 1)[0] if cursor_token else 0
+            if not isinstance(offset, int) or offset < 0:
+                raise PaginationError("invalid cursor")
+        except PaginationError as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        against = " ".join(f"+{t}*" for t in terms)
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT f.path, MATCH(t.content) AGAINST (%s IN BOOLEAN MODE) AS score
+                FROM stored_file_text t JOIN stored_file f ON f.sha256 = t.sha256
+                WHERE MATCH(t.content) AGAINST (%s IN BOOLEAN MODE)
+                ORDER BY score DESC LIMIT %s
+                """,
+                (against, against, MAX_MATCHED_CVS),
+            )
+            matches = {row["path"]: row for row in cursor.fetchall()}
+            if not matches:
+                return jsonify({"candidates": [], "next_cursor": None}), 200
+
+            # owners through idx_user_cv and idx_logs_cv
+            in_paths = ", ".join(["%s"] * len(matches))
+            cursor.execute(
+                f"""
+                SELECT id AS person_id, cv FROM user_account WHERE cv IN ({in_paths})
+                UNION
+                SELECT ap.person_id, l.cv FROM application_log l
+                JOIN application ap ON ap.id = l.application_id
+                WHERE l.cv IN ({in_paths})
+                """,
+                list(matches) * 2,
+            )
+            best = {}
+            for row in cursor.fetchall():
+                current = best.get(row["person_id"])
+                if current is None or matches[row["cv"]]["score"] > matches[current]["score"]:
+                    best[row["person_id"]] = row["cv"]
+            ranked = sorted(best, key=lambda pid: (matches[best[pid]]["score"], pid), reverse=True)
+            page = ranked[offset:offset + limit]
+
+            people, texts = {}, {}
+            if page:
+                cursor.execute(
+                    f"SELECT {', '.join(USER_COLUMNS)} FROM user_account WHERE id IN ({', '.join(['%s'] * len(page))})",
+                    page,
+                )
+                people = {row["id"]: row for row in cursor.fetchall()}
+                # the text only of the CVs shown, for the snippets
+                shown = sorted({best[pid] for pid in page})
+                cursor.execute(
+                    "SELECT f.path, t.content FROM stored_file f JOIN stored_file_text t ON t.sha256 = f.sha256"
+                    f" WHERE f.path IN ({', '.join(['%s'] * len(shown))})",
+                    shown,
+                )
+                texts = {row["path"]: row["content"] for row in cursor.fetchall()}
+
+        candidates = []
+        for pid in page:
+            if pid not in people:
+                continue
+            candidates.append({
+                **people[pid],
+                "matched_cv": best[pid],
+                "score": float(matches[best[pid]]["score"]),
+                "snippet": snippet(texts.get(best[pid]), terms),
+            })
+        next_cursor = encode_cursor(offset + limit) if len(ranked) > offset + limit else None
+        return jsonify({"candidates": candidates, "next_cursor": next_cursor}), 200
+    except Exception as e:
+        return jsonify({"error": "database_error", "message": str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
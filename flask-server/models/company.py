@@ -1,16 +1,34 @@
-from flask import Flask, Blueprint, jsonify, request
+from flask import Flask, Blueprint, jsonify, request, session
+import pymysql
 from db import get_db_connection
+from projection import ProjectionError, select_columns
+from cache import cached, invalidate
+import search_index
+import counters
+from bulk import BulkError, parse_rows, chunks, insert_rows
+from fields import blank_to_none
 
 bp = Blueprint("company", __name__)
 
-@bp.route("/companies", methods=["GET"])
+COMPANY_COLUMNS = ("id", "name", "address", "website", "created_by", "created_at", "updated_at")
+COMPANY_SUMMARY_COLUMNS = COMPANY_COLUMNS
+COMPANY_REQUIRED_FIELDS = ("name",)
+# columns set by POST/PUT /companies and /companies/bulk
+COMPANY_INSERT_COLUMNS = ("name", "address", "website", "created_by")
 
+@bp.route("/companies", methods=["GET"])
+@cached("companies")
 def get_companies():
     conn = None
     try:
+        try:
+            columns = select_columns(request.args.get("fields"), COMPANY_COLUMNS, COMPANY_SUMMARY_COLUMNS)
+        except ProjectionError as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM company;")
+            cursor.execute(f"SELECT {columns} FROM company;")
             companies = cursor.fetchall()
         return jsonify({"companies": companies}), 200
     except Exception as e:
@@ -21,6 +39,7 @@ def get_companies():
 
 
 @bp.route("/company/<int:company_id>")
+@cached("companies")
 def get_one_company(company_id):
     conn = None
     try:
@@ -32,7 +51,9 @@ def get_one_company(company_id):
         if not company:
             return jsonify({"error": "not_found", "message": "company not found"}), 404
             
-        return jsonify({"company": company}), 200
+        resp = jsonify({"company": company})
+        resp.last_modified = company["updated_at"]
+        return resp, 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
     finally: 
@@ -46,36 +67,27 @@ def add_company():
     try:
         data = request.get_json(silent=True) or {}
 
-        required_fields = ["name"]
-        missing = [f for f in required_fields if not data.get(f)]
-        if missing:
-            return jsonify({
-                "error": "validation_error",
-                "message": f"Missing required field(s): {', '.join(missing)}"
-            }), 400
+        values, error = _company_values(data)
+        if error:
+            return jsonify({"error": "validation_error", "message": error}), 400
 
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            def _n(v):
-                return v if (v is not None and str(v).strip() != "") else None
-
             cursor.execute(
                 """
                 INSERT INTO company (name, address, website, created_by)
                 VALUES (%s, %s, %s, %s)
                 """,
-                (
-                    data["name"],
-                    _n(data.get("address")),
-                    _n(data.get("website")),
-                    _n(data.get("created_by")),
-                ),
+                values,
             )
+            new_id = cursor.lastrowid
+            counters.adjust(cursor, {counters.COMPANIES: 1})
             conn.commit()
 
-            new_id = cursor.lastrowid
             cursor.execute("SELECT * FROM company WHERE id = %s", (new_id,))
             created = cursor.fetchone()
+        invalidate("companies")
+        invalidate("stats")
 
         resp = jsonify({"company": created})
         resp.status_code = 201
@@ -89,25 +101,124 @@ def add_company():
             conn.close()
 
 
+def _company_values(data):
+    """Validate a POST/PUT body or bulk row; return (values in COMPANY_INSERT_COLUMNS order, error)."""
+    missing = [f for f in COMPANY_REQUIRED_FIELDS if not data.get(f)]
+    if missing:
+        return None, f"Missing required field(s): {', '.join(missing)}"
+    for field, limit in (("name", 150), ("address", 255), ("website", 150)):
+        if len(str(data.get(field) or "")) > limit:
+            return None, f"{field} exceeds {limit} characters"
+    try:
+        created_by = int(data["created_by"]) if blank_to_none(data.get("created_by")) is not None else None
+    except (TypeError, ValueError):
+        return None, "created_by must be an integer"
+    return (
+        str(data["name"]).strip(),
+        blank_to_none(data.get("address")),
+        blank_to_none(data.get("website")),
+        created_by,
+    ), None
+
+
+def _name_key(name):
+    # uq_company_name compares names case-, accent- and trailing-space-insensitively
+    return search_index.fold(name).rstrip()
+
+
+@bp.route("/companies/bulk", methods=["POST"])
+def bulk_add_companies():
+    """Create many companies from a JSON array, NDJSON or CSV upload.
+
+    Rows are validated like POST /companies, names already taken (in the
+    table or earlier in the upload) and created_by ids of no user are
+    rejected, and the rest is inserted in transactions of BULK_CHUNK_SIZE
+    rows. The response lists the created ids and the rejected rows, both by
+    row index (0-based, CSV header excluded).
+    """
+    if not session.get('user_id') or not session.get('is_admin'):
+        return jsonify({"error": "forbidden", "message": "admin_required"}), 403
+    try:
+        rows = parse_rows(request)
+    except BulkError as e:
+        return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+    conn = None
+    try:
+        prepared, errors, seen = [], [], set()
+        for i, data in enumerate(rows):
+            values, error = _company_values(data)
+            if not error and _name_key(values[0]) in seen:
+                error = "duplicate name in upload"
+            if error:
+                errors.append({"row": i, "message": error})
+            else:
+                seen.add(_name_key(values[0]))
+                prepared.append((i, values))
+
+        created = []
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            user_ids = sorted({values[3] for _, values in prepared if values[3] is not None})
+            if user_ids:
+                cursor.execute(
+                    f"SELECT id FROM user_account WHERE id IN ({', '.join(['%s'] * len(user_ids))})",
+                    user_ids,
+                )
+                known = {row["id"] for row in cursor.fetchall()}
+                errors.extend({"row": i, "message": "created_by user not found"}
+                              for i, values in prepared if values[3] is not None and values[3] not in known)
+                prepared = [(i, values) for i, values in prepared if values[3] is None or values[3] in known]
+
+            for chunk in chunks(prepared):
+                names = [values[0] for _, values in chunk]
+                cursor.execute(
+                    f"SELECT name FROM company WHERE name IN ({', '.join(['%s'] * len(names))})", names
+                )
+                taken = {_name_key(row["name"]) for row in cursor.fetchall()}
+                if taken:
+                    errors.extend({"row": i, "message": "company name already exists"}
+                                  for i, values in chunk if _name_key(values[0]) in taken)
+                    chunk = [(i, values) for i, values in chunk if _name_key(values[0]) not in taken]
+                if not chunk:
+                    continue
+                try:
+                    ids = insert_rows(cursor, "company", COMPANY_INSERT_COLUMNS, [v for _, v in chunk], key="name")
+                    counters.adjust(cursor, {counters.COMPANIES: len(ids)})
+                    conn.commit()
+                except pymysql.MySQLError as e:
+                    conn.rollback()
+                    errors.extend({"row": i, "message": str(e)} for i, _ in chunk)
+                    continue
+                created.extend({"row": i, "id": new_id} for (i, _), new_id in zip(chunk, ids))
+
+        if created:
+            invalidate("companies")
+            invalidate("stats")
+        errors.sort(key=lambda e: e["row"])
+        if not created:
+            return jsonify({"error": "validation_error", "message": "No row could be imported",
+                            "errors": errors}), 400
+        return jsonify({"created": created, "errors": errors}), 201
+    except Exception as e:
+        return jsonify({"error": "database_error", "message": str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
 @bp.route("/companies/<int:company_id>", methods=["PUT"])
 def update_company(company_id):
     conn = None
     try:
         data = request.get_json(silent=True) or {}
 
-        required_fields = ["name"]
-        missing = [f for f in required_fields if not data.get(f)]
-        if missing:
-            return jsonify({
-                "error": "validation_error",
-                "message": f"Missing required field(s): {', '.join(missing)}"
-            }), 400
+        values, error = _company_values(data)
+        if error:
+            return jsonify({"error": "validation_error", "message": error}), 400
 
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            def _n(v):
-                return v if (v is not None and str(v).strip() != "") else None
-
             cursor.execute(
                 """
                 UPDATE company
@@ -117,13 +228,7 @@ def update_company(company_id):
                     created_by=%s
                 WHERE id=%s
                 """,
-                (
-                    data["name"],
-                    _n(data.get("address")),
-                    _n(data.get("website")),
-                    _n(data.get("created_by")),
-                    company_id,
-                ),
+                values + (company_id,),
             )
             affected = cursor.rowcount
             conn.commit()
@@ -133,6 +238,11 @@ def update_company(company_id):
 
             cursor.execute("SELECT * FROM company WHERE id = %s", (company_id,))
             updated = cursor.fetchone()
+            # advertisements can embed their company (expand=company)
+            cursor.execute("SELECT id FROM advertisement WHERE company_id = %s", (company_id,))
+            ad_ids = [row["id"] for row in cursor.fetchall()]
+        invalidate("companies", company_id)
+        invalidate("advertisements", *ad_ids)
 
         return jsonify({"company": updated}), 200
     except Exception as e:
@@ -148,12 +258,32 @@ def delete_company(company_id):
     try:
         conn = get_db_connection()
         with conn.cursor() as cursor:
+            # advertisements, and their applications, go with the company
+            # (ON DELETE CASCADE)
+            cursor.execute(
+                "SELECT id, company_id, employment_type FROM advertisement WHERE company_id = %s FOR UPDATE",
+                (company_id,)
+            )
+            ads = cursor.fetchall()
+            ad_ids = [row["id"] for row in ads]
+            deltas = counters.cascaded_application_deltas(
+                cursor, "advertisement_id IN (SELECT id FROM advertisement WHERE company_id = %s)", (company_id,)
+            )
             cursor.execute("DELETE FROM company WHERE id = %s", (company_id,))
             affected = cursor.rowcount
+            if affected:
+                deltas.update(counters.advertisement_deltas(ads, -1))
+                deltas[counters.COMPANIES] -= 1
+                counters.adjust(cursor, deltas)
         conn.commit()
 
         if affected == 0:
             return jsonify({"error": "not_found", "message": "company not found"}), 404
+        for ad_id in ad_ids:
+            search_index.remove_advertisement(ad_id)
+        invalidate("companies", company_id)
+        invalidate("advertisements", *ad_ids)
+        invalidate("stats")
         return "", 204
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
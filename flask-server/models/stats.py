@@ -1,21 +1,24 @@
 from flask import Blueprint, jsonify
 from db import get_db_connection
+from cache import cached
+import counters
 
 bp = Blueprint("stats", __name__)
 
 @bp.route("/stats")
+@cached("stats")
 def get_stats():
     conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute('SELECT COUNT(*) AS count FROM advertisement;')
-            offres = cursor.fetchone()['count']
-            cursor.execute('SELECT COUNT(*) AS count FROM company;')
-            entreprises = cursor.fetchone()['count']
+            stats = counters.read(cursor)
         return jsonify({
-            'offres': offres,
-            'entreprises': entreprises,
+            'offres': stats[counters.ADVERTISEMENTS],
+            'entreprises': stats[counters.COMPANIES],
+            'applications_by_status': stats[counters.APPLICATIONS_BY_STATUS],
+            'advertisements_by_company': stats[counters.ADVERTISEMENTS_BY_COMPANY],
+            'advertisements_by_employment_type': stats[counters.ADVERTISEMENTS_BY_EMPLOYMENT_TYPE],
         })
     except Exception as e:
         return jsonify({'error': 'database_error', 'message': str(e)}), 500
@@ -1,113 +1,91 @@
-from flask import Blueprint, send_from_directory, current_app, request, jsonify, session
+from flask import Blueprint, current_app, request, jsonify, session
+from werkzeug.security import safe_join
 from db import get_db_connection
+from static_files import send_static
+import cv_store
+import sessions
 import os
-import uuid
+from collections import Counter
 
 bp = Blueprint("uploads", __name__)
 
 
 @bp.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    uploads_dir = os.path.join(current_app.root_path, 'uploads')
-    return send_from_directory(uploads_dir, filename)
+    """Serve an uploaded file (see static_files.send_static)
+
+    Files of the CV store are named after their sha256, which is their
+    ETag, and never change: browsers may cache them for good.
+    """
+    accel_path = current_app.config['UPLOADS_ACCEL_PREFIX'].rstrip('/') + '/' + filename
+    digest = cv_store.stored_digest('/uploads/' + filename)
+    if digest:
+        path = cv_store.file_path('/uploads/' + filename)
+        resp = send_static(path, etag=digest, immutable=True, accel_path=accel_path)
+    else:
+        path = safe_join(os.path.join(current_app.root_path, 'uploads'), filename)
+        resp = send_static(path, accel_path=accel_path) if path else None
+    if resp is None:
+        return jsonify({"error": "not_found", "message": "file not found"}), 404
+    return resp
 
 
 @bp.route('/upload', methods=['POST'])
 def upload_file():
-    """Generic file upload endpoint for CVs"""
+    """Generic file upload endpoint for CVs
+
+    The file (multipart `file` field, or the raw body sent with its own
+    Content-Type) is streamed into the content-addressed store: uploading
+    the same CV again returns the same path.
+    """
     if not session.get('user_id'):
         return jsonify({"error": "unauthorized", "message": "not logged in"}), 403
 
-    if 'file' not in request.files:
-        return jsonify({"error": "validation_error", "message": "file is required"}), 400
-
-    f = request.files['file']
-    filename = f.filename or ''
-    
-    if filename == '':
-        return jsonify({"error": "validation_error", "message": "empty filename"}), 400
-
-    allowed_types = ['application/pdf', 'application/msword', 
-                     'application/vnd.openxmlformats-officedocument.wordprocessingml.document']
-    
-    if f.mimetype not in allowed_types:
-        return jsonify({
-            "error": "validation_error", 
-            "message": "only PDF and Word files are allowed"
-        }), 400
-
-  
-    f.seek(0, os.SEEK_END)
-    size = f.tell()
-    f.seek(0)
-    MAX = 5 * 1024 * 1024
-    
-    if size > MAX:
-        return jsonify({"error": "validation_error", "message": "file exceeds 5MB"}), 400
-
-    
-    ext = os.path.splitext(filename)[1]
-    unique_filename = f'cv_{session.get("user_id")}_{uuid.uuid4().hex}{ext}'
-    
-
-    uploads_dir = os.path.join(current_app.root_path, 'uploads')
-    os.makedirs(uploads_dir, exist_ok=True)
-    dest = os.path.join(uploads_dir, unique_filename)
-    f.save(dest)
+    try:
+        file_path = cv_store.receive(request)
+    except cv_store.UploadError as e:
+        return jsonify({"error": "validation_error", "message": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": "database_error", "message": str(e)}), 500
 
-    file_path = f'/uploads/{unique_filename}'
     return jsonify({"file_path": file_path}), 200
 
 
 @bp.route('/users/<int:user_id>/cv', methods=['PUT'])
 def upload_user_cv(user_id):
     """Upload CV specifically for user profile"""
-    
+
     if not session.get('user_id'):
         return jsonify({"error": "unauthorized", "message": "not logged in"}), 403
     if session.get('user_id') != user_id and not session.get('is_admin'):
         return jsonify({"error": "forbidden", "message": "insufficient privileges"}), 403
 
-    if 'file' not in request.files:
-        return jsonify({"error": "validation_error", "message": "file is required"}), 400
-
-    f = request.files['file']
-
-    filename = f.filename or ''
-    if filename == '':
-        return jsonify({"error": "validation_error", "message": "empty filename"}), 400
-
-    
-    allowed = ['application/pdf']
-    if f.mimetype not in allowed:
-        return jsonify({"error": "validation_error", "message": "only PDF files are allowed"}), 400
-
-
-    f.seek(0, os.SEEK_END)
-    size = f.tell()
-    f.seek(0)
-    MAX = 5 * 1024 * 1024
-    if size > MAX:
-        return jsonify({"error": "validation_error", "message": "file exceeds 5MB"}), 400
-
-   
-    uploads_dir = os.path.join(current_app.root_path, 'uploads')
-    os.makedirs(uploads_dir, exist_ok=True)
-    safe_name = f'user_{user_id}_cv.pdf'
-    dest = os.path.join(uploads_dir, safe_name)
-    f.save(dest)
-
-    
     conn = None
     try:
+        # no pooled connection is held while the body is read
+        try:
+            cv_path = cv_store.receive(request, allowed_types={"application/pdf"})
+        except cv_store.UploadError as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), e.status
+
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("UPDATE user_account SET cv = %s WHERE id = %s", (f'/uploads/{safe_name}', user_id))
+            cursor.execute("SELECT cv FROM user_account WHERE id = %s FOR UPDATE", (user_id,))
+            previous = cursor.fetchone()
+            if not previous:
+                conn.rollback()
+                return jsonify({"error": "not_found", "message": "User not found"}), 404
+            cursor.execute("UPDATE user_account SET cv = %s WHERE id = %s", (cv_path, user_id))
+            # the previous CV loses this reference, the new one gains it
+            deltas = Counter({cv_path: 1})
+            deltas[previous["cv"]] -= 1
+            cv_store.adjust_refs(cursor, deltas)
         conn.commit()
+        sessions.forget_profile(user_id)
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
     finally:
         if conn:
             conn.close()
 
-    return jsonify({"cv": f'/uploads/{safe_name}' }), 200
+    return jsonify({"cv": cv_path}), 200
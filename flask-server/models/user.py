@@ -1,19 +1,45 @@
 from flask import Blueprint, jsonify, request
 from db import get_db_connection
+from query_recorder import query_budget
+from projection import ProjectionError, select_columns
+from cache import invalidate
+from export import ExportError, export_format, stream_rows
+import counters
+import cv_store
+import passwords
+import sessions
+from collections import Counter
+from fields import blank_to_none
 
 bp = Blueprint("user", __name__)
 
+# password_hash is deliberately not selectable
+USER_COLUMNS = (
+    "id", "first_name", "last_name", "email", "phone", "cv", "role",
+    "is_admin", "created_at",
+)
+USER_SUMMARY_COLUMNS = USER_COLUMNS
+# what other resources embed for an actor (expand=actor, expand=handler)
+USER_REF_COLUMNS = ("id", "first_name", "last_name", "email")
+
 @bp.route("/users")
+@query_budget(1)
 def get_users():
+    """All users; `format=json|ndjson|csv` streams them for exports."""
     conn = None
     try:
+        try:
+            columns = select_columns(request.args.get("fields"), USER_COLUMNS, USER_SUMMARY_COLUMNS)
+            fmt = export_format(request.args)
+        except (ProjectionError, ExportError) as e:
+            return jsonify({"error": "validation_error", "message": str(e)}), 400
+
+        if fmt:
+            return stream_rows(f"SELECT {columns} FROM user_account ORDER BY id", (), "users", fmt)
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM user_account;")
+            cursor.execute(f"SELECT {columns} FROM user_account;")
             users = cursor.fetchall()
-        
-        for u in users:
-            u.pop("password_hash", None)
         return jsonify({"users": users}), 200
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
@@ -23,6 +49,7 @@ def get_users():
 
 
 @bp.route("/user/<int:user_id>")
+@query_budget(1)
 def get_one_user(user_id):
     conn = None
     try:
@@ -46,6 +73,7 @@ def get_one_user(user_id):
 
 
 @bp.route("/users", methods=["POST"])
+@query_budget(3)
 def add_user():
     conn = None
     try:
@@ -59,11 +87,15 @@ def add_user():
                 "message": f"Missing required field(s): {', '.join(missing)}"
             }), 400
 
+        # clients send the password itself in password_hash; hashed before
+        # a pooled connection is taken
+        try:
+            password_hash = passwords.hash_password(data["password_hash"])
+        except passwords.PasswordBusy as e:
+            return jsonify({"error": "unavailable", "message": str(e)}), 503, {"Retry-After": "1"}
+
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            def _n(v):
-                return v if (v is not None and str(v).strip() != "") else None
-
             cursor.execute(
                 """
                 INSERT INTO user_account (first_name, last_name, password_hash, email, phone, cv, role, is_admin)
@@ -72,17 +104,18 @@ def add_user():
                 (
                     data["first_name"],
                     data["last_name"],
-                    data["password_hash"],
+                    password_hash,
                     data["email"],
-                    _n(data.get("phone")),
-                    _n(data.get("cv")),
+                    blank_to_none(data.get("phone")),
+                    blank_to_none(data.get("cv")),
                     data["role"],
                     bool(data.get("is_admin", False)),
                 ),
             )
+            new_id = cursor.lastrowid
+            cv_store.adjust_refs(cursor, {blank_to_none(data.get("cv")): 1})
             conn.commit()
 
-            new_id = cursor.lastrowid
             cursor.execute("SELECT * FROM user_account WHERE id = %s", (new_id,))
             created = cursor.fetchone()
 
@@ -97,6 +130,7 @@ def add_user():
 
 
 @bp.route("/users/<int:user_id>", methods=["PUT"])
+@query_budget(4)
 def update_user(user_id):
     conn = None
     try:
@@ -111,8 +145,10 @@ def update_user(user_id):
 
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            def _n(v):
-                return v if (v is not None and str(v).strip() != "") else None
+            cursor.execute("SELECT cv FROM user_account WHERE id = %s FOR UPDATE", (user_id,))
+            previous = cursor.fetchone()
+            if not previous:
+                return jsonify({"error": "not_found", "message": "User not found"}), 404
 
             cursor.execute(
                 """
@@ -130,18 +166,18 @@ def update_user(user_id):
                     data["first_name"],
                     data["last_name"],
                     data["email"],
-                    _n(data.get("phone")),
-                    _n(data.get("cv")),
+                    blank_to_none(data.get("phone")),
+                    blank_to_none(data.get("cv")),
                     data["role"],
                     bool(data.get("is_admin", False)),
                     user_id,
                 ),
             )
-            affected = cursor.rowcount
+            deltas = Counter({blank_to_none(data.get("cv")): 1})
+            deltas[previous["cv"]] -= 1
+            cv_store.adjust_refs(cursor, deltas)
             conn.commit()
-
-            if affected == 0:
-                return jsonify({"error": "not_found", "message": "User not found"}), 404
+            sessions.forget_profile(user_id)
 
             cursor.execute("SELECT * FROM user_account WHERE id = %s", (user_id,))
             updated = cursor.fetchone()
@@ -162,12 +198,20 @@ def delete_user(user_id):
     try:
         conn = get_db_connection()
         with conn.cursor() as cursor:
+            # the user's applications go with the account (ON DELETE CASCADE)
+            deltas = counters.cascaded_application_deltas(cursor, "person_id = %s", (user_id,))
+            # log rows keep their own reference to the CV
+            cv_store.adjust_user_cv_ref(cursor, user_id, -1)
             cursor.execute("DELETE FROM user_account WHERE id = %s", (user_id,))
             affected = cursor.rowcount
+            if affected:
+                counters.adjust(cursor, deltas)
         conn.commit()
 
         if affected == 0:
             return jsonify({"error": "not_found", "message": "User not found"}), 404
+        sessions.forget_profile(user_id)
+        invalidate("stats")
         return "", 204
     except Exception as e:
         return jsonify({"error": "database_error", "message": str(e)}), 500
@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import date, datetime
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class PaginationError(ValueError):
+    """Raised when limit/cursor query parameters cannot be used."""
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    """Parse the `limit` query parameter, clamped to [1, maximum]."""
+    if value is None or value == "":
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be positive")
+    return min(limit, maximum)
+
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row of a page into an opaque token."""
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, size, types=None):
+    """Decode a token produced by encode_cursor back into its `size` values.
+
+    With `types` (one per value), values are checked against them: int for
+    non-negative integers, date/datetime for ISO strings (returned parsed),
+    any other type by isinstance.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise PaginationError("invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise PaginationError("invalid cursor")
+    if types is not None:
+        values = [_cursor_value(value, kind) for value, kind in zip(values, types)]
+    return values
+
+
+def _cursor_value(value, kind):
+    if kind is int:
+        if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+            return value
+    elif kind in (date, datetime):
+        if isinstance(value, str):
+            try:
+                return kind.fromisoformat(value)
+            except ValueError:
+                pass
+    elif isinstance(value, kind):
+        return value
+    raise PaginationError("invalid cursor")
@@ -0,0 +1,127 @@
+# Password hashing for user_account.password_hash.
+# PASSWORD_HASH_METHOD is a werkzeug method string: "scrypt:N:r:p" (default
+# scrypt:32768:8:1, ~32 MiB and a few tens of ms per hash) or
+# "pbkdf2:sha256:iterations". Hashing is slow on purpose, so it never runs
+# on the request thread directly: it goes to a pool of PASSWORD_HASH_WORKERS
+# threads per process (hashlib releases the GIL; under gevent these are
+# real OS threads too), with at most PASSWORD_HASH_QUEUE more hashes waiting.
+# A request that cannot get a slot within PASSWORD_HASH_TIMEOUT seconds gets
+# PasswordBusy (503) instead of piling up behind an attack.
+# Unknown accounts are checked against a dummy hash, made by the pool when
+# it starts, through the same pool, so they cost the same time.
+# Rows still holding a plain-text password (seed data, accounts created
+# before hashing) or a hash made with other parameters are verified as they
+# are and re-hashed on the next successful login (see models/auth.py).
+import hmac
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import load_config
+
+HASH_CONFIG = {}
+
+_HASHED_RE = re.compile(r"^(scrypt|pbkdf2):[\w:]+\$[^$]+\$[0-9a-f]+$")
+
+_pool = None
+_slots = None
+# future of a hash with the current parameters, the pool's first job
+_dummy = None
+_lock = threading.Lock()
+
+
+class PasswordBusy(Exception):
+    """Every hashing slot is taken; the caller should answer 503."""
+
+
+def configure(config):
+    """Apply PASSWORD_HASH_* settings, replacing the current pool."""
+    global _pool, _slots, _dummy
+    HASH_CONFIG.update({
+        'method': config['PASSWORD_HASH_METHOD'],
+        'workers': config['PASSWORD_HASH_WORKERS'],
+        'queue': config['PASSWORD_HASH_QUEUE'],
+        'timeout': config['PASSWORD_HASH_TIMEOUT'],
+    })
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool, _slots, _dummy = None, None, None
+
+
+def _settings():
+    if not HASH_CONFIG:
+        configure(load_config())
+    return HASH_CONFIG
+
+
+def _executor(workers):
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            # patched threads are greenlets and would block the hub
+            from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+            return NativeThreadPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+
+
+def _start():
+    global _pool, _slots, _dummy
+    settings = _settings()
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _slots = threading.BoundedSemaphore(settings['workers'] + settings['queue'])
+                pool = _executor(settings['workers'])
+                _dummy = pool.submit(generate_password_hash, '', settings['method'])
+                _pool = pool
+    return _slots, _pool, _dummy
+
+
+def _run(fn, *args):
+    settings = _settings()
+    slots, pool, _ = _start()
+    if not slots.acquire(timeout=settings['timeout']):
+        raise PasswordBusy("too many password checks in progress")
+    try:
+        return pool.submit(fn, *args).result()
+    finally:
+        slots.release()
+
+
+def is_hashed(stored):
+    return bool(stored) and _HASHED_RE.match(stored) is not None
+
+
+def hash_password(password):
+    """Hash `password` with PASSWORD_HASH_METHOD (in the pool)."""
+    return _run(generate_password_hash, password, _settings()['method'])
+
+
+def verify(stored, password):
+    """Check `password` against a stored hash or legacy plain-text value.
+
+    `stored` None (unknown account) still costs one hash, so response times
+    do not tell which emails exist.
+    """
+    if stored is None:
+        _run(check_password_hash, _dummy_hash(), password)
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+    return _run(check_password_hash, stored, password)
+
+
+def needs_rehash(stored):
+    """True for plain-text values and hashes made with other parameters."""
+    # compare expanded forms: "scrypt" is stored as "scrypt:32768:8:1"
+    return not is_hashed(stored) or stored.split('$', 1)[0] != _dummy_hash().split('$', 1)[0]
+
+
+def _dummy_hash():
+    # made by the pool when it starts, ahead of any other hash; this only
+    # waits for it
+    return _start()[2].result()
@@ -0,0 +1,59 @@
+class ProjectionError(ValueError):
+    """Raised when the `fields` query parameter names unknown columns."""
+
+
+def select_columns(fields, columns, summary, required=("id",), prefix=""):
+    """Return the SQL column list for a `fields` query parameter.
+
+    `fields` is either empty/"summary" (the compact list projection),
+    "full" for every public column, or a comma separated list of column
+    names. Only names from `columns` are accepted so the result is safe to
+    interpolate into SQL. Columns in `required` are always selected;
+    `prefix` (a table alias such as "a.") is prepended to each of them.
+    """
+    fields = (fields or "").strip()
+    if fields in ("", "summary"):
+        chosen = list(summary)
+    elif fields in ("full", "all"):
+        chosen = list(columns)
+    else:
+        chosen = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in chosen if f not in columns]
+        if unknown:
+            raise ProjectionError(f"Unknown field(s): {', '.join(unknown)}")
+
+    for col in reversed(required):
+        if col not in chosen:
+            chosen.insert(0, col)
+    return ", ".join(prefix + c for c in chosen)
+
+
+def expand_relations(expand, relations):
+    """Parse an `expand` query parameter into SQL for the related rows.
+
+    `relations` maps a relation name to (table alias, JOIN clause, columns).
+    Returns (extra select list, join clauses, requested names); the related
+    columns are selected as "<name>__<column>" for nest_relations().
+    """
+    names = [n.strip() for n in (expand or "").split(",") if n.strip()]
+    unknown = [n for n in names if n not in relations]
+    if unknown:
+        raise ProjectionError(f"Unknown expand value(s): {', '.join(unknown)}")
+    names = list(dict.fromkeys(names))
+
+    selects, joins = [], []
+    for name in names:
+        alias, join, columns = relations[name]
+        selects.extend(f"{alias}.{c} AS {name}__{c}" for c in columns)
+        joins.append(join)
+    return ", ".join(selects), " ".join(joins), names
+
+
+def nest_relations(rows, names, relations):
+    """Move the "<name>__<column>" keys of each row into a nested object."""
+    for row in rows:
+        for name in names:
+            related = {c: row.pop(f"{name}__{c}") for c in relations[name][2]}
+            # LEFT JOIN without a match (e.g. handled_by is NULL)
+            row[name] = related if related["id"] is not None else None
+    return rows
@@ -0,0 +1,184 @@
+# Query recorder for development and tests: QUERY_RECORDER=warn or strict.
+# Records every SQL statement of a request and, once the response is built:
+#   - logs (logger "query_recorder") statements of the same shape run
+#     QUERY_RECORDER_REPEAT times or more, the usual sign of a query in a loop
+#     (N+1); shapes ignore literals and the length of IN (%s, ...) lists;
+#   - runs EXPLAIN on SELECT/UPDATE/DELETE statements slower than
+#     QUERY_RECORDER_EXPLAIN_MS and logs full table or index scans,
+#     filesorts and temporary tables;
+#   - checks the query budget a view declares with @query_budget(n): over it,
+#     "warn" logs and "strict" raises QueryBudgetExceeded, which fails the
+#     request (and the test, with app.testing set).
+# The count is also sent in an X-Query-Count header. Tests can look at the
+# reports of the requests they make:
+#     with query_recorder.recording() as reports:
+#         client.get("/applications")
+#     assert reports[0]["queries"] == 1
+import logging
+import re
+import threading
+from contextlib import contextmanager
+
+from flask import Blueprint, current_app, g, has_request_context, request
+
+import db
+from config import load_config
+
+bp = Blueprint('query_recorder', __name__)
+
+logger = logging.getLogger("query_recorder")
+
+RECORDER_CONFIG = {}
+
+# EXPLAIN access types reading a whole table or index
+SCAN_TYPES = ('ALL', 'index')
+
+_IN_LIST_RE = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_EXPLAINABLE_RE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+
+_recorders = []
+_recorders_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more statements than its @query_budget (strict mode)."""
+
+
+def configure(config):
+    """Apply QUERY_RECORDER* settings and (un)hook the DB instrumentation."""
+    RECORDER_CONFIG.update({
+        'mode': config['QUERY_RECORDER'],
+        'repeat': config['QUERY_RECORDER_REPEAT'],
+        'explain_seconds': config['QUERY_RECORDER_EXPLAIN_MS'] / 1000,
+    })
+    if _on_query in db.QUERY_LISTENERS:
+        db.QUERY_LISTENERS.remove(_on_query)
+    if RECORDER_CONFIG['mode'] != 'off':
+        db.QUERY_LISTENERS.append(_on_query)
+
+
+def _settings():
+    if not RECORDER_CONFIG:
+        configure(load_config())
+    return RECORDER_CONFIG
+
+
+def query_budget(limit):
+    """Declare how many statements a view may run (anywhere under @bp.route)."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+@contextmanager
+def recording():
+    """Collect the report of every request finished inside the block."""
+    reports = []
+    with _recorders_lock:
+        _recorders.append(reports)
+    try:
+        yield reports
+    finally:
+        with _recorders_lock:
+            _recorders.remove(reports)
+
+
+def shape(query):
+    """`query` without literals, whitespace runs and IN list lengths."""
+    query = _IN_LIST_RE.sub("(%s, ...)", query)
+    query = _LITERAL_RE.sub("?", query)
+    return " ".join(query.split())
+
+
+def _on_query(query, args, seconds, rows):
+    statements = g.get('recorded_queries') if has_request_context() else None
+    if statements is not None:
+        statements.append((query, args, seconds))
+
+
+@bp.before_app_request
+def _start_request():
+    if _settings()['mode'] != 'off':
+        g.recorded_queries = []
+
+
+@bp.after_app_request
+def _check_request(resp):
+    statements = g.get('recorded_queries')
+    if statements is None:
+        return resp
+    settings = _settings()
+    where = f"{request.method} {request.path}"
+
+    shapes = {}
+    for query, _, _ in statements:
+        key = shape(query)
+        shapes[key] = shapes.get(key, 0) + 1
+    repeated = {key: n for key, n in shapes.items() if n >= settings['repeat']}
+    for key, n in repeated.items():
+        logger.warning("%s: same statement %d times (N+1?): %.300s", where, n, key)
+
+    scans = _explain_slow(statements, settings['explain_seconds'], where)
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    report = {
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'queries': len(statements),
+        'budget': budget,
+        'repeated': repeated,
+        'scans': scans,
+    }
+    with _recorders_lock:
+        for reports in _recorders:
+            reports.append(report)
+
+    resp.headers['X-Query-Count'] = str(len(statements))
+    if budget is not None and len(statements) > budget:
+        message = f"{where} ran {len(statements)} statements, budget of {request.endpoint} is {budget}"
+        if settings['mode'] == 'strict':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+    return resp
+
+
+def _explain_slow(statements, threshold, where):
+    """EXPLAIN the slow statements; return the scans found."""
+    slow = [(q, a, s) for q, a, s in statements if s >= threshold and _EXPLAINABLE_RE.match(q)]
+    if not slow:
+        return []
+    scans = []
+    conn = None
+    try:
+        # past the listeners: not recorded, not in /metrics
+        conn = db.get_pool().acquire()
+        with conn.raw_cursor() as cursor:
+            for query, args, seconds in slow:
+                if args and isinstance(args, (list, tuple)) and isinstance(args[0], (list, tuple, dict)):
+                    # executemany: the plan of the first row stands for the others
+                    args = args[0]
+                cursor.execute("EXPLAIN " + query, args)
+                for row in cursor.fetchall():
+                    extra = row.get('Extra') or ''
+                    if row.get('type') in SCAN_TYPES or 'filesort' in extra or 'temporary' in extra:
+                        scan = {
+                            'table': row.get('table'),
+                            'type': row.get('type'),
+                            'rows': row.get('rows'),
+                            'extra': extra,
+                            'ms': round(seconds * 1000, 1),
+                            'statement': shape(query),
+                        }
+                        scans.append(scan)
+                        logger.warning("%s: %.1f ms, %s on %s (%s rows, %s): %.300s", where, scan['ms'],
+                                       scan['type'], scan['table'], scan['rows'], extra, scan['statement'])
+    except Exception as e:
+        logger.warning("%s: EXPLAIN failed: %s", where, e)
+    finally:
+        if conn:
+            conn.close()
+    return scans
@@ -0,0 +1,108 @@
+# Login throttling with in-memory token buckets.
+# Each client IP and each account (email) has a bucket of LOGIN_IP_BURST /
+# LOGIN_ACCOUNT_BURST attempts, refilled at LOGIN_IP_PER_MINUTE /
+# LOGIN_ACCOUNT_PER_MINUTE; an attempt needs a token in both, otherwise
+# POST /login answers 429 with Retry-After before any hashing is done.
+# A successful login refills the account's bucket. Buckets live in the
+# process: with several gunicorn workers a client gets up to that many
+# times the configured rate. Behind a reverse proxy set TRUSTED_PROXIES so
+# the client IP is read from X-Forwarded-For.
+import threading
+import time
+from collections import OrderedDict
+
+from config import load_config
+
+LIMIT_CONFIG = {}
+
+_limiters = {}
+
+
+class TokenBuckets:
+    """One token bucket per key: `burst` tokens, refilled at `rate` per second.
+
+    At most `max_keys` buckets are kept, the least recently used go first
+    (a dropped bucket comes back full).
+    """
+
+    def __init__(self, burst, rate, max_keys=100000):
+        self.burst = burst
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, monotonic time)
+        self._lock = threading.Lock()
+
+    def _level(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def wait_time(self, key, now=None):
+        """Seconds before `key` has a token (0 if it has one now)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens = self._level(key, now)
+        if tokens >= 1:
+            return 0
+        return (1 - tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def take(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._buckets[key] = (max(0.0, self._level(key, now) - 1), now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+def configure(config):
+    """Apply LOGIN_* settings, dropping the current buckets."""
+    LIMIT_CONFIG.update({
+        'enabled': config['LOGIN_RATE_LIMIT'],
+        'ip': (config['LOGIN_IP_BURST'], config['LOGIN_IP_PER_MINUTE'] / 60),
+        'account': (config['LOGIN_ACCOUNT_BURST'], config['LOGIN_ACCOUNT_PER_MINUTE'] / 60),
+        'max_keys': config['LOGIN_RATE_MAX_KEYS'],
+    })
+    _limiters.clear()
+
+
+def _settings():
+    if not LIMIT_CONFIG:
+        configure(load_config())
+    return LIMIT_CONFIG
+
+
+def _limiter(kind):
+    limiter = _limiters.get(kind)
+    if limiter is None:
+        settings = _settings()
+        burst, rate = settings[kind]
+        limiter = _limiters.setdefault(kind, TokenBuckets(burst, rate, settings['max_keys']))
+    return limiter
+
+
+def _account_key(email):
+    return email.strip().lower()
+
+
+def login_attempt(ip, email):
+    """Take a token for one login attempt; return 0, or seconds to wait (429)."""
+    if not _settings()['enabled']:
+        return 0
+    ips, accounts = _limiter('ip'), _limiter('account')
+    account = _account_key(email)
+    # refused attempts do not use up the other bucket
+    wait = max(ips.wait_time(ip), accounts.wait_time(account))
+    if wait:
+        return wait
+    ips.take(ip)
+    accounts.take(account)
+    return 0
+
+
+def login_succeeded(email):
+    if _settings()['enabled']:
+        _limiter('account').reset(_account_key(email))
@@ -4,6 +4,20 @@ CHARACTER SET = utf8mb4
 COLLATE = utf8mb4_unicode_ci;
 USE react_flask_db;
 
+-- French stopwords for the FULLTEXT indexes. The InnoDB default list is
+-- English; this one is read when the indexes are created (see the end of
+-- the file).
+CREATE TABLE ft_stopword_fr (
+        value VARCHAR(30) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO ft_stopword_fr (value) VALUES
+        ("les"), ("des"), ("une"), ("est"), ("dans"), ("pour"), ("par"), ("sur"),
+        ("avec"), ("aux"), ("qui"), ("que"), ("vous"), ("nous"), ("votre"), ("vos"),
+        ("notre"), ("nos"), ("son"), ("ses"), ("leur"), ("leurs"), ("ces"), ("cette"),
+        ("mais"), ("ou"), ("donc"), ("car"), ("pas"), ("plus"), ("tout"), ("tous"),
+        ("très"), ("être"), ("avoir"), ("sont"), ("comme"), ("afin"), ("ainsi");
+
 CREATE TABLE user_account (
         id INT AUTO_INCREMENT PRIMARY KEY,
         first_name VARCHAR(155) NOT NULL,
@@ -14,7 +28,9 @@ CREATE TABLE user_account (
         cv VARCHAR(255),
         role ENUM('responsible', 'candidate') NOT NULL,
         is_admin BOOLEAN DEFAULT FALSE,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        -- owners of a CV, for GET /candidates/search
+        INDEX idx_user_cv (cv)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE company (
@@ -24,6 +40,7 @@ CREATE TABLE company (
         website VARCHAR(150),
         created_by INT DEFAULT NULL,
         created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
         CONSTRAINT uq_company_name UNIQUE (name),
         CONSTRAINT fk_company_created_by
             FOREIGN KEY (created_by) REFERENCES user_account(id)
@@ -45,6 +62,12 @@ CREATE TABLE advertisement (
         required_experience VARCHAR(155),
         created_by INT DEFAULT NULL,
         created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX idx_ads_publish (publish_date, id),
+        INDEX idx_ads_company_publish (company_id, publish_date, id),
+        INDEX idx_ads_type_publish (employment_type, publish_date, id),
+        INDEX idx_ads_mode_publish (work_mode, publish_date, id),
+        INDEX idx_ads_location_publish (location, publish_date, id),
         CONSTRAINT fk_ads_company
             FOREIGN KEY (company_id) REFERENCES company(id)
             ON DELETE CASCADE ON UPDATE CASCADE,
@@ -73,8 +96,14 @@ CREATE TABLE application (
             ON DELETE SET NULL ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Append-only audit trail: the API inserts rows and never updates or
+-- deletes them. Monthly partitions on sent_at keep time-window
+-- scans and retention cheap; partitioned InnoDB tables cannot have foreign
+-- keys, so application_id/actor_id are checked by the application and log
+-- rows outlive the application they describe. log_partitions.py adds the
+-- upcoming months.
 CREATE TABLE application_log (
-        id INT AUTO_INCREMENT PRIMARY KEY,
+        id INT AUTO_INCREMENT,
         application_id INT NOT NULL,
         actor_id INT DEFAULT NULL,
         status ENUM('Envoyée','Review','Acceptée','Refusée'),
@@ -84,14 +113,89 @@ CREATE TABLE application_log (
         cover_letter VARCHAR(3000), 
         note TEXT,
         sent_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        CONSTRAINT fk_app_logs_app
-            FOREIGN KEY (application_id) REFERENCES application(id)
-            ON DELETE CASCADE ON UPDATE CASCADE,
-        CONSTRAINT fk_app_logs_actor
-            FOREIGN KEY (actor_id) REFERENCES user_account(id)
-            ON DELETE SET NULL ON UPDATE CASCADE
+        PRIMARY KEY (id, sent_at),
+        -- history of one application, newest first; covers status lookups
+        INDEX idx_logs_app_sent (application_id, sent_at, id, status, actor_id),
+        -- time-window listing with keyset pagination
+        INDEX idx_logs_sent (sent_at, id),
+        -- applications sent with a CV, for GET /candidates/search
+        INDEX idx_logs_cv (cv)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+PARTITION BY RANGE COLUMNS (sent_at) (
+        PARTITION p_old VALUES LESS THAN ('2025-01-01'),
+        PARTITION p2025_01 VALUES LESS THAN ('2025-02-01'),
+        PARTITION p2025_02 VALUES LESS THAN ('2025-03-01'),
+        PARTITION p2025_03 VALUES LESS THAN ('2025-04-01'),
+        PARTITION p2025_04 VALUES LESS THAN ('2025-05-01'),
+        PARTITION p2025_05 VALUES LESS THAN ('2025-06-01'),
+        PARTITION p2025_06 VALUES LESS THAN ('2025-07-01'),
+        PARTITION p2025_07 VALUES LESS THAN ('2025-08-01'),
+        PARTITION p2025_08 VALUES LESS THAN ('2025-09-01'),
+        PARTITION p2025_09 VALUES LESS THAN ('2025-10-01'),
+        PARTITION p2025_10 VALUES LESS THAN ('2025-11-01'),
+        PARTITION p2025_11 VALUES LESS THAN ('2025-12-01'),
+        PARTITION p2025_12 VALUES LESS THAN ('2026-01-01'),
+        PARTITION p2026_01 VALUES LESS THAN ('2026-02-01'),
+        PARTITION p2026_02 VALUES LESS THAN ('2026-03-01'),
+        PARTITION p2026_03 VALUES LESS THAN ('2026-04-01'),
+        PARTITION p2026_04 VALUES LESS THAN ('2026-05-01'),
+        PARTITION p2026_05 VALUES LESS THAN ('2026-06-01'),
+        PARTITION p2026_06 VALUES LESS THAN ('2026-07-01'),
+        PARTITION p2026_07 VALUES LESS THAN ('2026-08-01'),
+        PARTITION p2026_08 VALUES LESS THAN ('2026-09-01'),
+        PARTITION p2026_09 VALUES LESS THAN ('2026-10-01'),
+        PARTITION p2026_10 VALUES LESS THAN ('2026-11-01'),
+        PARTITION p2026_11 VALUES LESS THAN ('2026-12-01'),
+        PARTITION p2026_12 VALUES LESS THAN ('2027-01-01'),
+        PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+-- Months of application_log moved to disk by log_archive.py, per
+-- application, so its history is read back from those files only
+CREATE TABLE application_log_archive (
+        application_id INT NOT NULL,
+        month DATE NOT NULL,
+        PRIMARY KEY (application_id, month)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Counters behind GET /stats, maintained by the write handlers (see counters.py)
+CREATE TABLE stat_counter (
+        name VARCHAR(100) NOT NULL PRIMARY KEY,
+        value BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Uploaded CVs, one file per content hash (see cv_store.py). refcount counts
+-- the user_account.cv and application_log.cv values equal to path and is
+-- maintained by the write handlers
+CREATE TABLE stored_file (
+        sha256 CHAR(64) NOT NULL PRIMARY KEY,
+        path VARCHAR(255) NOT NULL UNIQUE,
+        size INT NOT NULL,
+        mime_type VARCHAR(100) NOT NULL,
+        refcount INT NOT NULL DEFAULT 0,
+        last_uploaded_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        -- text extraction by cv_text.py; new content starts pending
+        text_status ENUM('pending', 'done', 'failed', 'unsupported') NOT NULL DEFAULT 'pending',
+        -- unreferenced files for `cv_store.py gc`
+        INDEX idx_stored_file_refcount (refcount, last_uploaded_at),
+        INDEX idx_stored_file_text_status (text_status, last_uploaded_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Text of stored CVs, extracted once per content hash (see cv_text.py)
+CREATE TABLE stored_file_text (
+        sha256 CHAR(64) NOT NULL PRIMARY KEY,
+        content MEDIUMTEXT NOT NULL,
+        extracted_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- The stopword list is set for this session only (no SUPER privilege, no
+-- effect on other schemas) and is used by the indexes created while it is
+-- set. Rebuilding one of them later needs the same SET first.
+SET SESSION innodb_ft_user_stopword_table = 'react_flask_db/ft_stopword_fr';
+CREATE FULLTEXT INDEX ft_ads_text ON advertisement (title, short_description, description);
+CREATE FULLTEXT INDEX ft_cv_text ON stored_file_text (content);
+SET SESSION innodb_ft_user_stopword_table = NULL;
+
 INSERT INTO user_account (first_name, last_name, email, phone, cv, role, password_hash, is_admin) VALUES
         ("Alice", "Martin", "alice.martin@example.com", "+33 6 12 34 56 78", '/uploads/cv.pdf', "candidate", "testtest", FALSE),
         ("Bastien", "Lopez", "bastien.lopez@example.com", "+33 6 98 76 54 32", '/uploads/cv.pdf', "candidate", "testtest", FALSE),
@@ -156,3 +260,11 @@ INSERT INTO application_log (application_id, actor_id, status, candidate_last_na
         (1, 6, "Envoyée", "Martin", "Alice", '/uploads/cv.pdf', "Bonjour, Je souhaite postuler pour le poste Frontend Developer. Vous trouverez mon CV en pièce jointe.", "Candidature initiale envoyée par candidate", "2025-09-02 10:16:00"),
         (2, 6, "Review", "Lopez", "Bastien", '/uploads/cv.pdf', "Bonjour, Je vous transmet ma candidature pour Backend Python. Merci de me tenir informé.", "Candidature initiale envoyée par candidate", "2025-08-22 09:00:00"),
         (3, 7, "Acceptée", "Durand", "Chloe", '/uploads/cv.pdf', "Bonjour, Merci pour votre retour positif. Je suis ravie d'accepter l'offre.", "Réponse candidate après entretien", "2025-09-13 11:45:00");
+
+INSERT INTO stat_counter (name, value)
+SELECT 'advertisements', COUNT(*) FROM advertisement
+UNION ALL SELECT 'companies', COUNT(*) FROM company
+UNION ALL SELECT CONCAT('applications_by_status:', status), COUNT(*) FROM application GROUP BY status
+UNION ALL SELECT CONCAT('advertisements_by_company:', company_id), COUNT(*) FROM advertisement GROUP BY company_id
+UNION ALL SELECT CONCAT('advertisements_by_employment_type:', employment_type), COUNT(*)
+        FROM advertisement WHERE employment_type IS NOT NULL GROUP BY employment_type;
@@ -0,0 +1,320 @@
+import math
+import re
+import threading
+import unicodedata
+
+from markupsafe import escape
+from array import array
+from bisect import bisect_left
+
+# "mysql" uses the FULLTEXT index, "memory" the InvertedIndex below;
+# set from the SEARCH_BACKEND setting by configure()
+SEARCH_BACKEND = 'mysql'
+
+FACETS = ('employment_type', 'work_mode', 'location')
+# a search-as-you-type prefix never expands to more terms than this
+MAX_PREFIX_EXPANSION = 50
+TITLE_BOOST = 2
+MIN_TERM_LENGTH = 2
+STOPWORDS = frozenset("""
+    au aux avec ce ces cette dans de des du elle en et est il ils je la le les
+    leur leurs lui ma mais me mes moi mon ne nos notre nous on ou par pas pour
+    qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous
+    afin ainsi car comme donc etre avoir sont tres plus tout tous
+    the and for with of to in on at an or
+""".split())
+
+_WORD_RE = re.compile(r'\w+')
+
+# queries sent to MySQL's FULLTEXT indexes (innodb_ft_min_token_size)
+SEARCH_MIN_TERM_LENGTH = 3
+SNIPPET_LENGTH = 160
+# snippets look for the first match this far into the text (CVs run to
+# CV_TEXT_MAX_CHARS), folding it a window at a time
+SNIPPET_SCAN_CHARS = 20000
+SNIPPET_SCAN_WINDOW = 4096
+
+
+class _FoldTable(dict):
+    # str.translate() table filled on first sight of each character
+    def __missing__(self, code):
+        ch = chr(code)
+        base = ''.join(c for c in unicodedata.normalize('NFKD', ch) if not unicodedata.combining(c)).lower()
+        self[code] = folded = base[:1] or ch
+        return folded
+
+
+_FOLD_TABLE = _FoldTable()
+
+
+def fold(text):
+    """Lowercase and strip accents, keeping one output char per input char."""
+    if text.isascii():
+        return text.lower()
+    return text.translate(_FOLD_TABLE)
+
+
+def tokenize(text):
+    """Split text into accent-folded index terms, dropping stopwords."""
+    if not text:
+        return []
+    return [w for w in _WORD_RE.findall(fold(text))
+            if len(w) >= MIN_TERM_LENGTH and w not in STOPWORDS]
+
+
+def search_terms(q):
+    """Split a user query into plain words usable in a BOOLEAN MODE query."""
+    words = _WORD_RE.findall(q or "")
+    return [w for w in words if len(w) >= SEARCH_MIN_TERM_LENGTH]
+
+
+def _first_match(pattern, text):
+    # fold() keeps positions, so the text can be folded a window at a time;
+    # a window also holds the char before it (for \b) and reads ahead so a
+    # word across its end is seen whole
+    for pos in range(0, min(len(text), SNIPPET_SCAN_CHARS), SNIPPET_SCAN_WINDOW):
+        begin = max(0, pos - 1)
+        m = pattern.search(fold(text[begin:pos + SNIPPET_SCAN_WINDOW + 64]), pos - begin)
+        if m:
+            return begin + m.start()
+    return None
+
+
+def snippet(text, terms):
+    """Return an HTML-escaped excerpt of `text` with the terms in <mark>.
+
+    Only the start of long texts is searched for the first match
+    (SNIPPET_SCAN_CHARS), and only the excerpt is folded for highlighting.
+    """
+    if not text:
+        return ""
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(fold(t)) for t in terms) + r")\w*")
+
+    first = _first_match(pattern, text)
+    start = 0
+    if first is not None and first > SNIPPET_LENGTH // 3:
+        start = first - SNIPPET_LENGTH // 3
+        # do not cut a word in half
+        space = text.find(" ", start)
+        if space != -1 and space < first:
+            start = space + 1
+    end = min(len(text), start + SNIPPET_LENGTH)
+
+    excerpt = text[start:end]
+    parts, pos = [], 0
+    for m in pattern.finditer(fold(excerpt)):
+        parts.append(str(escape(excerpt[pos:m.start()])))
+        parts.append("<mark>" + str(escape(excerpt[m.start():m.end()])) + "</mark>")
+        pos = m.end()
+    parts.append(str(escape(excerpt[pos:])))
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(text) else "")
+
+
+class InvertedIndex:
+    """In-memory BM25 index over advertisements.
+
+    Postings are kept per term as two parallel arrays (sorted document ids
+    and term frequencies) so memory stays around 6 bytes per posting. The
+    index is per process and only sees the writes served by that process,
+    so gunicorn refuses SEARCH_BACKEND=memory with more than one worker.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # term -> (array of doc ids, array of term frequencies)
+        self._postings = {}
+        self._terms = []
+        self._terms_dirty = False
+        # doc id -> (length, unique terms, metadata dict)
+        self._docs = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, ad):
+        """Index (or re-index) one advertisement row."""
+        tokens = (tokenize(ad.get('title')) * TITLE_BOOST
+                  + tokenize(ad.get('short_description'))
+                  + tokenize(ad.get('description')))
+        freqs = {}
+        for t in tokens:
+            freqs[t] = freqs.get(t, 0) + 1
+        meta = {
+            'company_id': ad.get('company_id'),
+            'employment_type': ad.get('employment_type'),
+            'work_mode': ad.get('work_mode'),
+            'location': ad.get('location'),
+            'salary_min': ad.get('salary_min'),
+            'salary_max': ad.get('salary_max'),
+            'publish_date': str(ad['publish_date']) if ad.get('publish_date') else None,
+        }
+        doc_id = ad['id']
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, tf in freqs.items():
+                entry = self._postings.get(term)
+                if entry is None:
+                    entry = self._postings[term] = (array('I'), array('H'))
+                    self._terms_dirty = True
+                ids, tfs = entry
+                pos = bisect_left(ids, doc_id)
+                ids.insert(pos, doc_id)
+                tfs.insert(pos, min(tf, 0xFFFF))
+            self._docs[doc_id] = (len(tokens), tuple(freqs), meta)
+            self._total_length += len(tokens)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        length, terms, _ = doc
+        self._total_length -= length
+        for term in terms:
+            ids, tfs = self._postings[term]
+            pos = bisect_left(ids, doc_id)
+            if pos < len(ids) and ids[pos] == doc_id:
+                del ids[pos]
+                del tfs[pos]
+            if not ids:
+                del self._postings[term]
+                self._terms_dirty = True
+
+    def _expand(self, term, prefix):
+        if not prefix:
+            return [term] if term in self._postings else []
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+        start = bisect_left(self._terms, term)
+        out = []
+        for t in self._terms[start:start + MAX_PREFIX_EXPANSION]:
+            if not t.startswith(term):
+                break
+            out.append(t)
+        return out
+
+    def search(self, query, filters=None, prefix=True):
+        """Return (ranked [(doc_id, score)], facet counts) for a query.
+
+        Every query term must match; with `prefix` the last term also
+        matches longer words, for search-as-you-type. `filters` maps
+        metadata keys to required values (salary_min/salary_max and
+        published_after/published_before are ranges).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return [], {f: {} for f in FACETS}
+        filters = filters or {}
+        with self._lock:
+            n_docs = len(self._docs) or 1
+            avg_len = (self._total_length / n_docs) or 1.0
+            scores = None
+            for i, term in enumerate(terms):
+                expanded = self._expand(term, prefix and i == len(terms) - 1)
+                term_scores = {}
+                for t in expanded:
+                    ids, tfs = self._postings[t]
+                    idf = math.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+                    for doc_id, tf in zip(ids, tfs):
+                        length = self._docs[doc_id][0]
+                        norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_len))
+                        term_scores[doc_id] = term_scores.get(doc_id, 0.0) + idf * norm
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {d: s + term_scores[d] for d, s in scores.items() if d in term_scores}
+                if not scores:
+                    break
+
+            facets = {f: {} for f in FACETS}
+            ranked = []
+            for doc_id, score in (scores or {}).items():
+                meta = self._docs[doc_id][2]
+                if not _matches(meta, filters):
+                    continue
+                ranked.append((doc_id, score))
+                for f in FACETS:
+                    if meta[f] is not None:
+                        facets[f][meta[f]] = facets[f].get(meta[f], 0) + 1
+
+        ranked.sort(key=lambda r: (-r[1], -r[0]))
+        return ranked, facets
+
+
+def _matches(meta, filters):
+    for key, value in filters.items():
+        if key == 'salary_min':
+            if meta['salary_max'] is None or meta['salary_max'] < value:
+                return False
+        elif key == 'salary_max':
+            if meta['salary_min'] is None or meta['salary_min'] > value:
+                return False
+        elif key == 'published_after':
+            if meta['publish_date'] is None or meta['publish_date'] < value:
+                return False
+        elif key == 'published_before':
+            if meta['publish_date'] is None or meta['publish_date'] > value:
+                return False
+        elif meta.get(key) != value:
+            return False
+    return True
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def configure(config):
+    global SEARCH_BACKEND
+    SEARCH_BACKEND = config['SEARCH_BACKEND']
+
+
+def enabled():
+    return SEARCH_BACKEND == 'memory'
+
+
+def get_index():
+    """Return the process-wide index, building it from the table on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_from_db()
+    return _index
+
+
+def build_from_db():
+    from db import get_db_connection
+
+    index = InvertedIndex()
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, title, short_description, description, publish_date, company_id,"
+                " location, employment_type, work_mode, salary_min, salary_max FROM advertisement"
+            )
+            for row in cursor.fetchall():
+                index.add(row)
+    finally:
+        conn.close()
+    return index
+
+
+def index_advertisement(ad):
+    """Keep the index in sync after an INSERT/UPDATE; no-op until it is built."""
+    if _index is not None and ad:
+        _index.add(ad)
+
+
+def remove_advertisement(advertisement_id):
+    if _index is not None:
+        _index.remove(advertisement_id)
@@ -1,36 +1,96 @@
-from flask import Flask, jsonify, render_template, request, redirect, url_for, session
+import importlib
+import sys
+import time
+from flask import Flask
 from flask_cors import CORS
-from db import bp as db_bp
-from models.user import bp as user_bp
-from models.company import bp as company_bp
-from models.application import bp as application_bp
-from models.advertisement import bp as advertisement_bp
-from models.application_log import bp as application_log_bp
-from models.auth import bp as auth_bp
-from models.uploads import bp as uploads_bp
-from models.stats import bp as stats_bp
-
-app = Flask(__name__)
-import os
-
-FRONTEND_ORIGIN = os.getenv('FRONTEND_ORIGIN', 'http://localhost:5173')
-CORS(app, supports_credentials=True, resources={r"/*": {"origins": FRONTEND_ORIGIN}})
-import os
-
-
-app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key')
-import os
-
-
-app.register_blueprint(db_bp)
-app.register_blueprint(user_bp)
-app.register_blueprint(company_bp)
-app.register_blueprint(application_bp)
-app.register_blueprint(application_log_bp)
-app.register_blueprint(advertisement_bp)
-app.register_blueprint(auth_bp)
-app.register_blueprint(uploads_bp)
-app.register_blueprint(stats_bp)
+from werkzeug.middleware.proxy_fix import ProxyFix
+from config import load_config
+
+# modules with a configure(settings) hook; create_app() configures those the
+# blueprints (or the session interface) imported and never imports the others
+SUBSYSTEMS = (
+    'db',
+    'cache',
+    'search_index',
+    'log_archive',
+    'cv_store',
+    'sessions',
+    'passwords',
+    'ratelimit',
+    'metrics',
+    'query_recorder',
+)
+
+
+def create_app(config=None):
+    """Build the Flask application.
+
+    `config` overrides settings from the environment (see config.py).
+    Blueprint modules are only imported here, and only those listed in
+    the BLUEPRINTS setting, along with the subsystems they use.
+    """
+    started = time.perf_counter()
+    settings = load_config(config)
+
+    app = Flask(__name__)
+    app.config.update(settings)
+
+    blueprints = [importlib.import_module(name).bp for name in settings['BLUEPRINTS']]
+    import sessions
+    # before registering: blueprints read their settings when registered
+    for name in SUBSYSTEMS:
+        if name in sys.modules:
+            sys.modules[name].configure(settings)
+
+    if settings['TRUSTED_PROXIES']:
+        # request.remote_addr is then the client, e.g. for login throttling
+        n = settings['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=n, x_proto=n, x_host=n)
+    sessions.init_app(app)
+    CORS(app, supports_credentials=True, resources={r"/*": {"origins": settings['FRONTEND_ORIGIN']}})
+
+    for bp in blueprints:
+        app.register_blueprint(bp)
+
+    if settings['WARMUP']:
+        warm_up(app)
+
+    app.config['STARTUP_SECONDS'] = time.perf_counter() - started
+    return app
+
+
+def warm_up(app):
+    """Open the DB pool, build the search index and fill the response cache.
+
+    Each step is best effort: whatever fails here is done lazily by the
+    first request that needs it. The in-memory index is only built here
+    with SEARCH_BACKEND=memory, which gunicorn runs with a single worker.
+    """
+    if 'db' not in sys.modules:
+        return
+    import db
+    try:
+        db.init_pool()
+    except Exception as e:
+        app.logger.warning("DB pool not warmed: %s", e)
+        # without a database the remaining steps would only fail slowly
+        return
+
+    search_index = sys.modules.get('search_index')
+    if search_index is not None and search_index.enabled():
+        try:
+            search_index.get_index()
+        except Exception as e:
+            app.logger.warning("search index not built at startup: %s", e)
+
+    with app.test_client() as client:
+        for path in app.config['WARMUP_PATHS']:
+            try:
+                client.get(path)
+            except Exception as e:
+                app.logger.warning("warm-up of %s failed: %s", path, e)
+
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0")
+    # development server only, production goes through wsgi.py + gunicorn
+    create_app().run(debug=True, host="0.0.0.0")
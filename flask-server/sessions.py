@@ -0,0 +1,188 @@
+# Server-side sessions and the cached user profile behind GET /session.
+# SESSION_BACKEND picks where session data lives:
+#   "memory"  this process only (development server, single worker)
+#   "redis"   any Redis-compatible server at SESSION_REDIS_URL, shared by workers
+#   "cookie"  Flask's signed cookie, the data travels with every request
+# With a server-side backend the cookie only carries an opaque random id and
+# entries expire after SESSION_TTL seconds without activity. The session
+# holds the user id, is_admin and role; the profile shown by /session is
+# cached per user for SESSION_PROFILE_TTL seconds in the same store and
+# dropped by the handlers that change the user row. With "cookie" there is
+# no store every worker sees, so profiles are read from user_account each
+# time: a copy in one process would outlive a change made through another
+# (gunicorn refuses "memory" with more than one worker for the same reason).
+import secrets
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from cache import LocalCache, RedisCache
+from config import load_config
+from db import get_db_connection
+
+SESSION_CONFIG = {}
+
+PROFILE_COLUMNS = ("id", "first_name", "last_name", "email", "is_admin", "cv", "phone", "role")
+
+_serializer = TaggedJSONSerializer()
+_store = None
+_store_lock = threading.Lock()
+
+
+def configure(config):
+    """Apply SESSION_* settings, dropping the current store."""
+    global _store
+    SESSION_CONFIG.update({
+        'backend': config['SESSION_BACKEND'],
+        'ttl': config['SESSION_TTL'],
+        'profile_ttl': config['SESSION_PROFILE_TTL'],
+        'max_entries': config['SESSION_MAX_ENTRIES'],
+        'redis_url': config['SESSION_REDIS_URL'],
+        'key_prefix': config['CACHE_KEY_PREFIX'],
+    })
+    _store = None
+
+
+def _settings():
+    if not SESSION_CONFIG:
+        configure(load_config())
+    return SESSION_CONFIG
+
+
+def get_store():
+    """Return the store of sessions and profiles (a cache.CacheBackend)."""
+    global _store
+    settings = _settings()
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings['backend'] == 'redis':
+                    _store = RedisCache(settings['redis_url'], settings['key_prefix'])
+                else:
+                    _store = LocalCache(settings['max_entries'])
+    return _store
+
+
+def _load(key):
+    raw = get_store().get(key)
+    return _serializer.loads(raw.decode('utf-8')) if raw is not None else None
+
+
+def _dump(key, value, ttl):
+    get_store().set(key, _serializer.dumps(value).encode('utf-8'), ttl)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, refresh=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.modified = refresh
+        self.rotate = False
+
+
+def rotate(session):
+    """Give the session a new id when it is next saved (call on login)."""
+    if isinstance(session, ServerSideSession):
+        session.rotate = True
+        session.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Sessions kept in get_store(); the cookie holds the session id only."""
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = _load('session:' + sid)
+            if data is not None:
+                expires_at = data.pop('_expires_at', 0)
+                # slide the expiry, but write back at most once per half TTL
+                refresh = expires_at - time.time() < _settings()['ttl'] / 2
+                return ServerSideSession(data, sid, refresh)
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.sid is not None and session.modified:
+                get_store().delete('session:' + session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+
+        if session.rotate and session.sid is not None:
+            get_store().delete('session:' + session.sid)
+            session.sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        ttl = _settings()['ttl']
+        _dump('session:' + session.sid, {**session, '_expires_at': time.time() + ttl}, ttl)
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add('Cookie')
+
+
+def init_app(app):
+    if _settings()['backend'] != 'cookie':
+        app.session_interface = ServerSideSessionInterface()
+
+
+def _caches_profiles():
+    return _settings()['backend'] != 'cookie'
+
+
+def _profile_key(user_id):
+    # like the response cache, keys embed a generation bumped by
+    # forget_profile(), so a row read before a write is never stored
+    # under the live key
+    return f"profile:{user_id}:{get_store().get_counter(f'gen:profile:{user_id}')}"
+
+
+def cache_profile(user, key=None):
+    """Store the profile of `user` (a user_account row) and return it."""
+    profile = {column: user.get(column) for column in PROFILE_COLUMNS}
+    profile['is_admin'] = bool(profile['is_admin'])
+    if _caches_profiles():
+        _dump(key or _profile_key(profile['id']), profile, _settings()['profile_ttl'])
+    return profile
+
+
+def get_profile(user_id):
+    """Profile of `user_id` from the store, else from user_account; None if gone."""
+    key = None
+    if _caches_profiles():
+        key = _profile_key(user_id)
+        profile = _load(key)
+        if profile is not None:
+            return profile
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT {', '.join(PROFILE_COLUMNS)} FROM user_account WHERE id = %s", (user_id,))
+            user = cursor.fetchone()
+    finally:
+        conn.close()
+    return cache_profile(user, key) if user else None
+
+
+def forget_profile(user_id):
+    """Drop the cached profile after the user row changed or was deleted."""
+    if _caches_profiles():
+        get_store().incr(f'gen:profile:{user_id}')
@@ -0,0 +1,105 @@
+import mimetypes
+import os
+from datetime import datetime, timezone
+
+from flask import Response, current_app, request
+from werkzeug.http import http_date, is_resource_modified
+
+# browsers keep content-addressed files for a year without revalidating
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# read size when the WSGI server cannot send the file itself
+CHUNK_SIZE = 64 * 1024
+
+
+def _read(f, length):
+    try:
+        while length > 0:
+            data = f.read(min(CHUNK_SIZE, length))
+            if not data:
+                return
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def _body(f, length):
+    file_wrapper = request.environ.get("wsgi.file_wrapper")
+    if file_wrapper is None:
+        return _read(f, length)
+    # gunicorn hands this to sendfile(): no copy through the worker, from
+    # the current offset of `f` for Content-Length bytes
+    return file_wrapper(f, CHUNK_SIZE)
+
+
+def _if_range_matches(etag, modified):
+    # a stale If-Range asks for the whole (changed) file instead of a range
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    if if_range.date is not None:
+        return if_range.date == modified
+    return True
+
+
+def send_static(path, etag=None, immutable=False, accel_path=None):
+    """Serve the file at `path` with validators, byte ranges and caching.
+
+    `etag` defaults to one derived from mtime and size; `immutable` files
+    (content-addressed) are cached by the browser for a year, others are
+    revalidated on every use. With UPLOADS_OFFLOAD set the body is left to
+    the reverse proxy: "x-accel-redirect" (nginx) sends `accel_path`,
+    "x-sendfile" (Apache, lighttpd) the absolute path. Otherwise single
+    Range requests are answered here (206/416), honouring If-Range.
+    """
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not os.path.isfile(path):
+        return None
+
+    size = stat.st_size
+    modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+    etag = etag or f"{stat.st_mtime_ns:x}-{size:x}"
+    headers = {
+        "ETag": f'"{etag}"',
+        "Last-Modified": http_date(modified),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": (f"private, max-age={IMMUTABLE_MAX_AGE}, immutable" if immutable
+                          else "private, no-cache"),
+    }
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=modified):
+        return Response(status=304, headers=headers)
+
+    offload = current_app.config["UPLOADS_OFFLOAD"]
+    if offload == "x-accel-redirect" and accel_path:
+        headers["X-Accel-Redirect"] = accel_path
+        return Response(status=200, headers=headers, mimetype=mimetype)
+    if offload == "x-sendfile":
+        headers["X-Sendfile"] = os.path.abspath(path)
+        return Response(status=200, headers=headers, mimetype=mimetype)
+
+    status, start, length = 200, 0, size
+    byte_range = request.range
+    if byte_range is not None and _if_range_matches(etag, modified):
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            if len(byte_range.ranges) == 1:
+                headers["Content-Range"] = f"bytes */{size}"
+                return Response(status=416, headers=headers)
+            # several ranges: the whole file is cheaper than multipart/byteranges
+        else:
+            start, stop = bounds
+            status, length = 206, stop - start
+            headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+
+    f = open(path, "rb")
+    if start:
+        f.seek(start)
+    response = Response(_body(f, length), status=status, headers=headers,
+                        mimetype=mimetype, direct_passthrough=True)
+    response.content_length = length
+    return response
@@ -0,0 +1,105 @@
+# Run from flask-server/: python -m pytest tests
+# No database is needed: the tests only reach code that answers before
+# opening a connection, patch get_db_connection, or put a pool of
+# FakeConnection in place of the real one (use_fake_pool).
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import db  # noqa: E402
+import server  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = server.create_app({"WARMUP": False})
+    app.testing = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def log_in(client, user_id=1, role="candidate", is_admin=False):
+    with client.session_transaction() as s:
+        s["user_id"] = user_id
+        s["user_role"] = role
+        s["is_admin"] = is_admin
+
+
+class FakeCursor:
+    """Returns the rows of its connection to every statement."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = tuple((name,) for name in conn.columns)
+        self.rowcount = 0
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, query, args=None):
+        self.conn.statements.append((query, args))
+        self._rows = [dict(row) for row in self.conn.rows]
+        self.rowcount = len(self._rows)
+        return self.rowcount
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    rows = ()
+    columns = ()
+
+    def __init__(self):
+        self.statements = []
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+    def ping(self, reconnect=False):
+        pass
+
+
+def use_fake_pool(rows=(), size=3):
+    """Make get_db_connection() hand out FakeConnections returning `rows`.
+
+    Call it after create_app(), which configures a pool of its own.
+    """
+    columns = tuple(rows[0]) if rows else ()
+    connection_class = type("Connection", (FakeConnection,), {"rows": rows, "columns": columns})
+    db._pool = db.ConnectionPool(connection_class, min_size=0, max_size=size, timeout=0.1)
+    db._pool_pid = os.getpid()
+    return db._pool
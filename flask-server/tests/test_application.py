@@ -0,0 +1,20 @@
+import models.application as application
+from conftest import log_in
+
+
+def _no_database():
+    raise AssertionError("the database should not be reached")
+
+
+def test_bulk_status_refused_to_candidates(client, monkeypatch):
+    monkeypatch.setattr(application, "get_db_connection", _no_database)
+    log_in(client, role="candidate")
+    resp = client.patch("/applications/bulk", json={"ids": [1, 2], "status": "Refusée"})
+    assert resp.status_code == 403
+    assert resp.json["error"] == "forbidden"
+
+
+def test_bulk_status_needs_login(client, monkeypatch):
+    monkeypatch.setattr(application, "get_db_connection", _no_database)
+    resp = client.patch("/applications/bulk", json={"ids": [1], "status": "Refusée"})
+    assert resp.status_code == 401
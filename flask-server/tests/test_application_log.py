@@ -0,0 +1,150 @@
+import json
+from datetime import date, datetime
+
+import pytest
+
+import export
+import log_archive
+import models.application_log as application_log
+from models.application_log import APPLICATION_LOG_COLUMNS
+
+
+def _log(log_id, sent_at, **values):
+    row = dict.fromkeys(APPLICATION_LOG_COLUMNS)
+    row.update(id=log_id, application_id=1, candidate_last_name="Martin",
+               candidate_first_name="Léa", status="Envoyée", sent_at=sent_at, **values)
+    return row
+
+
+class _LogCursor:
+    """Answers the statements of models/application_log.py from `table`
+    (rows still in application_log); archived rows passed in as a derived
+    table are read back from the parameters."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = tuple((c,) for c in APPLICATION_LOG_COLUMNS)
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, query, params=None):
+        self.conn.statements.append(query)
+        table = self.conn.table
+        if "MAX(id)" in query:
+            self._rows = [{"max_id": max((row["id"] for row in table), default=None)}]
+        elif query.startswith("SELECT id FROM application_log WHERE id IN"):
+            self._rows = [{"id": row["id"]} for row in table if row["id"] in params]
+        elif "UNION ALL" in query or "FROM (SELECT" in query:
+            n = len(APPLICATION_LOG_COLUMNS)
+            self._rows = [dict(zip(APPLICATION_LOG_COLUMNS, params[i:i + n])) for i in range(0, len(params), n)]
+        elif "WHERE l.id = %s" in query:
+            self._rows = [dict(row) for row in table if row["id"] == params[0]]
+        else:
+            self._rows = [dict(row) for row in table]
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class _LogConnection:
+    def __init__(self, table):
+        self.table = table
+        self.statements = []
+        self.closed = False
+
+    def cursor(self, *args):
+        return _LogCursor(self)
+
+    def close(self):
+        self.closed = True
+
+    discard = close
+
+
+@pytest.fixture
+def archive(app, tmp_path):
+    log_archive.configure({**app.config, "LOG_ARCHIVE_DIR": str(tmp_path)})
+    yield tmp_path
+    log_archive.configure(app.config)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    rows = [_log(7, datetime(2025, 3, 2, 9, 0)), _log(8, datetime(2025, 3, 3, 9, 0))]
+    conn = _LogConnection(rows)
+    monkeypatch.setattr(application_log, "get_db_connection", lambda: conn)
+    monkeypatch.setattr(export, "get_db_connection", lambda: conn)
+    return conn
+
+
+def _archive_rows(rows):
+    for row in rows:
+        if row.get("cover_letter"):
+            row["cover_letter_sha256"] = log_archive.store_letter(row["cover_letter"])
+        row["cover_letter"] = None
+    log_archive._append(date(2023, 5, 1), rows)
+
+
+def test_archived_log_is_found_by_id(client, archive, table):
+    _archive_rows([_log(3, datetime(2023, 5, 4, 10, 30), cover_letter="Madame, Monsieur")])
+
+    resp = client.get("/application_log/3")
+    assert resp.status_code == 200
+    assert resp.json["application_log"]["id"] == 3
+    assert resp.json["application_log"]["cover_letter"] == "Madame, Monsieur"
+
+
+def test_unknown_id_above_the_table_does_not_read_the_archive(client, archive, table, monkeypatch):
+    def no_archive(log_id, with_letters=True):
+        raise AssertionError("the archive should not be read")
+
+    monkeypatch.setattr(log_archive, "find_row", no_archive)
+    assert client.get("/application_log/9").status_code == 404
+
+
+def test_unknown_id_below_the_table_is_a_404(client, archive, table):
+    _archive_rows([_log(3, datetime(2023, 5, 4, 10, 30))])
+    assert client.get("/application_log/4").status_code == 404
+
+
+def test_full_list_includes_archived_logs_once(client, archive, table):
+    # 7 was archived by a run interrupted before its DELETE
+    _archive_rows([_log(3, datetime(2023, 5, 4, 10, 30)), _log(7, datetime(2025, 3, 2, 9, 0))])
+
+    resp = client.get("/application_logs")
+    assert resp.status_code == 200
+    assert sorted(row["id"] for row in resp.json["application_logs"]) == [3, 7, 8]
+
+
+def test_window_of_the_full_list_applies_to_archived_logs(client, archive, table):
+    _archive_rows([_log(3, datetime(2023, 5, 4, 10, 30)), _log(4, datetime(2023, 5, 20, 10, 30))])
+
+    resp = client.get("/application_logs", query_string={"until": "2023-05-10"})
+    assert 3 in [row["id"] for row in resp.json["application_logs"]]
+    assert 4 not in [row["id"] for row in resp.json["application_logs"]]
+
+
+def test_export_streams_archived_logs_after_the_table(client, archive, table):
+    _archive_rows([_log(3, datetime(2023, 5, 4, 10, 30))])
+
+    resp = client.get("/application_logs", query_string={"format": "ndjson"})
+    assert resp.status_code == 200
+    ids = [json.loads(line)["id"] for line in resp.get_data(as_text=True).splitlines()]
+    assert ids == [7, 8, 3]
+    assert table.closed
@@ -0,0 +1,65 @@
+import bulk
+from bulk import insert_rows
+
+
+class _TableCursor:
+    """INSERTs into an in-memory table whose AUTO_INCREMENT leaves gaps
+    between rows, as with auto_increment_increment > 1 or interleaved
+    inserts."""
+
+    def __init__(self):
+        self.rows = []
+        self.statements = []
+        self.lastrowid = None
+        self._next_id = 1
+        self._result = []
+        self._literals = []
+
+    def mogrify(self, query, args):
+        # a literal per row, resolved back by execute()
+        self._literals.append(tuple(args))
+        return f"(row {len(self._literals) - 1})"
+
+    def execute(self, query, args=None):
+        self.statements.append(query)
+        if query.startswith("INSERT"):
+            if args is None:
+                literals = query.split(" VALUES ", 1)[1].split(",")
+                tuples = [self._literals[int(v.strip("()").split()[1])] for v in literals]
+            else:
+                tuples = [tuple(args)]
+            first = None
+            for row in tuples:
+                self._next_id += 5  # a concurrent statement took ids in between
+                self.rows.append({"id": self._next_id, "name": row[0]})
+                first = first or self._next_id
+            self.lastrowid = first
+        else:
+            self._result = [row for row in self.rows if row["name"] in args]
+
+    def fetchall(self):
+        rows, self._result = self._result, []
+        return rows
+
+
+def test_keyed_insert_reads_the_ids_back():
+    cursor = _TableCursor()
+    ids = insert_rows(cursor, "company", ("name", "address"), [("Acme", "Paris"), ("Globex", None)], key="name")
+    assert ids == [row["id"] for row in cursor.rows]
+    assert sum(q.startswith("INSERT") for q in cursor.statements) == 1
+
+
+def test_keyed_insert_splits_long_statements(monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_STATEMENT_LENGTH", 60)
+    cursor = _TableCursor()
+    values = [(f"Company {i}", "Lyon") for i in range(5)]
+    ids = insert_rows(cursor, "company", ("name", "address"), values, key="name")
+    assert ids == [row["id"] for row in cursor.rows]
+    assert sum(q.startswith("INSERT") for q in cursor.statements) > 1
+
+
+def test_insert_without_key_takes_each_rows_lastrowid():
+    cursor = _TableCursor()
+    ids = insert_rows(cursor, "advertisement", ("name",), [("a",), ("b",), ("c",)])
+    assert ids == [row["id"] for row in cursor.rows]
+    assert len(set(ids)) == 3
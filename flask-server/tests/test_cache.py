@@ -0,0 +1,49 @@
+from cache import LocalCache
+
+
+def test_lru_evicts_least_recently_used_entry():
+    cache = LocalCache(max_entries=2)
+    cache.set("a", b"1", None)
+    cache.set("b", b"2", None)
+    assert cache.get("a") == b"1"
+    cache.set("c", b"3", None)
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entry_is_a_miss(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    cache = LocalCache()
+    cache.set("a", b"1", 10)
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_counters_are_bounded():
+    cache = LocalCache(max_entries=10)
+    for item in range(1000):
+        cache.incr(f"gen:users:{item}")
+    assert len(cache._counters) == 10
+
+
+def test_evicted_counter_never_goes_back():
+    cache = LocalCache(max_entries=2)
+    for _ in range(5):
+        cache.incr("gen:users:1")
+    cache.incr("gen:users:2")
+    cache.incr("gen:users:3")
+    # gen:users:1 was evicted at 5: entries stored under generations up to 5
+    # must not come back to life
+    assert cache.get_counter("gen:users:1") >= 5
+    assert cache.incr("gen:users:1") > 5
+
+
+def test_untouched_counter_keeps_its_generation():
+    cache = LocalCache(max_entries=2)
+    cache.incr("gen:companies")
+    generation = cache.get_counter("gen:companies")
+    cache.incr("gen:users:1")
+    assert cache.get_counter("gen:companies") == generation
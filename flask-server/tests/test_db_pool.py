@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+from conftest import FakeConnection
+from db import ConnectionPool, PoolTimeout
+
+
+class BrokenRollback(FakeConnection):
+    def rollback(self):
+        raise OSError("connection lost")
+
+
+def test_released_connection_is_reused_after_a_rollback():
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=2)
+    conn = pool.acquire()
+    raw = conn._raw
+    conn.close()
+    assert raw.rollbacks == 1
+    again = pool.acquire()
+    assert again._raw is raw
+    again.close()
+    assert pool.stats()["connections_created"] == 1
+
+
+def test_closed_proxy_cannot_be_used():
+    pool = ConnectionPool(FakeConnection, min_size=0)
+    conn = pool.acquire()
+    conn.close()
+    with pytest.raises(Exception, match="returned to the pool"):
+        conn.cursor()
+    conn.close()  # a second close is harmless
+    assert pool.stats()["idle"] == 1
+
+
+def test_full_pool_times_out():
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    held.close()
+
+
+def test_waiter_gets_the_released_connection():
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, timeout=2)
+    held = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    held.close()
+    waiter.join(2)
+    assert got and got[0]._raw is not None
+    got[0].close()
+    assert pool.stats()["size"] == 1
+
+
+def test_connection_failing_its_rollback_is_dropped():
+    pool = ConnectionPool(BrokenRollback, min_size=0, max_size=1)
+    conn = pool.acquire()
+    raw = conn._raw
+    conn.close()
+    assert raw.closed
+    assert pool.stats()["size"] == 0
+
+
+def test_discard_frees_the_slot():
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, timeout=0.05)
+    pool.acquire().discard()
+    pool.acquire().close()
+    assert pool.stats()["connections_closed"] == 1
+
+
+def test_failed_connect_frees_the_slot():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("MySQL is down")
+        return FakeConnection()
+
+    pool = ConnectionPool(connect, min_size=0, max_size=1, timeout=0.05)
+    with pytest.raises(OSError):
+        pool.acquire()
+    pool.acquire().close()
+    assert pool.stats()["size"] == 1
+
+
+def test_fill_opens_min_size_and_idle_connections_above_it_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("db.time.monotonic", lambda: now[0])
+    pool = ConnectionPool(FakeConnection, min_size=2, max_size=4, max_idle=60)
+    pool.fill()
+    assert pool.stats()["idle"] == 2
+    conns = [pool.acquire() for _ in range(4)]
+    for conn in conns:
+        conn.close()
+    assert pool.stats()["size"] == 4
+    now[0] += 61
+    pool.acquire().close()
+    assert pool.stats()["size"] == 2
@@ -0,0 +1,30 @@
+import pytest
+
+from conftest import use_fake_pool
+
+USERS = ({"id": 1, "email": "a@example.com"}, {"id": 2, "email": "b@example.com"})
+
+
+def test_head_and_get_exports_give_their_connection_back(app, client):
+    pool = use_fake_pool(USERS)
+    for _ in range(pool.max_size + 1):
+        assert client.head("/users?format=csv").status_code == 200
+    assert pool.stats()["in_use"] == 0
+
+    resp = client.get("/users?format=csv")
+    assert resp.status_code == 200
+    assert resp.get_data(as_text=True).splitlines() == ["id,email", "1,a@example.com", "2,b@example.com"]
+    assert pool.stats()["in_use"] == 0
+
+
+def test_export_failed_by_an_after_request_hook_gives_its_connection_back(app, client):
+    pool = use_fake_pool(USERS)
+
+    @app.after_request
+    def fail(resp):
+        raise RuntimeError("after_request failed")
+
+    for _ in range(pool.max_size + 1):
+        with pytest.raises(RuntimeError):
+            client.get("/users?format=csv")
+    assert pool.stats()["in_use"] == 0
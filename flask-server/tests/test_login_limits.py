@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+import passwords
+import ratelimit
+from config import load_config
+from ratelimit import TokenBuckets
+
+FAST_HASH = "pbkdf2:sha256:1000"
+
+
+@pytest.fixture
+def hashing():
+    passwords.configure({"PASSWORD_HASH_METHOD": FAST_HASH, "PASSWORD_HASH_WORKERS": 1,
+                         "PASSWORD_HASH_QUEUE": 0, "PASSWORD_HASH_TIMEOUT": 0.05})
+    yield passwords
+    passwords.configure(load_config())
+
+
+def test_bucket_allows_a_burst_then_refills():
+    buckets = TokenBuckets(burst=3, rate=1.0)
+    for _ in range(3):
+        assert buckets.wait_time("ip", now=0) == 0
+        buckets.take("ip", now=0)
+    assert buckets.wait_time("ip", now=0) == pytest.approx(1.0)
+    assert buckets.wait_time("ip", now=0.5) == pytest.approx(0.5)
+    assert buckets.wait_time("ip", now=1.0) == 0
+    # never more than the burst, however long the key was idle
+    assert buckets._level("ip", 1000) == 3
+
+
+def test_reset_and_least_recently_used_keys_are_dropped():
+    buckets = TokenBuckets(burst=1, rate=0.0, max_keys=2)
+    buckets.take("a", now=0)
+    assert buckets.wait_time("a", now=0) == float("inf")
+    buckets.reset("a")
+    assert buckets.wait_time("a", now=0) == 0
+    for key in ("a", "b", "c"):
+        buckets.take(key, now=0)
+    assert buckets.wait_time("a", now=0) == 0
+    assert buckets.wait_time("c", now=0) == float("inf")
+
+
+def test_login_attempts_take_from_both_buckets():
+    ratelimit.configure({"LOGIN_RATE_LIMIT": True, "LOGIN_IP_BURST": 5, "LOGIN_IP_PER_MINUTE": 0,
+                         "LOGIN_ACCOUNT_BURST": 2, "LOGIN_ACCOUNT_PER_MINUTE": 0,
+                         "LOGIN_RATE_MAX_KEYS": 100})
+    try:
+        assert ratelimit.login_attempt("10.0.0.1", "Ann@Example.com") == 0
+        assert ratelimit.login_attempt("10.0.0.2", " ann@example.com") == 0
+        # the account bucket is empty whatever the IP
+        assert ratelimit.login_attempt("10.0.0.3", "ann@example.com") > 0
+        # a refused attempt does not use up the IP bucket
+        for _ in range(5):
+            assert ratelimit.login_attempt("10.0.0.3", f"user{_}@example.com") == 0
+        assert ratelimit.login_attempt("10.0.0.3", "other@example.com") > 0
+        ratelimit.login_succeeded("ANN@example.com")
+        assert ratelimit.login_attempt("10.0.0.1", "ann@example.com") == 0
+    finally:
+        ratelimit.configure(load_config())
+
+
+def test_verify_and_rehash(hashing):
+    stored = hashing.hash_password("s3cret")
+    assert hashing.is_hashed(stored)
+    assert hashing.verify(stored, "s3cret")
+    assert not hashing.verify(stored, "wrong")
+    assert not hashing.needs_rehash(stored)
+    # legacy plain-text rows and other parameters are re-hashed
+    assert hashing.verify("s3cret", "s3cret")
+    assert hashing.needs_rehash("s3cret")
+    assert hashing.needs_rehash("pbkdf2:sha256:2000$salt$" + "0" * 64)
+
+
+def test_unknown_account_costs_one_hash_in_the_pool(hashing, monkeypatch):
+    threads = []
+    check = passwords.check_password_hash
+
+    def recording_check(*args):
+        threads.append(threading.current_thread())
+        return check(*args)
+
+    monkeypatch.setattr(passwords, "check_password_hash", recording_check)
+    assert hashing.verify(None, "anything") is False
+    assert threads and threads[0] is not threading.current_thread()
+
+
+def test_busy_pool_refuses_instead_of_queueing(hashing):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_hash():
+        started.set()
+        release.wait(2)
+
+    hashing.verify(None, "")  # the pool is up and its dummy hash made
+    worker = threading.Thread(target=hashing._run, args=(slow_hash,))
+    worker.start()
+    started.wait(2)
+    try:
+        with pytest.raises(passwords.PasswordBusy):
+            hashing.hash_password("s3cret")
+    finally:
+        release.set()
+        worker.join(2)
+    assert hashing.verify(hashing.hash_password("s3cret"), "s3cret")
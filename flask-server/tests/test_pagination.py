@@ -0,0 +1,111 @@
+import base64
+import json
+from datetime import date
+
+import pytest
+
+import models.advertisement as advertisement
+from pagination import PaginationError, decode_cursor, encode_cursor
+
+
+def _token(values):
+    return encode_cursor(*values)
+
+
+def _raw_token(obj):
+    return base64.urlsafe_b64encode(json.dumps(obj).encode("utf-8")).decode("ascii")
+
+
+def test_cursor_round_trip():
+    token = encode_cursor(date(2024, 5, 1), 42)
+    assert decode_cursor(token, 2, types=(date, int)) == [date(2024, 5, 1), 42]
+
+
+@pytest.mark.parametrize("values", [
+    ["2024-05-01", "42"],
+    ["2024-05-01", 4.2],
+    ["2024-05-01", True],
+    ["2024-05-01", -1],
+    ["2024-05-01", None],
+    ["not a date", 42],
+    [20240501, 42],
+    ["2024-05-01 OR 1=1", 42],
+])
+def test_tampered_cursor_values_are_rejected(values):
+    with pytest.raises(PaginationError):
+        decode_cursor(_token(values), 2, types=(date, int))
+
+
+@pytest.mark.parametrize("token", [
+    "not-base64!",
+    _token(["2024-05-01"]),
+    _raw_token({"date": "2024-05-01", "id": 42}),
+])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(PaginationError):
+        decode_cursor(token, 2, types=(date, int))
+
+
+def test_tampered_advertisement_cursor_is_a_400(client, monkeypatch):
+    def no_database():
+        raise AssertionError("the database should not be reached")
+
+    monkeypatch.setattr(advertisement, "get_db_connection", no_database)
+    resp = client.get("/advertisements", query_string={"cursor": _token(["2024-05-01", "1 OR 1=1"])})
+    assert resp.status_code == 400
+    assert resp.json == {"error": "validation_error", "message": "invalid cursor"}
+
+
+class _AdsCursor:
+    def __init__(self, statements, rows):
+        self.statements = statements
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, query, params=None):
+        self.statements.append((query, params))
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+class _AdsConnection:
+    def __init__(self, statements, rows):
+        self.statements = statements
+        self.rows = rows
+
+    def cursor(self, *args):
+        return _AdsCursor(self.statements, self.rows)
+
+    def close(self):
+        pass
+
+
+def _ads(n):
+    return [{"id": 100 - i, "publish_date": date(2024, 5, 1)} for i in range(n)]
+
+
+def test_advertisements_are_paginated_by_default(client, monkeypatch):
+    statements = []
+    monkeypatch.setattr(advertisement, "get_db_connection", lambda: _AdsConnection(statements, _ads(21)))
+    resp = client.get("/advertisements")
+    assert resp.status_code == 200
+    assert len(resp.json["advertisements"]) == 20
+    assert decode_cursor(resp.json["next_cursor"], 2, types=(date, int)) == [date(2024, 5, 1), 81]
+    query, params = statements[0]
+    assert query.endswith("LIMIT %s") and params[-1] == 21
+
+
+def test_whole_advertisement_list_needs_limit_all(client, monkeypatch):
+    statements = []
+    monkeypatch.setattr(advertisement, "get_db_connection", lambda: _AdsConnection(statements, _ads(30)))
+    resp = client.get("/advertisements?limit=all")
+    assert resp.status_code == 200
+    assert len(resp.json["advertisements"]) == 30
+    assert "next_cursor" not in resp.json
+    assert "LIMIT" not in statements[0][0]
@@ -0,0 +1,88 @@
+import logging
+
+import pytest
+
+import db
+import query_recorder
+import server
+from conftest import use_fake_pool
+from query_recorder import QueryBudgetExceeded, query_budget, recording
+
+
+def _app(mode):
+    app = server.create_app({"WARMUP": False, "QUERY_RECORDER": mode})
+    app.testing = True
+    use_fake_pool(({"id": 1},))
+
+    @query_budget(2)
+    def users(n):
+        conn = db.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                for user_id in range(n):
+                    cursor.execute("SELECT * FROM user_account WHERE id = %s", (user_id,))
+                    cursor.execute(f"SELECT * FROM application WHERE person_id = {user_id}")
+        finally:
+            conn.close()
+        return {"n": n}
+
+    app.add_url_rule("/test/users/<int:n>", view_func=users)
+    return app
+
+
+@pytest.fixture(autouse=True)
+def unhook():
+    yield
+    query_recorder.configure({"QUERY_RECORDER": "off", "QUERY_RECORDER_REPEAT": 3, "QUERY_RECORDER_EXPLAIN_MS": 20.0})
+
+
+def test_over_budget_fails_the_request_in_strict_mode():
+    client = _app("strict").test_client()
+    with recording() as reports, pytest.raises(QueryBudgetExceeded):
+        client.get("/test/users/2")
+    assert reports[0]["queries"] == 4
+    assert reports[0]["budget"] == 2
+
+
+def test_within_budget_in_warn_mode(caplog):
+    client = _app("warn").test_client()
+    with caplog.at_level(logging.WARNING, logger="query_recorder"), recording() as reports:
+        resp = client.get("/test/users/1")
+    assert resp.status_code == 200
+    assert resp.headers["X-Query-Count"] == "2"
+    assert reports[0]["queries"] == 2
+    assert reports[0]["repeated"] == {}
+    assert not caplog.records
+
+
+def test_over_budget_only_logs_in_warn_mode(caplog):
+    client = _app("warn").test_client()
+    with caplog.at_level(logging.WARNING, logger="query_recorder"):
+        assert client.get("/test/users/2").status_code == 200
+    assert any("budget of" in r.getMessage() for r in caplog.records)
+
+
+def test_same_shape_statements_are_reported_as_n_plus_one(caplog):
+    client = _app("warn").test_client()
+    with caplog.at_level(logging.WARNING, logger="query_recorder"), recording() as reports:
+        client.get("/test/users/3")
+    # literals and parameters do not change the shape
+    assert reports[0]["repeated"] == {
+        "SELECT * FROM user_account WHERE id = %s": 3,
+        "SELECT * FROM application WHERE person_id = ?": 3,
+    }
+    assert sum("N+1" in r.getMessage() for r in caplog.records) == 2
+
+
+def test_recorder_off_records_nothing():
+    client = _app("off").test_client()
+    with recording() as reports:
+        resp = client.get("/test/users/3")
+    assert resp.status_code == 200
+    assert reports == []
+    assert "X-Query-Count" not in resp.headers
+
+
+def test_shape_ignores_in_list_length_and_literals():
+    assert query_recorder.shape("SELECT id FROM t WHERE id IN (%s, %s, %s) AND name = 'x'") == \
+        query_recorder.shape("SELECT id FROM t\n WHERE id IN (%s) AND name = 'y'")
@@ -0,0 +1,63 @@
+from datetime import date
+
+from search_index import InvertedIndex, fold, search_terms, snippet, tokenize
+
+
+def _ad(doc_id, title, description="", **meta):
+    return {"id": doc_id, "title": title, "short_description": "", "description": description,
+            "publish_date": date(2024, 5, 1), **meta}
+
+
+def _index():
+    index = InvertedIndex()
+    index.add(_ad(1, "Développeur Python", "API Flask", employment_type="CDI", salary_min=35000, salary_max=45000))
+    index.add(_ad(2, "Développeuse Java", "Spring et Python", employment_type="CDD", salary_min=30000, salary_max=38000))
+    index.add(_ad(3, "Comptable", "Paie et bilans", employment_type="CDI"))
+    return index
+
+
+def test_fold_keeps_one_char_per_char():
+    assert fold("DÉVELOPPEUR à Orléans") == "developpeur a orleans"
+    # positions in the folded text are positions in the original one
+    assert len(fold("Ḱéßàﬁ")) == len("Ḱéßàﬁ")
+
+
+def test_title_matches_rank_first():
+    ranked, _ = _index().search("python")
+    assert [doc_id for doc_id, _ in ranked] == [1, 2]
+
+
+def test_every_term_must_match_and_last_one_is_a_prefix():
+    index = _index()
+    assert [d for d, _ in index.search("python flask")[0]] == [1]
+    assert sorted(d for d, _ in index.search("develop")[0]) == [1, 2]
+    assert index.search("develop", prefix=False)[0] == []
+
+
+def test_filters_and_facets():
+    index = _index()
+    ranked, facets = index.search("python", {"employment_type": "CDD"})
+    assert [d for d, _ in ranked] == [2]
+    assert facets["employment_type"] == {"CDD": 1}
+    # salary filters keep ads whose range overlaps the requested one
+    assert [d for d, _ in index.search("python", {"salary_min": 40000})[0]] == [1]
+
+
+def test_reindexing_and_removal():
+    index = _index()
+    index.add(_ad(1, "Comptable senior"))
+    assert sorted(d for d, _ in index.search("comptable")[0]) == [1, 3]
+    assert [d for d, _ in index.search("python")[0]] == [2]
+    index.remove(2)
+    index.remove(2)
+    assert index.search("python")[0] == []
+    assert len(index) == 2
+
+
+def test_search_terms_and_snippet():
+    assert search_terms("l'équipe Python de") == ["équipe", "Python"]
+    text = "x" * 300 + " Nous cherchons un développeur <Python> confirmé. " + "y" * 300
+    excerpt = snippet(text, ["developpeur", "python"])
+    assert "<mark>développeur</mark>" in excerpt
+    assert "&lt;<mark>Python</mark>&gt;" in excerpt
+    assert tokenize("C'est l'API") == tokenize("c'est l'api")
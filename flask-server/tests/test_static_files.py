@@ -0,0 +1,72 @@
+import pytest
+
+from static_files import send_static
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "cv.pdf"
+    path.write_bytes(CONTENT)
+    return str(path)
+
+
+def _send(app, path, headers=None, **kwargs):
+    with app.test_request_context(headers=headers or {}):
+        resp = send_static(path, **kwargs)
+        if resp is None:
+            return None
+        resp.direct_passthrough = False
+        return resp.status_code, dict(resp.headers), resp.get_data()
+
+
+def test_whole_file(app, path):
+    status, headers, body = _send(app, path)
+    assert status == 200 and body == CONTENT
+    assert headers["Accept-Ranges"] == "bytes"
+    assert headers["Cache-Control"] == "private, no-cache"
+
+
+def test_missing_file(app, tmp_path):
+    assert _send(app, str(tmp_path / "nope.pdf")) is None
+    assert _send(app, str(tmp_path)) is None
+
+
+@pytest.mark.parametrize("header, start, stop", [
+    ("bytes=0-99", 0, 100),
+    ("bytes=1000-", 1000, 1024),
+    ("bytes=-24", 1000, 1024),
+    ("bytes=1000-5000", 1000, 1024),
+])
+def test_single_range(app, path, header, start, stop):
+    status, headers, body = _send(app, path, {"Range": header})
+    assert status == 206
+    assert body == CONTENT[start:stop]
+    assert headers["Content-Range"] == f"bytes {start}-{stop - 1}/{len(CONTENT)}"
+    assert headers["Content-Length"] == str(stop - start)
+
+
+def test_unsatisfiable_range(app, path):
+    status, headers, _ = _send(app, path, {"Range": "bytes=5000-6000"})
+    assert status == 416
+    assert headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_several_ranges_send_the_whole_file(app, path):
+    status, _, body = _send(app, path, {"Range": "bytes=0-9,20-29"})
+    assert status == 200 and body == CONTENT
+
+
+def test_stale_if_range_sends_the_whole_file(app, path):
+    status, _, body = _send(app, path, {"Range": "bytes=0-9", "If-Range": '"old-etag"'})
+    assert status == 200 and body == CONTENT
+    status, _, body = _send(app, path, {"Range": "bytes=0-9", "If-Range": '"v1"'}, etag="v1")
+    assert status == 206 and body == CONTENT[:10]
+
+
+def test_revalidation_and_immutable_files(app, path):
+    status, headers, _ = _send(app, path, etag="v1", immutable=True)
+    assert "immutable" in headers["Cache-Control"]
+    status, _, body = _send(app, path, {"If-None-Match": '"v1"'}, etag="v1")
+    assert status == 304 and body == b""
@@ -0,0 +1,63 @@
+import pytest
+
+import models.advertisement as advertisement
+import models.company as company
+from conftest import log_in
+
+AD = {
+    "title": "Développeur Python",
+    "short_description": "API Flask",
+    "description": "Maintenir l'API.",
+    "publish_date": "2024-05-01",
+    "company_id": "3",
+    "employment_type": "CDI",
+    "salary_min": "35000",
+    "salary_max": "",
+}
+
+BAD_ADS = [
+    ({"employment_type": "Freelance"}, "employment_type must be one of"),
+    ({"work_mode": "Lune"}, "work_mode must be one of"),
+    ({"publish_date": "01/05/2024"}, "publish_date must be YYYY-MM-DD"),
+    ({"company_id": "trois"}, "must be integers"),
+    ({"salary_min": "50000", "salary_max": "40000"}, "salary_min is greater than salary_max"),
+    ({"title": "x" * 256}, "title exceeds 255 characters"),
+    ({"description": ""}, "Missing required field(s): description"),
+]
+
+
+def _no_database():
+    raise AssertionError("the database should not be reached")
+
+
+def test_advertisement_values_are_typed():
+    values, error = advertisement._advertisement_values(AD)
+    assert error is None
+    row = dict(zip(advertisement.AD_INSERT_COLUMNS, values))
+    assert row["company_id"] == 3 and row["salary_min"] == 35000 and row["salary_max"] is None
+    assert row["publish_date"].isoformat() == "2024-05-01"
+
+
+@pytest.mark.parametrize("change, message", BAD_ADS)
+def test_single_and_bulk_advertisements_share_the_rules(client, monkeypatch, change, message):
+    monkeypatch.setattr(advertisement, "get_db_connection", _no_database)
+    log_in(client, is_admin=True, role="responsible")
+    body = {**AD, **change}
+    assert message in advertisement._advertisement_values(body)[1]
+    for resp in (client.post("/advertisements", json=body), client.put("/advertisements/1", json=body)):
+        assert resp.status_code == 400
+        assert message in resp.json["message"]
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"created_by": "admin"}, "created_by must be an integer"),
+    ({"website": "https://" + "x" * 150}, "website exceeds 150 characters"),
+    ({"name": ""}, "Missing required field(s): name"),
+])
+def test_single_and_bulk_companies_share_the_rules(client, monkeypatch, change, message):
+    monkeypatch.setattr(company, "get_db_connection", _no_database)
+    body = {"name": "Acme", **change}
+    assert message in company._company_values(body)[1]
+    for resp in (client.post("/companies", json=body), client.put("/companies/1", json=body)):
+        assert resp.status_code == 400
+        assert message in resp.json["message"]